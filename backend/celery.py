@@ -7,6 +7,6 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 app = Celery('backend')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
+app.autodiscover_tasks(related_name='task')  # scraper keeps its tasks in task.py
 
-app.conf.update(worker_concurrency=4)  # Adjust based on CPU power
 app.conf.task_acks_late = True  # Ensures tasks are not lost on worker failure
\ No newline at end of file
@@ -1,4 +1,6 @@
+import json
 import os
+import sys
 from pathlib import Path
 from decouple import config
 from dotenv import load_dotenv
@@ -118,11 +120,25 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.OrderingFilter',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'scraper.pagination.StableCursorPagination',
     'PAGE_SIZE': 10,
-    'DEFAULT_ORDERING': ['-timestamp'],
 }
 
+# 🧠 Cache Configuration
+TESTING = sys.argv[1:2] == ["test"]  # manage.py test runs on in-process stand-ins, never on outside services
+CACHE_URL = "" if TESTING else config("CACHE_URL", default="redis://redis:6379/1")  # Blank for a per-process in-memory cache
+if CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+            "KEY_PREFIX": "pricing",
+        }
+    }
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+API_CACHE_TIMEOUT = config("API_CACHE_TIMEOUT", default=86400, cast=int)  # Upper bound only; writes invalidate cached responses
+
 # ⚡ Celery Configuration
 CELERY_BROKER_URL = config("CELERY_BROKER_URL", default="redis://redis:6379/0")
 CELERY_RESULT_BACKEND = config("CELERY_RESULT_BACKEND", default="redis://redis:6379/0")
@@ -131,6 +147,93 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_TIMEZONE = "UTC"
 CELERY_ENABLE_UTC = True
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers.DatabaseScheduler"
+CELERY_TASK_DEFAULT_QUEUE = "maintenance"
+CELERY_TASK_ROUTES = ("scraper.routing.route_task",)  # Queues per kind of work, see scraper/routing.py
+
+# 🧵 Worker Queues: how `manage.py run_worker <queue>` starts the worker for each queue.
+# "autoscale" is "max,min" processes and replaces "concurrency"; prefork pools only.
+WORKER_QUEUES = {
+    "scrape-browser": {
+        "pool": config("WORKER_BROWSER_POOL", default="prefork"),
+        "concurrency": config("WORKER_BROWSER_CONCURRENCY", default=2, cast=int),  # Each process keeps SCRAPER_DRIVER_POOL_SIZE Chromes warm
+        "autoscale": config("WORKER_BROWSER_AUTOSCALE", default="4,1"),
+        "prefetch": config("WORKER_BROWSER_PREFETCH", default=1, cast=int),  # Scrapes are long; don't sit on queued ones
+    },
+    "scrape-http": {
+        "pool": config("WORKER_HTTP_POOL", default="gevent"),
+        "concurrency": config("WORKER_HTTP_CONCURRENCY", default=100, cast=int),  # Greenlets waiting on sockets
+        "autoscale": config("WORKER_HTTP_AUTOSCALE", default=""),
+        "prefetch": config("WORKER_HTTP_PREFETCH", default=4, cast=int),
+    },
+    "recommend": {
+        "pool": config("WORKER_RECOMMEND_POOL", default="prefork"),
+        "concurrency": config("WORKER_RECOMMEND_CONCURRENCY", default=os.cpu_count() or 2, cast=int),  # CPU bound: one per core
+        "autoscale": config("WORKER_RECOMMEND_AUTOSCALE", default=""),
+        "prefetch": config("WORKER_RECOMMEND_PREFETCH", default=4, cast=int),
+    },
+    "maintenance": {
+        "pool": config("WORKER_MAINTENANCE_POOL", default="prefork"),
+        "concurrency": config("WORKER_MAINTENANCE_CONCURRENCY", default=2, cast=int),
+        "autoscale": config("WORKER_MAINTENANCE_AUTOSCALE", default=""),
+        "prefetch": config("WORKER_MAINTENANCE_PREFETCH", default=1, cast=int),
+    },
+}
+
+# 🕷️ Scraper Configuration
+SCRAPER_DRIVER_POOL_SIZE = config("SCRAPER_DRIVER_POOL_SIZE", default=2, cast=int)  # Warm Chrome sessions per process
+SCRAPER_DRIVER_MAX_PAGES = config("SCRAPER_DRIVER_MAX_PAGES", default=50, cast=int)  # Page loads before a session is recycled
+SCRAPER_DRIVER_LEASE_TIMEOUT = config("SCRAPER_DRIVER_LEASE_TIMEOUT", default=120, cast=int)  # Seconds to wait for a free session
+SCRAPER_HTTP_POOL_SIZE = config("SCRAPER_HTTP_POOL_SIZE", default=20, cast=int)  # Keep-alive connections for the HTTP tier
+SCRAPER_HTTP_TIMEOUT = config("SCRAPER_HTTP_TIMEOUT", default=10, cast=int)  # Seconds per HTTP-tier request
+SCRAPER_TIER_REPROBE_SECONDS = config("SCRAPER_TIER_REPROBE_SECONDS", default=21600, cast=int)  # Retry HTTP for browser-only domains after this long
+SCRAPER_DISPATCH_CHUNK_SIZE = config("SCRAPER_DISPATCH_CHUNK_SIZE", default=50, cast=int)  # Products per batch task
+SCRAPER_DISPATCH_MAX_PER_TICK = config("SCRAPER_DISPATCH_MAX_PER_TICK", default=5000, cast=int)  # Cap per dispatcher run; the rest waits a tick
+SCRAPER_BATCH_ENGINE = config("SCRAPER_BATCH_ENGINE", default="sync")  # "sync" (driver pool) or "async" (Playwright)
+SCRAPER_ASYNC_CONCURRENCY = config("SCRAPER_ASYNC_CONCURRENCY", default=100, cast=int)  # Pages in flight per async engine
+SCRAPER_ASYNC_PER_DOMAIN = config("SCRAPER_ASYNC_PER_DOMAIN", default=4, cast=int)  # Pages in flight per domain
+SCRAPER_POLITENESS_DELAY = config("SCRAPER_POLITENESS_DELAY", default=0.5, cast=float)  # Seconds between requests to one domain
+SCRAPER_ASYNC_TIMEOUT = config("SCRAPER_ASYNC_TIMEOUT", default=20, cast=int)  # Seconds per async page load
+SCRAPER_PLAYWRIGHT_CHANNEL = config("SCRAPER_PLAYWRIGHT_CHANNEL", default="chrome")  # Use the image's Chrome; blank for bundled Chromium
+SCRAPER_API_MAX_URLS = config("SCRAPER_API_MAX_URLS", default=50, cast=int)  # URLs accepted per scrape API call
+SCRAPER_ADAPTIVE_MIN_SECONDS = config("SCRAPER_ADAPTIVE_MIN_SECONDS", default=300, cast=int)  # Shortest adaptive interval for tenants without their own
+SCRAPER_ADAPTIVE_MAX_SECONDS = config("SCRAPER_ADAPTIVE_MAX_SECONDS", default=604800, cast=int)  # Longest adaptive interval for tenants without their own
+SCRAPER_ADAPTIVE_TARGET_CHANGE = config("SCRAPER_ADAPTIVE_TARGET_CHANGE", default=0.3, cast=float)  # Share of adaptive scrapes that should find a new price
+SCRAPER_ADAPTIVE_SMOOTHING = config("SCRAPER_ADAPTIVE_SMOOTHING", default=0.3, cast=float)  # Weight of the latest scrape in the change rate
+SCRAPER_THROTTLE_REDIS_URL = config("SCRAPER_THROTTLE_REDIS_URL", default=CACHE_URL)  # Shared per-domain limits; blank keeps them per process
+SCRAPER_THROTTLE_RATE = config("SCRAPER_THROTTLE_RATE", default=1.0, cast=float)  # Requests per second per domain, across all workers
+SCRAPER_THROTTLE_BURST = config("SCRAPER_THROTTLE_BURST", default=5, cast=int)  # Requests a quiet domain may get at once
+SCRAPER_THROTTLE_BACKOFF_SECONDS = config("SCRAPER_THROTTLE_BACKOFF_SECONDS", default=30, cast=int)  # First re-queue delay for a throttled scrape, doubling per attempt
+SCRAPER_THROTTLE_MAX_BACKOFF = config("SCRAPER_THROTTLE_MAX_BACKOFF", default=1800, cast=int)  # Longest re-queue delay
+SCRAPER_THROTTLE_MAX_RETRIES = config("SCRAPER_THROTTLE_MAX_RETRIES", default=8, cast=int)  # Re-queues before a throttled scrape waits for its next run
+SCRAPER_BREAKER_FAILURES = config("SCRAPER_BREAKER_FAILURES", default=5, cast=int)  # Failed fetches of a domain that open its circuit
+SCRAPER_BREAKER_WINDOW = config("SCRAPER_BREAKER_WINDOW", default=300, cast=int)  # Seconds those failures must fall within
+SCRAPER_BREAKER_OPEN_SECONDS = config("SCRAPER_BREAKER_OPEN_SECONDS", default=600, cast=int)  # How long an open circuit pauses the domain
+SCRAPER_CONDITIONAL_FETCH = config("SCRAPER_CONDITIONAL_FETCH", default=True, cast=bool)  # Send ETag/Last-Modified and skip pages whose price region is unchanged
+SCRAPER_PARSER_BACKEND = config("SCRAPER_PARSER_BACKEND", default="html.parser")  # "html.parser", "lxml" or "selectolax"
+# Per-domain selectors tried before the generic lists, as JSON:
+# {"www.jumia.com.ng": {"product_name": "h1.-fs20", "current_price": "span.-b.-ltr.-tal.-fs24"}}
+SCRAPER_EXTRACTION_PROFILES = config("SCRAPER_EXTRACTION_PROFILES", default="{}", cast=json.loads)
+SCRAPER_CRAWL_CONCURRENCY = config("SCRAPER_CRAWL_CONCURRENCY", default=256, cast=int)  # Requests in flight in one Scrapy crawl
+SCRAPER_CRAWL_CLAIM_SIZE = config("SCRAPER_CRAWL_CLAIM_SIZE", default=1000, cast=int)  # Due rows the crawl loads (and claims) per query
+SCRAPER_COMPETITOR_REFRESH_SECONDS = config("SCRAPER_COMPETITOR_REFRESH_SECONDS", default=86400, cast=int)  # Competitor products checked longer ago than this are due
+SCRAPER_FAILURE_BACKOFF_SECONDS = config("SCRAPER_FAILURE_BACKOFF_SECONDS", default=300, cast=int)  # Retry of a crawled row whose fetch failed, doubling per consecutive failure up to its interval
+SCRAPER_PIPELINE_BATCH_SIZE = config("SCRAPER_PIPELINE_BATCH_SIZE", default=500, cast=int)  # Crawled items buffered before a bulk write
+SCRAPER_PIPELINE_FLUSH_SECONDS = config("SCRAPER_PIPELINE_FLUSH_SECONDS", default=5, cast=float)  # Longest an item waits in the buffer
+
+# 💹 Recommendation Configuration
+RECOMMENDATION_DEBOUNCE_SECONDS = config("RECOMMENDATION_DEBOUNCE_SECONDS", default=60, cast=int)  # Quiet period after a price change before repricing
+RECOMMENDATION_RECOMPUTE_BATCH = config("RECOMMENDATION_RECOMPUTE_BATCH", default=5000, cast=int)  # Dirty products repriced per run
+
+# 💱 Currency Configuration
+PRICING_CURRENCY = config("PRICING_CURRENCY", default="SAR")  # Currency of cost prices and recommendations; competitor prices are normalized to it
+SCRAPER_DEFAULT_CURRENCY = config("SCRAPER_DEFAULT_CURRENCY", default="")  # Assumed for scraped prices that name no currency; blank means PRICING_CURRENCY
+FX_RATES_FILE = config("FX_RATES_FILE", default=str(BASE_DIR / "scraper" / "fx_rates.json"))  # {"base": ..., "rates": {...}}
+FX_RATES_URL = config("FX_RATES_URL", default="")  # Rates service returning the same JSON; takes precedence over the file
+FX_RATES_TTL = config("FX_RATES_TTL", default=3600, cast=int)  # Seconds rates are reused in-process and in the shared cache
+
+# 📤 Export / Import Configuration
+SCRAPER_EXPORT_CHUNK_SIZE = config("SCRAPER_EXPORT_CHUNK_SIZE", default=2000, cast=int)  # Rows fetched per query (and per Parquet row group) when streaming exports
+SCRAPER_IMPORT_BATCH_SIZE = config("SCRAPER_IMPORT_BATCH_SIZE", default=1000, cast=int)  # Rows validated and upserted per transaction by bulk imports
 
 # 🚀 Default Primary Key
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ScraperConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'scraper'
+
+    def ready(self):
+        from scraper import caching  # noqa: F401  Connects the cache invalidation receivers
@@ -0,0 +1,122 @@
+import functools
+import json
+import threading
+from collections import namedtuple
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import lxml.html
+import requests
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+
+from scrapy_scraper.spiders.parsers import parse_html
+from scrapy_scraper.spiders.price_checker import PRICE_QUERY
+
+CorpusPage = namedtuple("CorpusPage", ["domain", "name", "url", "path", "expected"])
+
+
+def load_corpus(path):
+    """
+    Read a directory of saved product pages laid out as `<corpus>/<domain>/<name>.html`.
+
+    An optional `<name>.json` next to a page may give its original `url` and the
+    `expected` extraction result (e.g. {"product_name": ..., "current_price": ...}).
+    """
+    pages = []
+    for html_path in sorted(Path(path).glob("*/*.html")):
+        domain = html_path.parent.name
+        sidecar = html_path.with_suffix(".json")
+        meta = json.loads(sidecar.read_text(encoding="utf-8")) if sidecar.exists() else {}
+        pages.append(CorpusPage(
+            domain=domain,
+            name=html_path.stem,
+            url=meta.get("url", f"https://{domain}/{html_path.stem}"),
+            path=html_path,
+            expected=meta.get("expected", {}),
+        ))
+    return pages
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class CorpusServer:
+    """Serves a corpus directory on an ephemeral localhost port for the duration of a `with` block."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_QuietHandler, directory=str(self.root)))
+
+    def url_for(self, page):
+        return f"http://127.0.0.1:{self._server.server_port}/{page.path.relative_to(self.root).as_posix()}"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _ReplayElement:
+    def __init__(self, text):
+        self.text = text
+
+
+class ReplayDriver:
+    """
+    Stand-in for a Selenium driver that loads recorded pages over HTTP; `resolve`
+    maps a page's original URL to where the recording is served.
+
+    It answers the calls `fetch_page_content` makes (get, page_source, execute_script
+    for the price query, find_element for the waits) from the static HTML, and fails
+    a wait immediately instead of sleeping, since a recorded page never changes.
+    """
+
+    def __init__(self, resolve=None, session=None):
+        self.resolve = resolve or (lambda url: url)
+        self.session = session or requests.Session()
+        self.page_source = ""
+        self._tree = None
+        self._document = None
+
+    def get(self, url):
+        response = self.session.get(self.resolve(url), timeout=10)
+        response.raise_for_status()
+        self.page_source = response.text
+        self._tree = lxml.html.fromstring(self.page_source)
+        self._document = parse_html(self.page_source)
+
+    def execute_script(self, script, *args):
+        if PRICE_QUERY in script:
+            nodes = self._document.select(PRICE_QUERY)
+            return nodes[0].text() if nodes else None
+        return None
+
+    def find_element(self, by, value):
+        if by == By.XPATH:
+            matches = self._tree.xpath(value)
+            if matches:
+                return _ReplayElement(matches[0].text_content().strip())
+        else:
+            css = value if by == By.CSS_SELECTOR else value.lower()
+            node = self._document.select_one(css)
+            if node is not None:
+                return _ReplayElement(node.text())
+        raise TimeoutException(f"{value} not in recorded page")
+
+    def quit(self):
+        self.session.close()
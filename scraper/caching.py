@@ -0,0 +1,121 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+# Cached responses are keyed on the versions of the scopes they read. A version is the
+# time (ns) of the last write to that scope, so bumping it both orphans every cached
+# response built from the old data and doubles as the Last-Modified date.
+VERSION_KEY = "scope-version:{}"
+
+
+def _now_ns():
+    return time.time_ns()
+
+
+def bump(*scopes):
+    """Mark `scopes` as changed once the current transaction commits."""
+    if not scopes:
+        return
+    versions = {VERSION_KEY.format(scope): _now_ns() for scope in scopes}
+    transaction.on_commit(lambda: cache.set_many(versions, timeout=None))
+
+
+def invalidate_products(product_ids):
+    """Products and everything that nests them: product views and recommendation views."""
+    product_ids = list(product_ids)
+    scopes = [f"product:{product_id}" for product_id in product_ids]
+    scopes += [f"recommendations:{product_id}" for product_id in product_ids]
+    bump("products", "recommendations", *scopes)
+
+
+def invalidate_recommendations(product_ids):
+    bump("recommendations", *(f"recommendations:{product_id}" for product_id in product_ids))
+
+
+def invalidate_scraped_data():
+    bump("scraped-data")
+
+
+def _versions(scopes):
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = {key: _now_ns() for key in keys if key not in versions}
+    if missing:
+        # A version never seen (or evicted) starts at now, so it can't collide with old entries.
+        for key, version in missing.items():
+            cache.add(key, version, timeout=None)
+        versions.update(cache.get_many(list(missing)))
+    return [versions.get(key, missing.get(key)) for key in keys]
+
+
+def _not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    return since is not None and int(last_modified) <= since
+
+
+def cached_get(*scope_templates):
+    """
+    Cache a read view's 200 responses until a write touches one of its scopes.
+
+    Scope templates are formatted with the URL kwargs, e.g. "product:{id}". Responses
+    carry an ETag and Last-Modified derived from the scope versions, and conditional
+    requests that still match get a 304 without rendering or reading the body.
+    Authentication and permissions still run first, as DRF calls the handler after them.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            scopes = [template.format(**kwargs) for template in scope_templates]
+            versions = _versions(scopes)
+            variant = f"{request.get_full_path()}|{request.accepted_renderer.format}|{versions}"
+            digest = hashlib.sha1(variant.encode()).hexdigest()
+            etag = f'W/"{digest}"'
+            last_modified = max(versions) / 1e9
+            headers = {"ETag": etag, "Last-Modified": http_date(last_modified), "Cache-Control": "private, no-cache"}
+
+            if _not_modified(request, etag, last_modified):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+            body_key = f"api-response:{digest}"
+            data = cache.get(body_key)
+            if data is None:
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                data = response.data
+                cache.set(body_key, data, timeout=settings.API_CACHE_TIMEOUT)
+            return Response(data, headers=headers)
+
+        return wrapper
+
+    return decorator
+
+
+@receiver(post_save, sender="scraper.Product")
+@receiver(post_delete, sender="scraper.Product")
+def _product_changed(sender, instance, **kwargs):
+    invalidate_products([instance.pk])
+
+
+@receiver(post_save, sender="scraper.PriceRecommendation")
+@receiver(post_delete, sender="scraper.PriceRecommendation")
+def _recommendation_changed(sender, instance, **kwargs):
+    invalidate_recommendations([instance.product_id])
+
+
+@receiver(post_save, sender="scraper.ScrapedData")
+@receiver(post_delete, sender="scraper.ScrapedData")
+def _scraped_data_changed(sender, instance, **kwargs):
+    invalidate_scraped_data()
@@ -0,0 +1,202 @@
+import csv
+import json
+from collections import namedtuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+from scraper.models import CompetitorPriceHistory, CompetitorProduct, PriceRecommendation, ScrapedData, Tenant
+
+FORMATS = ("csv", "ndjson", "parquet")
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# `columns` are values_list lookups; `tenant` is the lookup for the owning tenant's id
+# (None for ScrapedData, which is keyed by user_identifier); `date` is the range field.
+Dataset = namedtuple("Dataset", "model columns tenant date")
+
+DATASETS = {
+    "scraped-data": Dataset(
+        ScrapedData,
+        ("id", "user_identifier", "url", "product_name", "current_price", "price_value", "currency", "normalized_price",
+         "previous_price", "discount", "is_active", "update_frequency", "timestamp", "last_checked"),
+        None, "timestamp",
+    ),
+    "competitor-products": Dataset(
+        CompetitorProduct,
+        ("id", "product_id", "product__name", "competitor_id", "competitor__name", "product_url",
+         "current_price", "previous_price", "price_value", "currency", "normalized_price", "last_checked"),
+        "product__tenant_id", "last_checked",
+    ),
+    "price-history": Dataset(
+        CompetitorPriceHistory,
+        ("id", "competitor_product_id", "competitor_product__product_id", "price", "recorded_at"),
+        "competitor_product__product__tenant_id", "recorded_at",
+    ),
+    "recommendations": Dataset(
+        PriceRecommendation,
+        ("id", "product_id", "product__name", "recommended_price", "reason", "competitor_data_used", "calculated_at"),
+        "product__tenant_id", "calculated_at",
+    ),
+}
+
+
+def column_name(lookup):
+    return lookup.replace("__", "_")
+
+
+def resolve_field(model, lookup):
+    """The model field a values_list lookup such as "product__tenant_id" ends on."""
+    *relations, name = lookup.split("__")
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    field = model._meta.get_field(name)  # Also accepts a foreign key's attname, e.g. "product_id"
+    return field.target_field if field.is_relation else field
+
+
+def export_queryset(dataset, tenant_id=None, start=None, end=None):
+    queryset = dataset.model.objects.all()
+    if tenant_id is not None:
+        if dataset.tenant is None:
+            identifier = Tenant.objects.filter(id=tenant_id).values_list("user_identifier", flat=True).first()
+            queryset = queryset.filter(user_identifier=identifier)
+        else:
+            queryset = queryset.filter(**{dataset.tenant: tenant_id})
+    if start:
+        queryset = queryset.filter(**{f"{dataset.date}__gte": start})
+    if end:
+        queryset = queryset.filter(**{f"{dataset.date}__lt": end})
+    return queryset
+
+
+def iter_chunks(queryset, columns, chunk_size):
+    """
+    Yield lists of row tuples, walking the queryset by primary key.
+
+    Each chunk is its own bounded `id > last` query, so memory stays flat whatever the
+    row count, and it works on MySQL where `iterator()` would buffer the whole result.
+    """
+    last_id = None
+    while True:
+        page = queryset.order_by("id")
+        if last_id is not None:
+            page = page.filter(id__gt=last_id)
+        rows = list(page.values_list(*columns)[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+class _Echo:
+    """File-like object whose write() hands back what it was given, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+class _ChunkSink:
+    """Write-only file for pyarrow that collects bytes until they are drained."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.closed = False
+
+    def write(self, data):
+        self.buffer.extend(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def _json_columns(fields):
+    return [i for i, field in enumerate(fields) if isinstance(field, models.JSONField)]
+
+
+def _encode_json(rows, json_columns):
+    """Serialize JSONField values in place so flat formats get JSON text rather than Python reprs."""
+    if not json_columns:
+        return rows
+    rows = [list(row) for row in rows]
+    for row in rows:
+        for i in json_columns:
+            if row[i] is not None:
+                row[i] = json.dumps(row[i], cls=DjangoJSONEncoder)
+    return rows
+
+
+def stream_csv(dataset, chunks):
+    json_columns = _json_columns([resolve_field(dataset.model, lookup) for lookup in dataset.columns])
+    writer = csv.writer(_Echo())
+    yield writer.writerow([column_name(c) for c in dataset.columns]).encode()
+    for rows in chunks:
+        yield "".join(writer.writerow(row) for row in _encode_json(rows, json_columns)).encode()
+
+
+def stream_ndjson(dataset, chunks):
+    names = [column_name(c) for c in dataset.columns]
+    for rows in chunks:
+        yield "".join(
+            json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder) + "\n" for row in rows
+        ).encode()
+
+
+def _arrow_type(pa, field):
+    if isinstance(field, models.DecimalField):
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if isinstance(field, models.DateTimeField):
+        return pa.timestamp("us", tz="UTC")
+    if isinstance(field, models.BooleanField):
+        return pa.bool_()
+    if isinstance(field, (models.IntegerField, models.AutoField)):
+        return pa.int64()
+    return pa.string()
+
+
+def stream_parquet(dataset, chunks):
+    """One Parquet row group per chunk; only the current chunk is ever held in memory."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    fields = [resolve_field(dataset.model, lookup) for lookup in dataset.columns]
+    schema = pa.schema([(column_name(lookup), _arrow_type(pa, field)) for lookup, field in zip(dataset.columns, fields)])
+    json_columns = _json_columns(fields)
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    for rows in chunks:
+        columns = [list(column) for column in zip(*_encode_json(rows, json_columns))]
+        writer.write_table(pa.Table.from_pydict(dict(zip(schema.names, columns)), schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+STREAMERS = {"csv": stream_csv, "ndjson": stream_ndjson, "parquet": stream_parquet}
+
+
+def stream_export(name, export_format, tenant_id=None, start=None, end=None, chunk_size=2000):
+    """Byte chunks of one dataset in the requested format, ready for StreamingHttpResponse or a file."""
+    dataset = DATASETS[name]
+    chunks = iter_chunks(export_queryset(dataset, tenant_id, start, end), dataset.columns, chunk_size)
+    return STREAMERS[export_format](dataset, chunks)
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
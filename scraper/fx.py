@@ -0,0 +1,94 @@
+import json
+import logging
+import time
+from decimal import Decimal, InvalidOperation
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = "fx-rates"
+APPLIED_CACHE_KEY = "fx-rates-applied"  # The rates stored normalized prices were last computed with
+CENT = Decimal("0.01")
+
+# Per-process copy of the rates, so converting a whole batch never leaves the process.
+_local = {"rates": None, "expires_at": 0.0}
+
+
+def _read_source():
+    """
+    Rates from FX_RATES_URL if set, else FX_RATES_FILE: {"base": "USD", "rates": {"SAR": 3.75, ...}},
+    each rate being units of that currency per one unit of `base`. Returns {code: Decimal}.
+    """
+    if settings.FX_RATES_URL:
+        response = requests.get(settings.FX_RATES_URL, timeout=10)
+        response.raise_for_status()
+        data = response.json()
+    else:
+        with open(settings.FX_RATES_FILE, encoding="utf-8") as f:
+            data = json.load(f)
+    rates = {data["base"]: Decimal(1)}
+    for code, rate in data["rates"].items():
+        try:
+            rate = Decimal(str(rate))
+        except InvalidOperation:
+            logger.warning(f"Ignoring unreadable FX rate {code}={rate!r}")
+            continue
+        if rate > 0:
+            rates[code.upper()] = rate
+    return rates
+
+
+def get_rates(refresh=False):
+    """
+    Current rates, from this process if fresh, else the shared cache, else the source.
+    Each level keeps them for FX_RATES_TTL seconds. A source that can't be read leaves
+    the last known rates in place (or none), so prices are never converted with guesses.
+    """
+    now = time.monotonic()
+    if not refresh and _local["rates"] is not None and now < _local["expires_at"]:
+        return _local["rates"]
+    rates = None if refresh else cache.get(CACHE_KEY)
+    if rates is None:
+        try:
+            rates = _read_source()
+        except (OSError, ValueError, KeyError, requests.RequestException) as e:
+            logger.error(f"Could not load FX rates: {e}")
+            rates = _local["rates"] or {}
+        else:
+            cache.set(CACHE_KEY, rates, timeout=settings.FX_RATES_TTL)
+    _local.update(rates=rates, expires_at=now + settings.FX_RATES_TTL)
+    return rates
+
+
+def conversion_factors(currencies, target=None):
+    """
+    {currency: factor} turning amounts in each of `currencies` into `target` (default
+    PRICING_CURRENCY), looked up once per currency rather than per price. A blank currency
+    means the price named none and is taken to be in the target already; currencies
+    without a rate map to None.
+    """
+    target = target or settings.PRICING_CURRENCY
+    rates = get_rates()
+    factors = {}
+    for currency in set(currencies):
+        if not currency or currency == target:
+            factors[currency] = Decimal(1)
+        elif currency in rates and target in rates:
+            factors[currency] = rates[target] / rates[currency]
+        else:
+            factors[currency] = None
+    return factors
+
+
+def normalize(amount, currency, target=None):
+    """`amount` in `currency` converted to `target` (default PRICING_CURRENCY), or None if it can't be."""
+    if amount is None:
+        return None
+    factor = conversion_factors([currency], target)[currency]
+    if factor is None:
+        logger.warning(f"No FX rate to convert {currency} to {target or settings.PRICING_CURRENCY}")
+        return None
+    return (amount * factor).quantize(CENT)
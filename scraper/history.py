@@ -0,0 +1,167 @@
+import logging
+from datetime import timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import OuterRef, Subquery
+
+from scraper.models import CompetitorPriceHistory, CompetitorPriceRollup, CompetitorProduct
+
+logger = logging.getLogger(__name__)
+
+RESOLUTIONS = ("hour", "day")
+
+
+def bucket_start(moment, resolution):
+    """Truncate `moment` to the start of its hour or day in UTC; naive values are taken to be UTC already."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(dt_timezone.utc)
+    moment = moment.replace(minute=0, second=0, microsecond=0)
+    if resolution == "day":
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def _latest_prices(competitor_product_ids):
+    latest = (
+        CompetitorPriceHistory.objects.filter(competitor_product=OuterRef("pk"))
+        .order_by("-recorded_at", "-id")
+        .values("price")[:1]
+    )
+    return dict(
+        CompetitorProduct.objects.filter(id__in=competitor_product_ids)
+        .annotate(latest_price=Subquery(latest))
+        .values_list("id", "latest_price")
+    )
+
+
+def _fold_rollups(observations):
+    """
+    Fold observations, (competitor_product_id, price, recorded_at, carried_price) with
+    `carried_price` the price in effect before this one, into unsaved hourly and daily
+    rollup rows keyed by (competitor_product_id, resolution, bucket). A bucket's first
+    observation seeds min/max with the carried price too, since that price held from
+    the start of the bucket until then.
+    """
+    merged = {}
+    for competitor_product_id, price, recorded_at, carried in observations:
+        for resolution in RESOLUTIONS:
+            key = (competitor_product_id, resolution, bucket_start(recorded_at, resolution))
+            rollup = merged.get(key)
+            if rollup is None:
+                opening = price if carried is None else carried
+                merged[key] = rollup = CompetitorPriceRollup(
+                    competitor_product_id=competitor_product_id, resolution=resolution, bucket=key[2],
+                    min_price=opening, max_price=opening,
+                    last_price=price, last_recorded_at=recorded_at,
+                )
+            rollup.min_price = min(rollup.min_price, price)
+            rollup.max_price = max(rollup.max_price, price)
+            if recorded_at >= rollup.last_recorded_at:
+                rollup.last_price, rollup.last_recorded_at = price, recorded_at
+            rollup.samples += 1
+    return merged
+
+
+def _locked_rollups(keys):
+    return (
+        CompetitorPriceRollup.objects.select_for_update()
+        .filter(
+            competitor_product_id__in={key[0] for key in keys},
+            bucket__in={key[2] for key in keys},
+        )
+    )
+
+
+def _write_rollups(merged):
+    """Merge folded rollups into the stored buckets under a row lock and insert the buckets not stored yet."""
+    to_update = []
+    for row in _locked_rollups(merged):
+        new = merged.pop((row.competitor_product_id, row.resolution, row.bucket), None)
+        if new is None:
+            continue
+        row.min_price = min(row.min_price, new.min_price)
+        row.max_price = max(row.max_price, new.max_price)
+        if new.last_recorded_at >= row.last_recorded_at:
+            row.last_price, row.last_recorded_at = new.last_price, new.last_recorded_at
+        row.samples += new.samples
+        to_update.append(row)
+
+    CompetitorPriceRollup.objects.bulk_update(
+        to_update, ["min_price", "max_price", "last_price", "last_recorded_at", "samples"], batch_size=500
+    )
+    CompetitorPriceRollup.objects.bulk_create(merged.values(), batch_size=500)
+
+
+def _merge_rollups(observations, attempts=3):
+    """
+    Fold observations into their rollup rows. The row lock only covers buckets that
+    already exist, so two workers can both decide to insert the same new bucket; the
+    loser's insert fails the unique constraint, its savepoint rolls back, and the next
+    attempt finds the winner's row and merges into it instead.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            with transaction.atomic():
+                _write_rollups(_fold_rollups(observations))
+            return
+        except IntegrityError:
+            if attempt == attempts:
+                raise
+            logger.info(f"Rollup bucket inserted concurrently, merging again (attempt {attempt})")
+
+
+def record_price_points(points):
+    """
+    Record scraped prices in one batch.
+
+    `points` is an iterable of (competitor_product_id, price, recorded_at), one per
+    observation, changed or not. Every point counts towards the hourly and daily
+    rollups; the history itself only gets a row when the price differs from the
+    previous point of the same competitor product. Both are written in one
+    transaction. Returns the history rows created.
+    """
+    points = sorted(
+        (p for p in points if p[1] is not None),
+        key=lambda p: (p[0], p[2]),
+    )
+    if not points:
+        return []
+
+    last_price = _latest_prices({p[0] for p in points})
+    observations, rows = [], []
+    for competitor_product_id, price, recorded_at in points:
+        carried = last_price.get(competitor_product_id)
+        observations.append((competitor_product_id, price, recorded_at, carried))
+        if carried == price:
+            continue
+        last_price[competitor_product_id] = price
+        rows.append(CompetitorPriceHistory(
+            competitor_product_id=competitor_product_id, price=price, recorded_at=recorded_at,
+        ))
+
+    with transaction.atomic():
+        created = CompetitorPriceHistory.objects.bulk_create(rows, batch_size=1000)
+        _merge_rollups(observations)
+    logger.info(f"Recorded {len(created)} price changes out of {len(points)} points")
+    return created
+
+
+def price_series(competitor_product_id, start=None, end=None, resolution="raw"):
+    """
+    Price points for one competitor product between `start` and `end`, oldest first.
+    "raw" reads the history itself; "hour" and "day" read the rollups.
+    """
+    if resolution == "raw":
+        queryset = CompetitorPriceHistory.objects.filter(competitor_product_id=competitor_product_id)
+        if start:
+            queryset = queryset.filter(recorded_at__gte=start)
+        if end:
+            queryset = queryset.filter(recorded_at__lt=end)
+        return queryset.order_by("recorded_at")
+
+    queryset = CompetitorPriceRollup.objects.filter(competitor_product_id=competitor_product_id, resolution=resolution)
+    if start:
+        queryset = queryset.filter(bucket__gte=bucket_start(start, resolution))
+    if end:
+        queryset = queryset.filter(bucket__lt=end)
+    return queryset.order_by("bucket")
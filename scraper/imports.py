@@ -0,0 +1,258 @@
+import csv
+import io
+import json
+import logging
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+
+from scraper.caching import invalidate_products
+from scraper.history import record_price_points
+from scraper.models import (
+    Competitor, CompetitorProduct, Product, conflict_target, mark_products_dirty, refresh_market_stats,
+)
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "ndjson")
+
+# Columns accepted per kind. Foreign keys are given by name (competitor also by URL)
+# and resolved against the importing tenant.
+COLUMNS = {
+    "products": ("name", "description", "cost_price", "target_margin"),
+    "competitors": ("name", "url"),
+    "competitor-products": ("product", "competitor", "product_url", "product_name", "current_price", "previous_price"),
+}
+
+
+def read_rows(stream, file_format):
+    """Yield (row number, dict) from a binary CSV or NDJSON stream; unreadable NDJSON lines yield an error string."""
+    if file_format == "csv":
+        reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+        for number, row in enumerate(reader, start=1):
+            yield number, {key.strip(): value for key, value in row.items() if key}
+        return
+    for number, line in enumerate(io.TextIOWrapper(stream, encoding="utf-8"), start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, f"Invalid JSON: {e}"
+            continue
+        yield number, row if isinstance(row, dict) else "Each line must be a JSON object"
+
+
+def _clean(model, row, field_names):
+    """
+    Validate the given columns of one row against the model's own field definitions
+    (type, max_length, URL, blank/null), without touching the database.
+    Returns (values, errors); only columns present in the row are returned.
+    """
+    values, errors = {}, {}
+    for name in field_names:
+        if name not in row:
+            continue
+        field = model._meta.get_field(name)
+        raw = row[name]
+        if isinstance(raw, str):
+            raw = raw.strip()
+        if raw in (None, "") and field.null:
+            values[name] = None
+            continue
+        try:
+            values[name] = field.clean("" if raw is None else raw, None)
+        except ValidationError as e:
+            errors[name] = e.messages
+    return values, errors
+
+
+def _updated_fields(objects, candidates):
+    """Only overwrite columns the upload actually provided, so a partial file can't blank the rest."""
+    present = set()
+    for obj in objects:
+        present.update(obj._import_columns)
+    return [name for name in candidates if name in present]
+
+
+class _Batch:
+    def __init__(self):
+        self.errors = []
+        self.keyed = {}  # Upsert key -> model instance; a later row with the same key wins
+
+    def fail(self, number, errors):
+        self.errors.append({"row": number, "errors": errors})
+
+    def add(self, number, key, obj, columns):
+        obj._import_row, obj._import_columns = number, columns
+        self.keyed[key] = obj
+
+
+def _ref(row, name):
+    value = row.get(name)
+    return None if value is None else str(value).strip()
+
+
+def _import_products(tenant_id, rows):
+    batch = _Batch()
+    for number, row in rows:
+        values, errors = _clean(Product, row, COLUMNS["products"])
+        if "name" not in values and "name" not in errors:
+            errors["name"] = ["This field is required."]
+        if errors:
+            batch.fail(number, errors)
+            continue
+        batch.add(number, values["name"], Product(tenant_id=tenant_id, **values), values.keys())
+
+    products = list(batch.keyed.values())
+    Product.objects.bulk_create(
+        products,
+        update_conflicts=True,
+        unique_fields=conflict_target(["tenant", "name"]),
+        update_fields=_updated_fields(products, ["description", "cost_price", "target_margin"]) + ["updated_at"],
+    )
+    # New costs or margins change the recommendation just like new competitor prices do.
+    product_ids = list(Product.objects.filter(tenant_id=tenant_id, name__in=batch.keyed).values_list("id", flat=True))
+    mark_products_dirty(product_ids)
+    invalidate_products(product_ids)
+    return len(products), batch.errors
+
+
+def _import_competitors(tenant_id, rows):
+    batch = _Batch()
+    for number, row in rows:
+        values, errors = _clean(Competitor, row, COLUMNS["competitors"])
+        for name in ("name", "url"):
+            if not values.get(name) and name not in errors:
+                errors[name] = ["This field is required."]
+        if errors:
+            batch.fail(number, errors)
+            continue
+        batch.add(number, values["url"], Competitor(tenant_id=tenant_id, **values), values.keys())
+
+    # Competitor URLs are unique across tenants; never move another tenant's competitor.
+    taken = set(
+        Competitor.objects.filter(url__in=batch.keyed).exclude(tenant_id=tenant_id).values_list("url", flat=True)
+    )
+    competitors = []
+    for url, competitor in batch.keyed.items():
+        if url in taken:
+            batch.fail(competitor._import_row, {"url": [f"{url} is already registered to another company."]})
+        else:
+            competitors.append(competitor)
+    Competitor.objects.bulk_create(
+        competitors,
+        update_conflicts=True,
+        unique_fields=conflict_target(["url"]),
+        update_fields=["name"],
+    )
+    return len(competitors), batch.errors
+
+
+def _import_competitor_products(tenant_id, rows):
+    # One lookup map per foreign key for the whole batch; the oldest competitor wins a shared name.
+    product_names = {_ref(row, "product") for _, row in rows}
+    competitor_refs = {_ref(row, "competitor") for _, row in rows}
+    product_ids = dict(Product.objects.filter(tenant_id=tenant_id, name__in=product_names).values_list("name", "id"))
+    competitor_ids = {}
+    for competitor_id, name, url in (
+        Competitor.objects.filter(Q(name__in=competitor_refs) | Q(url__in=competitor_refs), tenant_id=tenant_id)
+        .order_by("-id").values_list("id", "name", "url")
+    ):
+        competitor_ids[name] = competitor_ids[url] = competitor_id
+
+    batch = _Batch()
+    fields = COLUMNS["competitor-products"][2:]
+    for number, row in rows:
+        values, errors = _clean(CompetitorProduct, row, fields)
+        product_id = product_ids.get(_ref(row, "product"))
+        competitor_id = competitor_ids.get(_ref(row, "competitor"))
+        if product_id is None:
+            errors["product"] = [f"No product named {_ref(row, 'product')!r} for this company."]
+        if competitor_id is None:
+            errors["competitor"] = [f"No competitor {_ref(row, 'competitor')!r} for this company."]
+        if not values.get("product_url") and "product_url" not in errors:
+            errors["product_url"] = ["This field is required."]
+        if errors:
+            batch.fail(number, errors)
+            continue
+        competitor_product = CompetitorProduct(product_id=product_id, competitor_id=competitor_id, **values)
+        competitor_product.update_price()
+        price_columns = {"price_value", "currency", "normalized_price"} if "current_price" in values else set()
+        columns = set(values) | {"competitor"} | price_columns
+        batch.add(number, (product_id, values["product_url"]), competitor_product, columns)
+
+    keys = batch.keyed
+    # Filter on product only: it walks the (product, product_url) index, where adding a
+    # product_url IN list would make some planners fall back to a scan.
+    before = {
+        (product_id, url): price
+        for product_id, url, price in CompetitorProduct.objects.filter(
+            product_id__in={key[0] for key in keys}
+        ).values_list("product_id", "product_url", "price_value")
+    }
+    competitor_products = list(keys.values())
+    CompetitorProduct.objects.bulk_create(
+        competitor_products,
+        update_conflicts=True,
+        unique_fields=conflict_target(["product", "product_url"]),
+        update_fields=_updated_fields(
+            competitor_products,
+            ["competitor", "product_name", "current_price", "previous_price", "price_value", "currency", "normalized_price"],
+        ) + ["last_checked"],
+    )
+
+    # bulk_create skips save(), so run its price-change bookkeeping here for the whole batch.
+    changed = [
+        obj for key, obj in keys.items()
+        if "price_value" in obj._import_columns and (key not in before or before[key] != obj.price_value)
+    ]
+    if changed:
+        changed_products = {obj.product_id for obj in changed}
+        mark_products_dirty(changed_products)
+        refresh_market_stats(changed_products)
+    # Unchanged prices still count as rollup samples; record_price_points leaves them out of the history.
+    priced = [obj for obj in competitor_products if "price_value" in obj._import_columns]
+    if priced:
+        ids = dict(
+            ((product_id, url), pk)
+            for pk, product_id, url in CompetitorProduct.objects.filter(
+                product_id__in={obj.product_id for obj in priced}
+            ).values_list("id", "product_id", "product_url")
+        )
+        record_price_points(
+            (ids[(obj.product_id, obj.product_url)], obj.price_value, obj.last_checked) for obj in priced
+        )
+    return len(competitor_products), batch.errors
+
+
+IMPORTERS = {
+    "products": _import_products,
+    "competitors": _import_competitors,
+    "competitor-products": _import_competitor_products,
+}
+
+
+def import_rows(kind, tenant_id, rows, batch_size=1000):
+    """
+    Validate and upsert `rows` ((row number, dict) pairs, see `read_rows`) in batches,
+    one transaction each. Rows that fail validation are reported and skipped; the rest
+    of their batch is still imported. Returns {"imported", "errors"}.
+    """
+    importer = IMPORTERS[kind]
+    imported, errors = 0, []
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+        readable = [(number, row) for number, row in chunk if isinstance(row, dict)]
+        errors.extend({"row": number, "errors": {"non_field_errors": [row]}} for number, row in chunk if isinstance(row, str))
+        with transaction.atomic():
+            count, batch_errors = importer(tenant_id, readable)
+        imported += count
+        errors.extend(batch_errors)
+    logger.info(f"Imported {imported} {kind} for tenant {tenant_id} with {len(errors)} rejected rows")
+    return {"imported": imported, "errors": errors}
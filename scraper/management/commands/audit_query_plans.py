@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_databases, teardown_databases
+
+from scraper.query_plans import PLAN_VENDORS, explain, full_scans, generate_dataset, hot_querysets
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the hot view and task querysets against a generated dataset in a throwaway test "
+        "database and fail if any plan reads a whole table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100000, help="Products and scraped rows to generate")
+        parser.add_argument("--keepdb", action="store_true", help="Reuse the test database between runs")
+        parser.add_argument("--verbose-plans", action="store_true", help="Print every plan, not just failing ones")
+
+    def handle(self, *args, **options):
+        if connection.vendor not in PLAN_VENDORS:
+            raise CommandError(f"Can't read {connection.vendor} query plans; run the audit on {', '.join(PLAN_VENDORS)}")
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options["keepdb"])
+        try:
+            self.stdout.write(f"Generating {options['rows']} rows on {connection.vendor}...")
+            sample = generate_dataset(options["rows"])
+            failures = []
+            for name, queryset in hot_querysets(sample):
+                plan = explain(queryset)
+                scans = full_scans(plan, limited=queryset.query.is_sliced)
+                self.stdout.write(f"{'FULL SCAN' if scans else 'ok':<10} {name}{': ' + ', '.join(scans) if scans else ''}")
+                if scans:
+                    failures.append(name)
+                if scans or options["verbose_plans"]:
+                    self.stdout.write("    " + plan.replace("\n", "\n    "))
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options["keepdb"])
+
+        if failures:
+            raise CommandError(f"{len(failures)} queries read a whole table: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("No full table scans"))
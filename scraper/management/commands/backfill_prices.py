@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from scraper.caching import invalidate_scraped_data
+from scraper.models import CompetitorProduct, Product, ScrapedData, read_price, refresh_market_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-read every stored price string into price_value, currency and normalized_price with the "
+        "current parser and FX rates, then rebuild the market stats. Run once after migrating past "
+        "0016_currency_normalized_prices, and again whenever the parser learns a new currency format."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        for model in (CompetitorProduct, ScrapedData):
+            updated, last_id = 0, 0
+            while rows := list(model.objects.filter(id__gt=last_id).order_by("id").only("id", "current_price")[:batch_size]):
+                for row in rows:
+                    row.price_value, row.currency, row.normalized_price = read_price(row.current_price)
+                updated += model.objects.bulk_update(rows, ["price_value", "currency", "normalized_price"])
+                last_id = rows[-1].id
+            self.stdout.write(f"Re-read {updated} {model.__name__} prices")
+        invalidate_scraped_data()
+
+        refreshed, last_id = 0, 0
+        while product_ids := list(Product.objects.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:batch_size]):
+            refreshed += len(refresh_market_stats(product_ids))
+            last_id = product_ids[-1]
+        self.stdout.write(f"Rebuilt market stats for {refreshed} products")
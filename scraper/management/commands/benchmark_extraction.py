@@ -0,0 +1,113 @@
+import logging
+import time
+import tracemalloc
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scraper.benchmarks import CorpusServer, ReplayDriver, load_corpus, percentile
+from scrapy_scraper.spiders.fetcher import build_http_session
+from scrapy_scraper.spiders.parsers import BACKENDS, parse_html
+from scrapy_scraper.spiders.price_checker import clean_price, extract_product_data, parse_product_data
+
+PRICE_FIELDS = ("current_price", "previous_price")
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay saved product pages (<corpus>/<domain>/<name>.html, optional <name>.json with url/expected) "
+        "through the extraction pipeline from a local HTTP server and report throughput, latency, memory "
+        "and per-domain accuracy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("corpus", help="Directory of saved pages")
+        parser.add_argument("--tier", choices=["http", "browser", "both"], default="both",
+                            help="http: fetcher's static tier; browser: extract_product_data on a replay driver")
+        parser.add_argument("--backend", choices=BACKENDS, default=None,
+                            help="Parser backend for both tiers (default: settings)")
+        parser.add_argument("--repeat", type=int, default=1, help="Timed passes over the corpus")
+        parser.add_argument("--min-accuracy", type=float, default=None, help="Fail if accuracy (0-1) drops below this")
+        parser.add_argument("--max-p99-ms", type=float, default=None, help="Fail if p99 latency exceeds this")
+
+    def handle(self, *args, **options):
+        pages = load_corpus(options["corpus"])
+        if not pages:
+            raise CommandError(f"No pages found under {options['corpus']}")
+        tiers = ["http", "browser"] if options["tier"] == "both" else [options["tier"]]
+
+        failures = []
+        logging.disable(logging.INFO)  # Per-page extraction logs would dominate the timings
+        try:
+            with CorpusServer(options["corpus"]) as server:
+                for tier in tiers:
+                    extract = self._extractor(tier, pages, server, options["backend"])
+                    failures += self._run_tier(tier, pages, extract, options)
+        finally:
+            logging.disable(logging.NOTSET)
+
+        if failures:
+            raise CommandError("; ".join(failures))
+
+    def _extractor(self, tier, pages, server, backend):
+        if tier == "http":
+            session = build_http_session()
+
+            def extract(page):
+                response = session.get(server.url_for(page), timeout=10)
+                return parse_product_data(parse_html(response.text, backend), page.url)
+        else:
+            local_urls = {page.url: server.url_for(page) for page in pages}
+            driver = ReplayDriver(resolve=local_urls.get)
+
+            def extract(page):
+                return extract_product_data(page.url, driver, backend)
+        return extract
+
+    def _run_tier(self, tier, pages, extract, options):
+        timings = []
+        latencies_by_domain = defaultdict(list)
+        checked = defaultdict(int)
+        correct = defaultdict(int)
+        started = time.perf_counter()
+        for _ in range(options["repeat"]):
+            for page in pages:
+                start = time.perf_counter()
+                data = extract(page)
+                elapsed = time.perf_counter() - start
+                timings.append(elapsed)
+                latencies_by_domain[page.domain].append(elapsed)
+                for field, expected in page.expected.items():
+                    if field in PRICE_FIELDS:
+                        expected = clean_price(expected)
+                    checked[page.domain] += 1
+                    correct[page.domain] += data.get(field) == expected
+        wall = time.perf_counter() - started
+
+        tracemalloc.start()
+        for page in pages:
+            extract(page)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        p50, p99 = percentile(timings, 50) * 1000, percentile(timings, 99) * 1000
+        total_checked, total_correct = sum(checked.values()), sum(correct.values())
+        accuracy = total_correct / total_checked if total_checked else None
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{tier} tier"))
+        self.stdout.write(
+            f"  {len(timings)} pages in {wall:.2f}s: {len(timings) / wall:.1f} pages/s, "
+            f"p50 {p50:.2f} ms, p99 {p99:.2f} ms, peak memory {peak / 1024:.0f} KiB"
+        )
+        for domain, latencies in sorted(latencies_by_domain.items()):
+            domain_accuracy = f"{correct[domain] / checked[domain]:.0%}" if checked[domain] else "n/a"
+            self.stdout.write(
+                f"  {domain:<30} p50 {percentile(latencies, 50) * 1000:>8.2f} ms  accuracy {domain_accuracy}"
+            )
+
+        failures = []
+        if options["min_accuracy"] is not None and accuracy is not None and accuracy < options["min_accuracy"]:
+            failures.append(f"{tier} accuracy {accuracy:.1%} below {options['min_accuracy']:.1%}")
+        if options["max_p99_ms"] is not None and p99 > options["max_p99_ms"]:
+            failures.append(f"{tier} p99 {p99:.2f} ms above {options['max_p99_ms']:.2f} ms")
+        return failures
@@ -0,0 +1,58 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scraper.benchmarks import load_corpus, percentile
+from scrapy_scraper.spiders.parsers import BACKENDS, parse_html
+from scrapy_scraper.spiders.price_checker import parse_product_data
+from scrapy_scraper.spiders.profiles import ProfileRegistry
+
+COMPARED_FIELDS = ("product_name", "current_price", "previous_price", "description")
+
+
+class Command(BaseCommand):
+    help = "Compare parser backends on a corpus of saved product pages (<corpus>/<domain>/<name>.html)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("corpus", help="Directory of saved pages")
+        parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+        parser.add_argument("--repeat", type=int, default=3, help="Passes over the corpus per backend")
+
+    def handle(self, *args, **options):
+        pages = load_corpus(options["corpus"])
+        if not pages:
+            raise CommandError(f"No pages found under {options['corpus']}")
+        documents = [page.path.read_text(encoding="utf-8", errors="replace") for page in pages]
+
+        logging.disable(logging.INFO)  # Per-page extraction logs would dominate the timings
+        try:
+            outputs = {}
+            self.stdout.write(f"{'backend':<12} {'pages/s':>9} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9}")
+            for backend in options["backends"]:
+                registry = ProfileRegistry()
+                timings = []
+                for _ in range(options["repeat"]):
+                    results = []
+                    for page, html in zip(pages, documents):
+                        start = time.perf_counter()
+                        results.append(parse_product_data(parse_html(html, backend), page.url, registry=registry))
+                        timings.append(time.perf_counter() - start)
+                outputs[backend] = results
+                total = sum(timings)
+                self.stdout.write(
+                    f"{backend:<12} {len(timings) / total:>9.1f} {total / len(timings) * 1000:>9.2f} "
+                    f"{percentile(timings, 50) * 1000:>9.2f} {percentile(timings, 99) * 1000:>9.2f}"
+                )
+        finally:
+            logging.disable(logging.NOTSET)
+
+        reference, *others = options["backends"]
+        for backend in others:
+            for page, expected, got in zip(pages, outputs[reference], outputs[backend]):
+                for field in COMPARED_FIELDS:
+                    if expected[field] != got[field]:
+                        self.stdout.write(self.style.WARNING(
+                            f"{backend} differs from {reference} on {page.domain}/{page.name} {field}: "
+                            f"{got[field]!r} != {expected[field]!r}"
+                        ))
@@ -0,0 +1,72 @@
+import re
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import chain, cycle, islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scraper.models import CompetitorProduct, ScrapedData
+from scrapy_scraper.spiders.prices import parse_price, price_decimal
+
+SAMPLES = (
+    "₦ 4,500", "₦12,999.00", "N 7,250", "SAR 1,299.00", "ر.س ١٬٢٩٩", "1.234,56 €", "€ 19,99", "$99.99",
+    "99.99 USD", "£1,049", "-20% ₦ 9,000", "KSh 2,300", "3'499.90 CHF", "1 234,56 €", "Price: 450 AED",
+)
+
+
+def legacy_extract_price(price_str):
+    """
+    What the models did before the shared parser: first digits-and-dots run, commas dropped.
+    A lone dot (as in "ر.س") used to raise on save; here it reads as no price.
+    """
+    if not price_str:
+        return None
+    match = re.search(r"[\d.]+", price_str.replace(",", ""))
+    try:
+        return Decimal(match.group()) if match else None
+    except InvalidOperation:
+        return None
+
+
+class Command(BaseCommand):
+    help = "Time price string parsing: the shared parser against the old regex extraction."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=100_000, help="Strings per pass")
+        parser.add_argument("--repeat", type=int, default=3, help="Passes per method; the best one is reported")
+        parser.add_argument("--from-db", action="store_true",
+                            help="Use stored current_price strings instead of the built-in samples")
+
+    def handle(self, *args, **options):
+        if options["from_db"]:
+            stored = chain(
+                ScrapedData.objects.exclude(current_price="").values_list("current_price", flat=True)[:options["count"]],
+                CompetitorProduct.objects.exclude(current_price=None).values_list("current_price", flat=True)[:options["count"]],
+            )
+            texts = list(islice(stored, options["count"]))
+            if not texts:
+                raise CommandError("No stored prices to parse")
+            texts = list(islice(cycle(texts), options["count"]))
+        else:
+            texts = list(islice(cycle(SAMPLES), options["count"]))
+
+        methods = {
+            "legacy": lambda: [legacy_extract_price(text) for text in texts],
+            "parse_price": lambda: [parse_price(text) for text in texts],
+            "price_decimal": lambda: [price_decimal(text) for text in texts],
+        }
+        self.stdout.write(f"{'method':<14} {'strings/s':>12} {'us/string':>10}")
+        for name, run in methods.items():
+            best = float("inf")
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                run()
+                best = min(best, time.perf_counter() - start)
+            self.stdout.write(f"{name:<14} {len(texts) / best:>12.0f} {best / len(texts) * 1e6:>10.2f}")
+
+        disagreements = [
+            (text, legacy, new) for text in dict.fromkeys(texts)
+            if (legacy := legacy_extract_price(text)) != (new := price_decimal(text))
+        ]
+        for text, legacy, new in disagreements:
+            self.stdout.write(self.style.WARNING(f"{text!r}: legacy {legacy} -> now {new}"))
@@ -0,0 +1,31 @@
+import os
+
+from django.core.management.base import BaseCommand
+from scrapy.crawler import CrawlerProcess
+from scrapy.utils.project import get_project_settings
+
+from scrapy_scraper.spiders.due_prices import SOURCES
+
+
+class Command(BaseCommand):
+    help = "Crawl every due product page in this process with the Scrapy spider and bulk-write the prices."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", choices=("all",) + SOURCES, default="all")
+        parser.add_argument("--limit", type=int, help="Stop after this many pages")
+
+    def handle(self, *args, **options):
+        os.environ.setdefault("SCRAPY_SETTINGS_MODULE", "scrapy_scraper.settings")
+        process = CrawlerProcess(get_project_settings())
+        crawler = process.create_crawler("due_prices")
+        process.crawl(crawler, source=options["source"], limit=options["limit"])
+        process.start()
+
+        stats = crawler.stats.get_stats()
+        self.stdout.write(
+            f"Crawled {stats.get('response_received_count', 0)} pages: {stats.get('prices/written', 0)} prices written, "
+            f"{stats.get('prices/unchanged', 0)} unchanged, "
+            f"{stats.get('prices/missing', 0)} without a static price "
+            f"({stats.get('prices/handed_to_browser', 0)} handed to the browser tier), {stats.get('prices/failed', 0)} failed, "
+            f"{stats.get('throttle/circuit_open', 0)} skipped on open circuits"
+        )
@@ -0,0 +1,46 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from scraper.exports import DATASETS, FORMATS, parquet_available, stream_export
+
+
+class Command(BaseCommand):
+    help = "Stream a dataset (scraped data, competitor products, price history, recommendations) to a file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=list(DATASETS))
+        parser.add_argument("--format", dest="export_format", choices=FORMATS, default="csv")
+        parser.add_argument("--output", "-o", help="File to write; defaults to stdout")
+        parser.add_argument("--tenant", type=int, help="Only rows belonging to this company id")
+        parser.add_argument("--start", help="Only rows on or after this ISO datetime")
+        parser.add_argument("--end", help="Only rows before this ISO datetime")
+        parser.add_argument("--chunk-size", type=int, default=settings.SCRAPER_EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options["export_format"] == "parquet" and not parquet_available():
+            raise CommandError("Parquet export needs pyarrow installed")
+        bounds = {}
+        for name in ("start", "end"):
+            if options[name]:
+                bounds[name] = parse_datetime(options[name])
+                if bounds[name] is None:
+                    raise CommandError(f"Invalid --{name} datetime: {options[name]}")
+
+        chunks = stream_export(
+            options["dataset"], options["export_format"], tenant_id=options["tenant"],
+            chunk_size=options["chunk_size"], **bounds,
+        )
+        output = open(options["output"], "wb") if options["output"] else sys.stdout.buffer
+        written = 0
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if options["output"]:
+                output.close()
+        if options["output"]:
+            self.stderr.write(f"Wrote {written} bytes to {options['output']}")
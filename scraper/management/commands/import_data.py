@@ -0,0 +1,38 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from scraper.imports import COLUMNS, FORMATS, import_rows, read_rows
+from scraper.models import Tenant
+
+
+class Command(BaseCommand):
+    help = "Bulk upsert products, competitors or competitor products for a company from a CSV or NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=list(COLUMNS))
+        parser.add_argument("path", help="CSV (with a header row) or NDJSON file")
+        parser.add_argument("--tenant", type=int, required=True, help="Company id the rows belong to")
+        parser.add_argument("--format", dest="file_format", choices=FORMATS, help="Defaults to the file extension")
+        parser.add_argument("--batch-size", type=int, default=settings.SCRAPER_IMPORT_BATCH_SIZE)
+        parser.add_argument("--errors", help="Write the full per-row error report to this JSON file")
+
+    def handle(self, *args, **options):
+        if not Tenant.objects.filter(id=options["tenant"]).exists():
+            raise CommandError(f"Company {options['tenant']} does not exist")
+        file_format = options["file_format"] or options["path"].rsplit(".", 1)[-1].lower()
+        if file_format not in FORMATS:
+            raise CommandError(f"Can't tell the format of {options['path']}; pass --format")
+
+        with open(options["path"], "rb") as stream:
+            report = import_rows(
+                options["kind"], options["tenant"], read_rows(stream, file_format), batch_size=options["batch_size"]
+            )
+
+        self.stdout.write(f"Imported {report['imported']} {options['kind']}, rejected {len(report['errors'])} rows")
+        for error in report["errors"][:20]:
+            self.stderr.write(f"  row {error['row']}: {json.dumps(error['errors'])}")
+        if options["errors"]:
+            with open(options["errors"], "w") as out:
+                json.dump(report["errors"], out, indent=2)
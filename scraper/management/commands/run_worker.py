@@ -0,0 +1,41 @@
+import os
+import shutil
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Start a Celery worker for one queue with that queue's pool, concurrency and prefetch from WORKER_QUEUES."
+
+    def add_arguments(self, parser):
+        parser.add_argument("queue", choices=list(settings.WORKER_QUEUES))
+        parser.add_argument("--loglevel", default="info")
+        parser.add_argument("--dry-run", action="store_true", help="Print the worker command instead of running it")
+
+    def handle(self, *args, **options):
+        queue = options["queue"]
+        profile = settings.WORKER_QUEUES[queue]
+        argv = [
+            "celery", "-A", "backend", "worker",
+            "-Q", queue,
+            "-n", f"{queue}@%h",
+            "-P", profile["pool"],
+            "--prefetch-multiplier", str(profile["prefetch"]),
+            "--loglevel", options["loglevel"],
+        ]
+        if profile["autoscale"] and profile["pool"] == "prefork":
+            argv += ["--autoscale", profile["autoscale"]]
+        else:
+            argv += ["-c", str(profile["concurrency"])]
+
+        if options["dry_run"]:
+            self.stdout.write(" ".join(argv))
+            return
+        executable = shutil.which("celery")
+        if executable is None:
+            raise CommandError("The celery command is not on PATH")
+        # Exec rather than start the worker in this process: gevent has to patch the
+        # standard library before Django and requests are imported, which the celery
+        # command does on startup.
+        os.execv(executable, argv)
@@ -0,0 +1,73 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:09
+
+import json
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# The dispatcher table as of this migration, frozen so later changes to
+# scraper.scheduling don't change what it creates: frequency -> tick in seconds.
+DISPATCH_TICKS = {
+    'minutes': 60,
+    'hourly': 300,
+    'daily': 900,
+    'monthly': 3600,
+}
+
+
+def convert_per_product_tasks(apps, schema_editor):
+    """Fold the old update_product_<id> beat entries into the per-frequency dispatchers."""
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    PeriodicTasks = apps.get_model('django_celery_beat', 'PeriodicTasks')
+    IntervalSchedule = apps.get_model('django_celery_beat', 'IntervalSchedule')
+    ScrapedData = apps.get_model('scraper', 'ScrapedData')
+    now = timezone.now()
+
+    legacy_tasks = PeriodicTask.objects.filter(name__startswith='update_product_', task='scraper.task.update_scraped_data')
+    enabled_ids, disabled_ids = [], []
+    for task in legacy_tasks:
+        try:
+            product_id = json.loads(task.args)[0]
+        except (ValueError, IndexError, TypeError):
+            continue
+        (enabled_ids if task.enabled else disabled_ids).append(product_id)
+
+    ScrapedData.objects.filter(id__in=enabled_ids).update(is_active=True, next_run_at=now)
+    ScrapedData.objects.filter(id__in=disabled_ids).update(is_active=False)
+    ScrapedData.objects.filter(is_active=True, next_run_at__isnull=True).update(next_run_at=now)
+    legacy_tasks.delete()
+
+    for frequency, every in DISPATCH_TICKS.items():
+        schedule, _ = IntervalSchedule.objects.get_or_create(every=every, period='seconds')
+        PeriodicTask.objects.update_or_create(
+            name=f'dispatch_scrapes_{frequency}',
+            defaults={
+                'interval': schedule,
+                'task': 'scraper.task.dispatch_due_scrapes',
+                'args': json.dumps([frequency]),
+                'enabled': True,
+            },
+        )
+    # Tell a running DatabaseScheduler to reload its schedule.
+    PeriodicTasks.objects.update_or_create(ident=1, defaults={'last_update': now})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0008_remove_pricerecommendation_generated_at_and_more'),
+        ('django_celery_beat', '0019_alter_periodictasks_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapeddata',
+            name='next_run_at',
+            field=models.DateTimeField(blank=True, help_text='When the frequency dispatcher should scrape this product next', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='scrapeddata',
+            index=models.Index(fields=['is_active', 'update_frequency', 'next_run_at'], name='scrapeddata_due_idx'),
+        ),
+        migrations.RunPython(convert_per_product_tasks, migrations.RunPython.noop),
+    ]
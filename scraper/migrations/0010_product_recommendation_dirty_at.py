@@ -0,0 +1,39 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:16
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def create_recompute_schedule(apps, schema_editor):
+    # Spelled out rather than taken from scraper.scheduling, which may change after this migration.
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    PeriodicTasks = apps.get_model('django_celery_beat', 'PeriodicTasks')
+    IntervalSchedule = apps.get_model('django_celery_beat', 'IntervalSchedule')
+    schedule, _ = IntervalSchedule.objects.get_or_create(every=30, period='seconds')
+    PeriodicTask.objects.update_or_create(
+        name='recompute_dirty_recommendations',
+        defaults={
+            'interval': schedule,
+            'task': 'scraper.task.recompute_dirty_recommendations',
+            'args': '[]',
+            'enabled': True,
+        },
+    )
+    PeriodicTasks.objects.update_or_create(ident=1, defaults={'last_update': timezone.now()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0009_scrapeddata_next_run_at'),
+        ('django_celery_beat', '0019_alter_periodictasks_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='recommendation_dirty_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Set when competitor prices changed since the last recommendation', null=True),
+        ),
+        migrations.RunPython(create_recompute_schedule, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:19
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0010_product_recommendation_dirty_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompetitorPriceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=4)),
+                ('bucket', models.DateTimeField(help_text='Start of the hour or day (UTC) this row covers')),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('last_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('last_recorded_at', models.DateTimeField()),
+                ('samples', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='competitorpricehistory',
+            name='recorded_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='competitorpricehistory',
+            index=models.Index(fields=['competitor_product', 'recorded_at'], name='pricehistory_series_idx'),
+        ),
+        migrations.AddField(
+            model_name='competitorpricerollup',
+            name='competitor_product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_rollups', to='scraper.competitorproduct'),
+        ),
+        migrations.AddConstraint(
+            model_name='competitorpricerollup',
+            constraint=models.UniqueConstraint(fields=('competitor_product', 'resolution', 'bucket'), name='pricerollup_bucket_unique'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:20
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Avg, Count, Max, Min
+
+
+def backfill_market_stats(apps, schema_editor):
+    """Compute the stats of every existing product that has priced competitors."""
+    CompetitorProduct = apps.get_model('scraper', 'CompetitorProduct')
+    ProductMarketStats = apps.get_model('scraper', 'ProductMarketStats')
+    aggregates = (
+        CompetitorProduct.objects.filter(price_value__isnull=False)
+        .values('product_id')
+        .annotate(count=Count('id'), low=Min('price_value'), high=Max('price_value'), mean=Avg('price_value'))
+        .order_by('product_id')
+    )
+    ProductMarketStats.objects.bulk_create(
+        (
+            ProductMarketStats(
+                product_id=row['product_id'], competitor_count=row['count'],
+                min_price=row['low'], max_price=row['high'], mean_price=round(Decimal(row['mean']), 2),
+            )
+            for row in aggregates.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0011_competitor_price_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductMarketStats',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='market_stats', serialize=False, to='scraper.product')),
+                ('competitor_count', models.PositiveIntegerField(default=0)),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('max_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('mean_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_market_stats, migrations.RunPython.noop),
+    ]
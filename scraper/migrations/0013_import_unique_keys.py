@@ -0,0 +1,96 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:23
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, Max, Min
+
+
+def _duplicate_groups(model, fields):
+    """Values of `fields` shared by more than one row."""
+    return (
+        model.objects.values(*fields)
+        .annotate(rows=Count('id'))
+        .filter(rows__gt=1)
+        .order_by(*fields)
+    )
+
+
+def merge_duplicate_competitor_products(apps, schema_editor):
+    """
+    Keep one CompetitorProduct per (product, product_url), the most recently checked,
+    and move the others' price history onto it. Their rollups are dropped with them;
+    the kept row's rollups only cover its own history. Market stats of the affected
+    products are recomputed, since they counted every duplicate.
+    """
+    CompetitorProduct = apps.get_model('scraper', 'CompetitorProduct')
+    CompetitorPriceHistory = apps.get_model('scraper', 'CompetitorPriceHistory')
+    ProductMarketStats = apps.get_model('scraper', 'ProductMarketStats')
+
+    product_ids = set()
+    for group in _duplicate_groups(CompetitorProduct, ['product_id', 'product_url']):
+        keep, *duplicates = CompetitorProduct.objects.filter(
+            product_id=group['product_id'], product_url=group['product_url'],
+        ).order_by('-last_checked', '-id').values_list('id', flat=True)
+        CompetitorPriceHistory.objects.filter(competitor_product_id__in=duplicates).update(competitor_product_id=keep)
+        CompetitorProduct.objects.filter(id__in=duplicates).delete()
+        product_ids.add(group['product_id'])
+
+    if not product_ids:
+        return
+    ProductMarketStats.objects.filter(product_id__in=product_ids).delete()
+    aggregates = (
+        CompetitorProduct.objects.filter(product_id__in=product_ids, price_value__isnull=False)
+        .values('product_id')
+        .annotate(count=Count('id'), low=Min('price_value'), high=Max('price_value'), mean=Avg('price_value'))
+        .order_by('product_id')
+    )
+    ProductMarketStats.objects.bulk_create(
+        ProductMarketStats(
+            product_id=row['product_id'], competitor_count=row['count'],
+            min_price=row['low'], max_price=row['high'], mean_price=round(Decimal(row['mean']), 2),
+        )
+        for row in aggregates
+    )
+
+
+def rename_duplicate_products(apps, schema_editor):
+    """
+    Products sharing a name within a tenant keep their data (competitor URLs and
+    recommendations hang off them) and get told apart by name: the oldest keeps it,
+    the others become "name (2)", "name (3)", ...
+    """
+    Product = apps.get_model('scraper', 'Product')
+    for group in _duplicate_groups(Product, ['tenant_id', 'name']):
+        taken = set(Product.objects.filter(tenant_id=group['tenant_id']).values_list('name', flat=True))
+        duplicates = Product.objects.filter(tenant_id=group['tenant_id'], name=group['name']).order_by('id')[1:]
+        suffix = 2
+        for product in duplicates:
+            while True:
+                tag = f" ({suffix})"
+                name = group['name'][:255 - len(tag)] + tag
+                suffix += 1
+                if name not in taken:
+                    break
+            taken.add(name)
+            Product.objects.filter(id=product.id).update(name=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0012_productmarketstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_competitor_products, migrations.RunPython.noop),
+        migrations.RunPython(rename_duplicate_products, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='competitorproduct',
+            constraint=models.UniqueConstraint(fields=('product', 'product_url'), name='competitorproduct_url_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(fields=('tenant', 'name'), name='product_tenant_name_unique'),
+        ),
+    ]
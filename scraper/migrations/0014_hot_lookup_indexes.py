@@ -0,0 +1,33 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0013_import_unique_keys'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='competitor',
+            index=models.Index(fields=['tenant', 'name'], name='competitor_tenant_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='competitorproduct',
+            index=models.Index(fields=['product', 'price_value'], name='competitorproduct_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='competitorproduct',
+            index=models.Index(fields=['product_url'], name='competitorproduct_url_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pricerecommendation',
+            index=models.Index(fields=['product', '-calculated_at'], name='recommendation_latest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scrapeddata',
+            index=models.Index(fields=['user_identifier', 'id'], name='scrapeddata_user_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def point_to_latest(apps, schema_editor):
+    Product = apps.get_model('scraper', 'Product')
+    PriceRecommendation = apps.get_model('scraper', 'PriceRecommendation')
+    latest = (
+        PriceRecommendation.objects.filter(product=OuterRef('pk'))
+        .order_by('-calculated_at', '-id')
+        .values('id')[:1]
+    )
+    Product.objects.update(current_recommendation=Subquery(latest))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0014_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='current_recommendation',
+            field=models.OneToOneField(blank=True, help_text='Latest recommendation, kept in step with every recommendation write', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='current_for', to='scraper.pricerecommendation'),
+        ),
+        migrations.RunPython(point_to_latest, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:39
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# Stored prices are re-read into the new columns by `manage.py backfill_prices`, which
+# uses the live parser and FX rates; a migration has to stay reproducible without them.
+
+
+def create_fx_refresh_schedule(apps, schema_editor):
+    # Spelled out rather than taken from scraper.scheduling, which may change after this migration.
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    PeriodicTasks = apps.get_model('django_celery_beat', 'PeriodicTasks')
+    IntervalSchedule = apps.get_model('django_celery_beat', 'IntervalSchedule')
+    schedule, _ = IntervalSchedule.objects.get_or_create(every=3600, period='seconds')
+    PeriodicTask.objects.update_or_create(
+        name='refresh_fx_rates',
+        defaults={'interval': schedule, 'task': 'scraper.task.refresh_fx_rates', 'args': '[]', 'enabled': True},
+    )
+    PeriodicTasks.objects.update_or_create(ident=1, defaults={'last_update': timezone.now()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0015_product_current_recommendation'),
+        ('django_celery_beat', '0019_alter_periodictasks_options'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='competitorproduct',
+            name='competitorproduct_price_idx',
+        ),
+        migrations.AddField(
+            model_name='competitorproduct',
+            name='currency',
+            field=models.CharField(blank=True, help_text='ISO code of price_value; blank when the page named none', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='competitorproduct',
+            name='normalized_price',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='price_value in PRICING_CURRENCY', max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='scrapeddata',
+            name='currency',
+            field=models.CharField(blank=True, help_text='ISO code of price_value; blank when the page named none', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='scrapeddata',
+            name='normalized_price',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='price_value in PRICING_CURRENCY', max_digits=10, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='competitorproduct',
+            index=models.Index(fields=['product', 'normalized_price'], name='competitorproduct_price_idx'),
+        ),
+        migrations.RunPython(create_fx_refresh_schedule, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:51
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def create_adaptive_dispatcher(apps, schema_editor):
+    # Spelled out rather than taken from scraper.scheduling, which may change after this migration.
+    PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+    PeriodicTasks = apps.get_model('django_celery_beat', 'PeriodicTasks')
+    IntervalSchedule = apps.get_model('django_celery_beat', 'IntervalSchedule')
+    schedule, _ = IntervalSchedule.objects.get_or_create(every=60, period='seconds')
+    PeriodicTask.objects.update_or_create(
+        name='dispatch_scrapes_adaptive',
+        defaults={
+            'interval': schedule,
+            'task': 'scraper.task.dispatch_due_scrapes',
+            'args': '["adaptive"]',
+            'enabled': True,
+        },
+    )
+    PeriodicTasks.objects.update_or_create(ident=1, defaults={'last_update': timezone.now()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0017_conditional_fetch_state'),
+        ('django_celery_beat', '0019_alter_periodictasks_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapeddata',
+            name='change_rate',
+            field=models.FloatField(blank=True, help_text='Adaptive only: smoothed share of scrapes that found a new price', null=True),
+        ),
+        migrations.AddField(
+            model_name='scrapeddata',
+            name='scrape_interval',
+            field=models.PositiveIntegerField(blank=True, help_text='Adaptive only: seconds between scrapes', null=True),
+        ),
+        migrations.AddField(
+            model_name='tenant',
+            name='max_scrape_interval',
+            field=models.PositiveIntegerField(blank=True, help_text='Longest interval for adaptive products, in seconds; SCRAPER_ADAPTIVE_MAX_SECONDS when blank', null=True),
+        ),
+        migrations.AddField(
+            model_name='tenant',
+            name='min_scrape_interval',
+            field=models.PositiveIntegerField(blank=True, help_text='Shortest interval for adaptive products, in seconds; SCRAPER_ADAPTIVE_MIN_SECONDS when blank', null=True),
+        ),
+        migrations.AlterField(
+            model_name='scrapeddata',
+            name='update_frequency',
+            field=models.CharField(choices=[('minutes', 'Every Few Minutes'), ('hourly', 'Hourly'), ('daily', 'Daily'), ('monthly', 'Monthly'), ('adaptive', 'Adaptive (follows how often the price changes)')], default='hourly', help_text='How often the product should be updated', max_length=10),
+        ),
+        migrations.RunPython(create_adaptive_dispatcher, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0018_adaptive_update_frequency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapeddata',
+            name='failed_scrapes',
+            field=models.PositiveIntegerField(default=0, help_text='Consecutive crawls whose fetch failed; spaces out the retries'),
+        ),
+    ]
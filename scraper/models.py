@@ -1,12 +1,21 @@
-import re
+import hashlib
 from decimal import Decimal
-from django.db import models
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import Avg, Count, F, Max, Min, OuterRef, Subquery
+from django.utils import timezone
+
+from scraper.caching import invalidate_products, invalidate_scraped_data
+from scraper.fx import conversion_factors, normalize
+from scrapy_scraper.spiders.prices import parse_price
 
 
 
 class Tenant(models.Model):
     user_identifier = models.CharField(max_length=255, unique=True)  # Unique identifier for the tenant (e.g., company ID)
     email = models.EmailField(unique=True, blank=True)
+    min_scrape_interval = models.PositiveIntegerField(null=True, blank=True, help_text="Shortest interval for adaptive products, in seconds; SCRAPER_ADAPTIVE_MIN_SECONDS when blank")
+    max_scrape_interval = models.PositiveIntegerField(null=True, blank=True, help_text="Longest interval for adaptive products, in seconds; SCRAPER_ADAPTIVE_MAX_SECONDS when blank")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -19,18 +28,63 @@ class Product(models.Model):
     description = models.TextField(blank=True)
     cost_price = models.DecimalField(max_digits=10, decimal_places=2, null=True)
     target_margin = models.DecimalField(max_digits=5, decimal_places=2, null=True)
+    recommendation_dirty_at = models.DateTimeField(null=True, blank=True, db_index=True, help_text="Set when competitor prices changed since the last recommendation")
+    current_recommendation = models.OneToOneField(
+        'PriceRecommendation', on_delete=models.SET_NULL, null=True, blank=True, related_name='current_for',
+        help_text="Latest recommendation, kept in step with every recommendation write",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["tenant", "name"], name="product_tenant_name_unique"),
+        ]
+
     def __str__(self):
         return self.name
 
+
+def conflict_target(fields):
+    """`unique_fields` for an upserting bulk_create; MySQL upserts on any unique key and rejects a target."""
+    return fields if connection.features.supports_update_conflicts_with_target else None
+
+
+def mark_products_dirty(product_ids):
+    """
+    Flag products whose competitor prices changed so the recompute worker picks them up.
+    Products already dirty keep their original timestamp, so a burst of price updates
+    is coalesced into one recompute once the debounce window has passed.
+    """
+    return Product.objects.filter(id__in=product_ids, recommendation_dirty_at__isnull=True).update(
+        recommendation_dirty_at=timezone.now()
+    )
+
+
+def read_price(price_str):
+    """
+    (price_value, currency, normalized_price) for a scraped price string: the amount as
+    written, its ISO code ("" if the page named none and no SCRAPER_DEFAULT_CURRENCY is
+    set) and the amount in PRICING_CURRENCY, which is what prices are compared on.
+    """
+    parsed = parse_price(price_str, settings.SCRAPER_DEFAULT_CURRENCY or None)
+    if parsed is None:
+        return None, "", None
+    price_value, currency = parsed.to_decimal(), parsed.currency or ""
+    return price_value, currency, normalize(price_value, currency)
+
+
 class Competitor(models.Model):
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='competitors')
     name = models.CharField(max_length=255)  # Competitor name (e.g., "Competitor A")
     url = models.URLField(unique=True, blank=True)  # URL for competitor's pricing data or to scrape
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["tenant", "name"], name="competitor_tenant_name_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -42,31 +96,186 @@ class CompetitorProduct(models.Model):
     current_price = models.CharField(max_length=50, blank=True)
     previous_price = models.CharField(max_length=50, blank=True)
     price_value = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    currency = models.CharField(max_length=3, blank=True, help_text="ISO code of price_value; blank when the page named none")
+    normalized_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text="price_value in PRICING_CURRENCY")
     last_checked = models.DateTimeField(auto_now=True)  # When the competitor price was last updated
 
+    _loaded_price_value = None  # price_value as last read from or written to the database
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "product_url"], name="competitorproduct_url_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["product", "normalized_price"], name="competitorproduct_price_idx"),
+            models.Index(fields=["product_url"], name="competitorproduct_url_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_price_value = instance.__dict__.get("price_value")
+        return instance
+
     def save(self, *args, **kwargs):
         """ Extract and save numeric price from `current_price` before saving """
-        self.price_value = self.extract_price(self.current_price)
+        self.update_price()
+        price_changed = self.price_value != self._loaded_price_value
         super().save(*args, **kwargs)
+        if price_changed:
+            from scraper.history import record_price_points
+
+            mark_products_dirty([self.product_id])
+            refresh_market_stats([self.product_id])
+            if self.price_value is not None:
+                record_price_points([(self.pk, self.price_value, self.last_checked)])
+            self._loaded_price_value = self.price_value
+
+    def delete(self, *args, **kwargs):
+        product_id = self.product_id
+        result = super().delete(*args, **kwargs)
+        mark_products_dirty([product_id])
+        refresh_market_stats([product_id])
+        return result
 
-    def extract_price(self, price_str):
-        """Extract numeric price from a string (handles '$99.99' or '99.99 USD' formats)."""
-        if not price_str:
-            return None  # Avoid errors on empty price
-        match = re.search(r"[\d.]+", price_str.replace(",", ""))
-        return Decimal(match.group()) if match else None
+    def update_price(self):
+        """Set price_value, currency and normalized_price from `current_price`."""
+        self.price_value, self.currency, self.normalized_price = read_price(self.current_price)
 
     def __str__(self):
         return f"{self.competitor.name} - {self.product.name}"
 
+class ProductMarketStats(models.Model):
+    """Competitor price summary for one product, kept current by `refresh_market_stats`."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='market_stats')
+    competitor_count = models.PositiveIntegerField(default=0)  # Competitor products with a price in PRICING_CURRENCY
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    mean_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def midpoint(self):
+        if self.min_price is None or self.max_price is None:
+            return None
+        return (self.min_price + self.max_price) / 2
+
+    def __str__(self):
+        return f"{self.product} - {self.competitor_count} competitors"
+
+
+def refresh_market_stats(product_ids):
+    """
+    Recompute the market stats of the given products from their competitor prices (in
+    PRICING_CURRENCY) and upsert them in one statement. Only the listed products'
+    competitors are scanned.
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return []
+    stats = {product_id: ProductMarketStats(product_id=product_id) for product_id in product_ids}
+    aggregates = (
+        CompetitorProduct.objects.filter(product_id__in=product_ids, normalized_price__isnull=False)
+        .values("product_id")
+        .annotate(count=Count("id"), low=Min("normalized_price"), high=Max("normalized_price"), mean=Avg("normalized_price"))
+    )
+    for row in aggregates:
+        row_stats = stats[row["product_id"]]
+        row_stats.competitor_count = row["count"]
+        row_stats.min_price, row_stats.max_price = row["low"], row["high"]
+        row_stats.mean_price = round(Decimal(row["mean"]), 2)
+
+    invalidate_products(product_ids)  # Product views nest the stats
+    return ProductMarketStats.objects.bulk_create(
+        stats.values(),
+        update_conflicts=True,
+        unique_fields=conflict_target(["product"]),
+        update_fields=["competitor_count", "min_price", "max_price", "mean_price", "updated_at"],
+    )
+
+
+
+# Columns a new scrape rewrites on ScrapedData and CompetitorProduct rows.
+PRICE_FIELDS = ["previous_price", "current_price", "price_value", "currency", "normalized_price"]
+
+
+def write_competitor_prices(prices):
+    """
+    Save scraped competitor prices, {competitor_product_id: (current_price, checked_at)},
+    doing what `CompetitorProduct.save()` would in batches: one bulk_update, then dirty
+    flags and market stats for the products whose price moved, and every check into the
+    price history (see `record_price_points`). Returns the number of rows written.
+    """
+    from scraper.history import record_price_points
+
+    if not prices:
+        return 0
+    competitor_products = CompetitorProduct.objects.only("id", "product_id", *PRICE_FIELDS).in_bulk(list(prices))
+    changed_products = set()
+    for pk, competitor_product in competitor_products.items():
+        price_before = competitor_product.price_value
+        competitor_product.previous_price = competitor_product.current_price
+        competitor_product.current_price, competitor_product.last_checked = prices[pk]  # bulk_update skips auto_now
+        competitor_product.update_price()
+        if competitor_product.price_value != price_before:
+            changed_products.add(competitor_product.product_id)
+    CompetitorProduct.objects.bulk_update(competitor_products.values(), PRICE_FIELDS + ["last_checked"], batch_size=500)
+    if changed_products:
+        mark_products_dirty(changed_products)
+        refresh_market_stats(changed_products)
+    # Every check is a rollup sample; the history only keeps the changes.
+    record_price_points((cp.pk, cp.price_value, cp.last_checked) for cp in competitor_products.values())
+    return len(competitor_products)
+
+
+def touch_competitor_products(competitor_product_ids, checked_at):
+    """Bump last_checked of competitor products found unchanged, and count the check in their rollups."""
+    from scraper.history import record_price_points
+
+    if not competitor_product_ids:
+        return
+    rows = CompetitorProduct.objects.filter(id__in=competitor_product_ids)
+    rows.update(last_checked=checked_at)
+    record_price_points((pk, price, checked_at) for pk, price in rows.values_list("id", "price_value"))
+
 class CompetitorPriceHistory(models.Model):
     competitor_product = models.ForeignKey(CompetitorProduct, on_delete=models.CASCADE, related_name='price_history')
     price = models.DecimalField(max_digits=10, decimal_places=2)
-    recorded_at = models.DateTimeField(auto_now_add=True)
+    recorded_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["competitor_product", "recorded_at"], name="pricehistory_series_idx"),
+        ]
 
     def __str__(self):
         return f"{self.competitor_product} - {self.price} on {self.recorded_at}"
 
+
+class CompetitorPriceRollup(models.Model):
+    """Min/max/last price per competitor product per hour or day, maintained as history is written."""
+    RESOLUTIONS = [
+        ("hour", "Hourly"),
+        ("day", "Daily"),
+    ]
+
+    competitor_product = models.ForeignKey(CompetitorProduct, on_delete=models.CASCADE, related_name='price_rollups')
+    resolution = models.CharField(max_length=4, choices=RESOLUTIONS)
+    bucket = models.DateTimeField(help_text="Start of the hour or day (UTC) this row covers")
+    min_price = models.DecimalField(max_digits=10, decimal_places=2)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2)
+    last_price = models.DecimalField(max_digits=10, decimal_places=2)
+    last_recorded_at = models.DateTimeField()
+    samples = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["competitor_product", "resolution", "bucket"], name="pricerollup_bucket_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.competitor_product} - {self.resolution} {self.bucket}"
+
 # 7. Price Recommendation (result of the engine)
 class PriceRecommendation(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -75,15 +284,38 @@ class PriceRecommendation(models.Model):
     competitor_data_used = models.JSONField(blank=True, null=True)
     calculated_at = models.DateTimeField(auto_now_add=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["product", "-calculated_at"], name="recommendation_latest_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            Product.objects.filter(id=self.product_id).update(current_recommendation=self)
+
     def __str__(self):
         return f"Recommendation for {self.product.name} - {self.recommended_price}"
 
+
+def point_to_latest_recommendations(product_ids, batch_size=1000):
+    """Repoint `current_recommendation` of the given products at their newest recommendation, one UPDATE per batch."""
+    latest = (
+        PriceRecommendation.objects.filter(product=OuterRef("pk"))
+        .order_by("-calculated_at", "-id")
+        .values("id")[:1]
+    )
+    product_ids = list(product_ids)
+    for start in range(0, len(product_ids), batch_size):
+        Product.objects.filter(id__in=product_ids[start:start + batch_size]).update(current_recommendation=Subquery(latest))
+
 class ScrapedData(models.Model):
     UPDATE_FREQUENCIES = [
         ("minutes", "Every Few Minutes"),
         ("hourly", "Hourly"),
         ("daily", "Daily"),
         ("monthly", "Monthly"),
+        ("adaptive", "Adaptive (follows how often the price changes)"),
     ]
 
     user_identifier = models.CharField(max_length=255, help_text="Unique identifier for the user")
@@ -91,6 +323,8 @@ class ScrapedData(models.Model):
     product_name = models.CharField(max_length=255)
     current_price = models.CharField(max_length=50)
     price_value = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)  # Extracted numeric price
+    currency = models.CharField(max_length=3, blank=True, help_text="ISO code of price_value; blank when the page named none")
+    normalized_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text="price_value in PRICING_CURRENCY")
     previous_price = models.CharField(max_length=50, null=True, blank=True)
     discount = models.CharField(max_length=20, null=True, blank=True)
     is_active = models.BooleanField(default=False)
@@ -103,18 +337,101 @@ class ScrapedData(models.Model):
         default="hourly",
         help_text="How often the product should be updated"
     )
+    next_run_at = models.DateTimeField(null=True, blank=True, help_text="When the frequency dispatcher should scrape this product next")
+    last_checked = models.DateTimeField(null=True, blank=True, help_text="When the page was last fetched, changed or not")
+    change_rate = models.FloatField(null=True, blank=True, help_text="Adaptive only: smoothed share of scrapes that found a new price")
+    scrape_interval = models.PositiveIntegerField(null=True, blank=True, help_text="Adaptive only: seconds between scrapes")
+    failed_scrapes = models.PositiveIntegerField(default=0, help_text="Consecutive crawls whose fetch failed; spaces out the retries")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["is_active", "update_frequency", "next_run_at"], name="scrapeddata_due_idx"),
+            models.Index(fields=["user_identifier", "id"], name="scrapeddata_user_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         """ Extract and save numeric price from `current_price` before saving """
-        self.price_value = self.extract_price(self.current_price)
+        self.update_price()
+        if self.is_active and self.next_run_at is None:
+            self.next_run_at = timezone.now()  # Due on the dispatcher's next tick
         super().save(*args, **kwargs)
 
-    def extract_price(self, price_str):
-        """Extract numeric price from a string (handles '$99.99' or '99.99 USD' formats)."""
-        if not price_str:
-            return None  # Avoid errors on empty price
-        match = re.search(r"[\d.]+", price_str.replace(",", ""))
-        return Decimal(match.group()) if match else None
+    def update_price(self):
+        """Set price_value, currency and normalized_price from `current_price`."""
+        self.price_value, self.currency, self.normalized_price = read_price(self.current_price)
 
     def __str__(self):
         return f"{self.product_name} - {self.user_identifier}"
+
+
+class FetchState(models.Model):
+    """
+    What the last fetch of a page returned, keyed by URL: its validators, sent back as a
+    conditional request, and a hash of its price region, so an unchanged page is neither
+    re-extracted nor re-written. Shared by every row that tracks the same URL.
+    """
+    url_hash = models.CharField(max_length=40, unique=True)  # sha1 of url; URLs are too long for a MySQL unique key
+    url = models.URLField(max_length=2000)
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    content_hash = models.CharField(max_length=40, blank=True)  # sha1 of the price region text
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.url
+
+    @staticmethod
+    def hash_url(url):
+        return hashlib.sha1(url.encode()).hexdigest()
+
+
+def load_fetch_states(urls):
+    """{url: fetch_state} for the given URLs that have been fetched before, in the form the fetchers take."""
+    hashes = {FetchState.hash_url(url): url for url in urls}
+    states = FetchState.objects.filter(url_hash__in=list(hashes)).values("url_hash", "etag", "last_modified", "content_hash")
+    return {hashes[state.pop("url_hash")]: state for state in states}
+
+
+def save_fetch_states(states):
+    """Upsert {url: fetch_state} as returned by the fetchers, in one statement."""
+    rows = [
+        FetchState(
+            url_hash=FetchState.hash_url(url), url=url,
+            etag=state["etag"][:255], last_modified=state["last_modified"][:64], content_hash=state["content_hash"],
+        )
+        for url, state in states.items() if state
+    ]
+    return FetchState.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=conflict_target(["url_hash"]),
+        update_fields=["etag", "last_modified", "content_hash", "updated_at"],
+    )
+
+
+def renormalize_prices(batch_size=1000):
+    """
+    Recompute normalized_price from current FX rates, one UPDATE per foreign currency,
+    then refresh the market stats of (and reprice) the products whose competitors moved.
+    Returns the number of rows updated.
+    """
+    updated = 0
+    for model in (CompetitorProduct, ScrapedData):
+        currencies = set(model.objects.exclude(currency="").values_list("currency", flat=True).distinct())
+        for currency, factor in conversion_factors(currencies).items():
+            rows = model.objects.filter(currency=currency)
+            if factor is None:
+                updated += rows.filter(normalized_price__isnull=False).update(normalized_price=None)
+            else:
+                updated += rows.update(normalized_price=F("price_value") * factor)
+    invalidate_scraped_data()
+
+    product_ids = list(
+        CompetitorProduct.objects.exclude(currency="").exclude(currency=settings.PRICING_CURRENCY)
+        .values_list("product_id", flat=True).distinct()
+    )
+    for start in range(0, len(product_ids), batch_size):
+        batch = product_ids[start:start + batch_size]
+        mark_products_dirty(batch)
+        refresh_market_stats(batch)
+    return updated
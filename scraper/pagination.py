@@ -0,0 +1,21 @@
+from rest_framework.pagination import CursorPagination
+
+
+class StableCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the primary key: each page is an indexed range scan from the
+    cursor, so the cost of a page does not grow with the table or with page depth.
+    """
+    ordering = "-id"
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+
+class CursorPaginatedListMixin:
+    """For APIViews: serialize one cursor page of `queryset` instead of the whole table."""
+    pagination_class = StableCursorPagination
+
+    def paginated_response(self, request, queryset, serializer_class):
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(serializer_class(page, many=True).data)
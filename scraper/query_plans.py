@@ -0,0 +1,178 @@
+import json
+import random
+import re
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Avg, Count, Max, Min
+from django.utils import timezone
+
+from scraper.exports import DATASETS, export_queryset
+from scraper.history import bucket_start, price_series
+from scraper.models import (
+    Competitor, CompetitorPriceHistory, CompetitorPriceRollup, CompetitorProduct, PriceRecommendation, Product,
+    ScrapedData, Tenant, point_to_latest_recommendations,
+)
+
+
+def hot_querysets(sample):
+    """
+    The querysets behind the views and tasks that run most often, as (name, queryset).
+    `sample` supplies existing ids/values so each lookup hits real rows.
+    """
+    now = timezone.now()
+    return [
+        ("product detail", Product.objects.select_related("market_stats").filter(id=sample["product_id"])),
+        ("product list page", Product.objects.select_related("market_stats").order_by("-id")[:11]),
+        ("scraped data by user", ScrapedData.objects.filter(user_identifier=sample["user_identifier"]).order_by("-id")[:11]),
+        ("due scrapes claim", ScrapedData.objects.select_for_update(skip_locked=True)
+            .filter(is_active=True, update_frequency="hourly", next_run_at__lte=now)
+            .order_by("next_run_at").values_list("id", flat=True)[:5000]),
+        ("current recommendation", PriceRecommendation.objects.select_related("product__market_stats")
+            .filter(current_for__id=sample["product_id"])),
+        ("current recommendations for many", PriceRecommendation.objects.select_related("product__market_stats")
+            .filter(current_for__id__in=sample["product_ids"][:500])),
+        ("recommendation list page", PriceRecommendation.objects.select_related("product__market_stats").order_by("-id")[:11]),
+        ("market stats refresh", CompetitorProduct.objects.filter(product_id__in=sample["product_ids"], normalized_price__isnull=False)
+            .values("product_id").annotate(count=Count("id"), low=Min("normalized_price"), high=Max("normalized_price"),
+                                           mean=Avg("normalized_price"))),
+        ("competitor products of product", CompetitorProduct.objects.filter(product_id=sample["product_id"]).order_by("-id")[:11]),
+        ("competitor product by url", CompetitorProduct.objects.filter(product_url=sample["product_url"])),
+        ("competitors by name", Competitor.objects.filter(tenant_id=sample["tenant_id"], name__in=["c1", "c2"])),
+        ("price series raw", price_series(sample["competitor_product_id"], start=now - timedelta(days=30))),
+        ("price series hourly", price_series(sample["competitor_product_id"], start=now - timedelta(days=30), resolution="hour")),
+        ("export keyset chunk", export_queryset(DATASETS["price-history"], tenant_id=sample["tenant_id"])
+            .order_by("id").filter(id__gt=sample["history_id"]).values_list(*DATASETS["price-history"].columns)[:5000]),
+        ("dirty products", Product.objects.filter(recommendation_dirty_at__lte=now)
+            .order_by("recommendation_dirty_at").values_list("id", flat=True)[:5000]),
+    ]
+
+
+def explain(queryset):
+    """
+    The plan text, as JSON where the backend offers it since it is easier to inspect.
+    Runs in a transaction so locking querysets (select_for_update) can be explained too.
+    """
+    with transaction.atomic():
+        if connection.vendor in ("mysql", "postgresql"):
+            return queryset.explain(format="json")
+        return queryset.explain()
+
+
+# Backends whose plans full_scans can read.
+PLAN_VENDORS = ("sqlite", "postgresql", "mysql")
+
+SQLITE_SCAN = re.compile(r"\bSCAN (?:TABLE )?(\S+)(.*)")
+
+
+def full_scans(plan, limited=False):
+    """
+    Names of the tables the plan reads in full. With `limited` (a sliced queryset), a
+    SQLite table walk in rowid order that needs no sort stops at the limit, so it is
+    not counted.
+    """
+    if connection.vendor == "sqlite":
+        if limited and "TEMP B-TREE" not in plan:
+            return []
+        scans = (SQLITE_SCAN.search(line) for line in plan.splitlines())
+        return [m.group(1) for m in scans if m and "USING" not in m.group(2) and m.group(1) != "CONSTANT"]
+    if connection.vendor == "postgresql":
+        return [node["Relation Name"] for node in _walk(json.loads(plan)) if node.get("Node Type") == "Seq Scan"]
+    if connection.vendor == "mysql":
+        return [node["table_name"] for node in _walk(json.loads(plan)) if node.get("access_type") == "ALL"]
+    raise NotImplementedError(f"No plan reader for {connection.vendor}")
+
+
+def _walk(node):
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from _walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk(value)
+
+
+def generate_dataset(rows, batch_size=5000):
+    """
+    Fill the (test) database with `rows` products, scraped rows and recommendations,
+    two competitor listings, price points and hourly rollups per product, and return a
+    lookup sample.
+    """
+    now = timezone.now()
+    tenants = Tenant.objects.bulk_create(
+        [Tenant(user_identifier=f"tenant-{i}", email=f"tenant-{i}@example.com") for i in range(20)]
+    )
+    competitors = Competitor.objects.bulk_create(
+        [Competitor(tenant=tenants[i % 20], name=f"c{i}", url=f"https://competitor-{i}.example.com") for i in range(100)]
+    )
+    Product.objects.bulk_create(
+        (Product(tenant=tenants[i % 20], name=f"product-{i}", cost_price=Decimal(random.randint(10, 500)),
+                 target_margin=Decimal(20)) for i in range(rows)),
+        batch_size=batch_size,
+    )
+    product_ids = list(Product.objects.values_list("id", flat=True))
+    CompetitorProduct.objects.bulk_create(
+        (CompetitorProduct(product_id=product_id, competitor=competitors[(product_id + k) % 100],
+                           product_url=f"https://competitor-{k}.example.com/p/{product_id}",
+                           current_price=f"SAR {price}", price_value=Decimal(price), currency="SAR",
+                           normalized_price=Decimal(price))
+         for product_id in product_ids for k in range(2) for price in [random.randint(10, 900)]),
+        batch_size=batch_size,
+    )
+    competitor_product_ids = list(CompetitorProduct.objects.values_list("id", flat=True))
+    CompetitorPriceHistory.objects.bulk_create(
+        (CompetitorPriceHistory(competitor_product_id=cp_id, price=Decimal(random.randint(10, 900)),
+                                recorded_at=now - timedelta(days=random.randint(0, 90)))
+         for cp_id in competitor_product_ids),
+        batch_size=batch_size,
+    )
+    CompetitorPriceRollup.objects.bulk_create(
+        (CompetitorPriceRollup(competitor_product_id=row.competitor_product_id, resolution="hour",
+                               bucket=bucket_start(row.recorded_at, "hour"), min_price=row.price, max_price=row.price,
+                               last_price=row.price, last_recorded_at=row.recorded_at, samples=1)
+         for row in CompetitorPriceHistory.objects.only("competitor_product_id", "price", "recorded_at").iterator()),
+        batch_size=batch_size,
+    )
+    PriceRecommendation.objects.bulk_create(
+        (PriceRecommendation(product_id=product_id, recommended_price=Decimal(100), reason="")
+         for product_id in product_ids),
+        batch_size=batch_size,
+    )
+    frequencies = [choice for choice, _ in ScrapedData.UPDATE_FREQUENCIES]
+    ScrapedData.objects.bulk_create(
+        (ScrapedData(user_identifier=f"tenant-{i % 20}", url=f"https://shop.example.com/p/{i}", product_name=f"p{i}",
+                     current_price="SAR 10", is_active=i % 3 == 0, update_frequency=frequencies[i % 4],
+                     next_run_at=now + timedelta(minutes=random.randint(-60, 60)))
+         for i in range(rows)),
+        batch_size=batch_size,
+    )
+    Product.objects.filter(id__in=product_ids[::50]).update(recommendation_dirty_at=now)
+    point_to_latest_recommendations(product_ids)
+    _analyze()
+
+    sample_product = random.choice(product_ids)
+    return {
+        "product_id": sample_product,
+        "product_ids": product_ids[:1000],
+        "tenant_id": tenants[0].id,
+        "user_identifier": "tenant-3",
+        "competitor_product_id": competitor_product_ids[0],
+        "history_id": CompetitorPriceHistory.objects.order_by("id").values_list("id", flat=True)[len(competitor_product_ids) // 2],
+        "product_url": f"https://competitor-1.example.com/p/{sample_product}",
+    }
+
+
+def _analyze():
+    """Refresh planner statistics so plans reflect the generated volume."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "mysql":
+            tables = [model._meta.db_table for model in (
+                Tenant, Competitor, Product, CompetitorProduct, CompetitorPriceHistory, CompetitorPriceRollup,
+                PriceRecommendation, ScrapedData,
+            )]
+            cursor.execute(f"ANALYZE TABLE {', '.join(tables)}")
+            cursor.fetchall()
+        else:
+            cursor.execute("ANALYZE")
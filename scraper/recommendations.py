@@ -0,0 +1,99 @@
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from scraper.caching import invalidate_recommendations
+from scraper.models import PriceRecommendation, Product, point_to_latest_recommendations
+from scraper.utils import NO_COMPETITORS, WITHIN_MARKET, recommend_optimal_prices
+
+logger = logging.getLogger(__name__)
+
+
+def _reason(case, min_target, midpoint, currency):
+    if case == NO_COMPETITORS:
+        return "No competitors, used margin only"
+    if case == WITHIN_MARKET:
+        return f"Within market range: Target price {min_target:.2f} {currency}, competitor midpoint {midpoint:.2f} {currency}"
+    return "Above market, positioned as premium due to high cost or high margin requirement"
+
+
+def recommend_for_products(products, skip_unchanged=False):
+    """
+    Price every product in the `products` queryset in one pass.
+
+    Competitor min/max/count come from each product's ProductMarketStats row (already in
+    PRICING_CURRENCY, so no per-competitor conversion happens here), the pricing
+    rules run over NumPy arrays, and the recommendations are written with bulk_create.
+    Products without a cost price or target margin are skipped, and with `skip_unchanged`
+    so are products whose current recommendation already has the same price.
+    """
+    rows = list(
+        products.filter(cost_price__isnull=False, target_margin__isnull=False)
+        .values_list("id", "cost_price", "target_margin", "market_stats__min_price", "market_stats__max_price",
+                     "market_stats__competitor_count", "current_recommendation__recommended_price")
+    )
+    if not rows:
+        return []
+
+    currency = settings.PRICING_CURRENCY
+    ids, costs, margins, mins, maxs, counts, latest_prices = zip(*rows)
+    prices, min_targets, midpoints, cases = recommend_optimal_prices(costs, margins, mins, maxs)
+    prices = [Decimal(int(cents)).scaleb(-2) for cents in prices]
+
+    recommendations = [
+        PriceRecommendation(
+            product_id=product_id,
+            recommended_price=price,
+            reason=_reason(case, Decimal(int(min_target)).scaleb(-6), Decimal(int(midpoint)).scaleb(-6), currency),
+            competitor_data_used={
+                "currency": currency,
+                "count": count or 0,
+                "min": float(low) if low is not None else None,
+                "max": float(high) if high is not None else None,
+            },
+        )
+        for product_id, price, min_target, midpoint, case, count, low, high, latest
+        in zip(ids, prices, min_targets, midpoints, cases, counts, mins, maxs, latest_prices)
+        if not (skip_unchanged and latest is not None and price == latest)
+    ]
+    product_ids = [r.product_id for r in recommendations]
+    with transaction.atomic():
+        PriceRecommendation.objects.bulk_create(recommendations, batch_size=1000)
+        # bulk_create doesn't return ids on MySQL, so repoint from the table instead.
+        point_to_latest_recommendations(product_ids)
+        transaction.on_commit(lambda: invalidate_recommendations(product_ids))
+    logger.info(f"Created {len(recommendations)} recommendations")
+    return recommendations
+
+
+def recommend_for_tenant(tenant_id):
+    """Price a tenant's entire catalog; see `recommend_for_products`."""
+    return recommend_for_products(Product.objects.filter(tenant_id=tenant_id))
+
+
+def recompute_dirty_products(debounce_seconds, limit):
+    """
+    Reprice products flagged by `mark_products_dirty` at least `debounce_seconds` ago.
+
+    Flags are cleared in the same transaction as the recommendation writes, before
+    prices are read: a run that fails leaves its products dirty, and a change that
+    lands mid-run waits on the cleared rows and marks them dirty again for the next run
+    instead of being lost. Unchanged prices are not written. Returns (products
+    considered, recommendations created).
+    """
+    cutoff = timezone.now() - timedelta(seconds=debounce_seconds)
+    product_ids = list(
+        Product.objects.filter(recommendation_dirty_at__lte=cutoff)
+        .order_by("recommendation_dirty_at")
+        .values_list("id", flat=True)[:limit]
+    )
+    if not product_ids:
+        return 0, 0
+    with transaction.atomic():
+        Product.objects.filter(id__in=product_ids, recommendation_dirty_at__lte=cutoff).update(recommendation_dirty_at=None)
+        created = recommend_for_products(Product.objects.filter(id__in=product_ids), skip_unchanged=True)
+    return len(product_ids), len(created)
@@ -0,0 +1,30 @@
+from scrapy_scraper.spiders.fetcher import HTTP_TIER
+
+# One queue per kind of work, each served by workers sized for it (WORKER_QUEUES in
+# settings, started with `manage.py run_worker <queue>`), so a surge of scrapes never
+# holds the slots recommendations need.
+SCRAPE_BROWSER_QUEUE = "scrape-browser"  # Chrome: few prefork slots, one task at a time each
+SCRAPE_HTTP_QUEUE = "scrape-http"  # Plain HTTP: many gevent greenlets
+RECOMMEND_QUEUE = "recommend"  # Pricing math over the ORM
+MAINTENANCE_QUEUE = "maintenance"  # Dispatchers, FX refresh and anything unrouted
+
+TASK_QUEUES = {
+    "scraper.task.update_scraped_data": SCRAPE_BROWSER_QUEUE,
+    "scraper.task.update_competitor_products_batch": SCRAPE_BROWSER_QUEUE,
+    "scraper.task.recommend_tenant_catalog": RECOMMEND_QUEUE,
+    "scraper.task.recompute_dirty_recommendations": RECOMMEND_QUEUE,
+    "scraper.task.dispatch_due_scrapes": MAINTENANCE_QUEUE,
+    "scraper.task.refresh_fx_rates": MAINTENANCE_QUEUE,
+}
+
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """
+    Celery router (CELERY_TASK_ROUTES). Batch scrapes go to scrape-http when they were
+    sent for the HTTP tier only and to scrape-browser otherwise; other tasks go to their
+    queue in TASK_QUEUES, and unknown ones to the default (maintenance) queue.
+    """
+    if name == "scraper.task.update_scraped_data_batch":
+        return {"queue": SCRAPE_HTTP_QUEUE if (kwargs or {}).get("tier") == HTTP_TIER else SCRAPE_BROWSER_QUEUE}
+    queue = TASK_QUEUES.get(name)
+    return {"queue": queue} if queue else None
@@ -0,0 +1,207 @@
+import json
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+# How long a product waits between scrapes for each update_frequency.
+FREQUENCY_INTERVALS = {
+    "minutes": timedelta(minutes=1),
+    "hourly": timedelta(hours=1),
+    "daily": timedelta(days=1),
+    "monthly": None,  # Calendar based: midnight UTC on the 1st of the next month
+    "adaptive": timedelta(hours=1),  # Per product (see adapt_schedules); this is the claim lease and first interval
+}
+
+# How often each frequency's dispatcher wakes up to look for due products.
+DISPATCH_TICKS = {
+    "minutes": timedelta(minutes=1),
+    "hourly": timedelta(minutes=5),
+    "daily": timedelta(minutes=15),
+    "monthly": timedelta(hours=1),
+    "adaptive": timedelta(minutes=1),
+}
+
+ADAPTIVE = "adaptive"
+ADAPTIVE_FIELDS = ["change_rate", "scrape_interval", "next_run_at"]
+
+DISPATCH_TASK = "scraper.task.dispatch_due_scrapes"
+
+RECOMPUTE_TASK = "scraper.task.recompute_dirty_recommendations"
+RECOMPUTE_TICK = timedelta(seconds=30)
+
+FX_REFRESH_TASK = "scraper.task.refresh_fx_rates"
+FX_REFRESH_TICK = timedelta(hours=1)
+
+
+def dispatcher_name(frequency):
+    return f"dispatch_scrapes_{frequency}"
+
+
+def compute_next_run(frequency, now=None):
+    """Return when a product on `frequency` should next be scraped, counting from `now`."""
+    now = now or timezone.now()
+    if frequency == "monthly":
+        first_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        return (first_of_month + timedelta(days=32)).replace(day=1)
+    return now + FREQUENCY_INTERVALS[frequency]
+
+
+def claim_due_scrapes(frequency, limit, now=None):
+    """
+    Ids of up to `limit` active products on `frequency` whose next_run_at has passed,
+    oldest first, with next_run_at pushed forward in the same transaction. The due rows
+    are locked while they are claimed and rows another dispatcher or crawl is claiming
+    are skipped, so concurrent callers never get the same product.
+    """
+    from scraper.models import ScrapedData
+
+    now = now or timezone.now()
+    with transaction.atomic():
+        due_ids = list(
+            ScrapedData.objects.select_for_update(skip_locked=True)
+            .filter(is_active=True, update_frequency=frequency, next_run_at__lte=now)
+            .order_by("next_run_at")
+            .values_list("id", flat=True)[:limit]
+        )
+        if due_ids:
+            ScrapedData.objects.filter(id__in=due_ids).update(next_run_at=compute_next_run(frequency, now))
+    return due_ids
+
+
+def back_off_failures(products, now=None):
+    """
+    Reschedule ScrapedData instances whose fetch failed: count the failure and make them
+    due again after SCRAPER_FAILURE_BACKOFF_SECONDS, doubled for every earlier consecutive
+    failure, but never later than their regular next run. Instances are modified in place
+    and returned for a bulk_update of ["failed_scrapes", "next_run_at"].
+    """
+    now = now or timezone.now()
+    for product in products:
+        product.failed_scrapes += 1
+        delay = timedelta(seconds=settings.SCRAPER_FAILURE_BACKOFF_SECONDS * 2 ** min(product.failed_scrapes - 1, 20))
+        if product.update_frequency == ADAPTIVE and product.scrape_interval:
+            regular = now + timedelta(seconds=product.scrape_interval)
+        else:
+            regular = compute_next_run(product.update_frequency, now)
+        product.next_run_at = min(now + delay, regular)
+    return products
+
+
+def tenant_interval_bounds(user_identifiers):
+    """
+    {user_identifier: (min_seconds, max_seconds)} for adaptive products, from the tenant's
+    own bounds where set and SCRAPER_ADAPTIVE_MIN/MAX_SECONDS otherwise.
+    """
+    from scraper.models import Tenant
+
+    defaults = (settings.SCRAPER_ADAPTIVE_MIN_SECONDS, settings.SCRAPER_ADAPTIVE_MAX_SECONDS)
+    bounds = dict.fromkeys(user_identifiers, defaults)
+    tenants = Tenant.objects.filter(user_identifier__in=list(bounds)).values_list(
+        "user_identifier", "min_scrape_interval", "max_scrape_interval"
+    )
+    for user_identifier, low, high in tenants:
+        low, high = low or defaults[0], high or defaults[1]
+        bounds[user_identifier] = (low, max(low, high))
+    return bounds
+
+
+def next_adaptive_interval(interval, change_rate, changed, bounds):
+    """
+    Fold one check into the product's change rate (an EWMA of the share of checks that
+    found a new price) and resize its interval so that share moves toward
+    SCRAPER_ADAPTIVE_TARGET_CHANGE. Prices are taken to change as a Poisson process, so
+    a share p seen at interval I means a rate of -ln(1 - p) / I. One check at most halves
+    or doubles the interval, and the result stays within `bounds`.
+    Returns (interval, change_rate).
+    """
+    target = settings.SCRAPER_ADAPTIVE_TARGET_CHANGE
+    smoothing = settings.SCRAPER_ADAPTIVE_SMOOTHING
+    if change_rate is None:
+        change_rate = target
+    change_rate = smoothing * (1.0 if changed else 0.0) + (1 - smoothing) * change_rate
+    share = min(max(change_rate, 0.01), 0.99)
+    factor = min(max(math.log(1 - target) / math.log(1 - share), 0.5), 2.0)
+    low, high = bounds
+    return int(min(max(interval * factor, low), high)), change_rate
+
+
+def adapt_schedules(products, changed_ids, now=None):
+    """
+    Reschedule the adaptive ScrapedData instances among `products` after a check:
+    update change_rate and scrape_interval, and set next_run_at that far from `now`.
+    `changed_ids` holds the ids whose price changed. Instances are modified in place;
+    the adaptive ones are returned for a bulk_update of ADAPTIVE_FIELDS.
+    """
+    adaptive = [product for product in products if product.update_frequency == ADAPTIVE]
+    if not adaptive:
+        return []
+    now = now or timezone.now()
+    bounds = tenant_interval_bounds({product.user_identifier for product in adaptive})
+    first_interval = FREQUENCY_INTERVALS[ADAPTIVE].total_seconds()
+    for product in adaptive:
+        product.scrape_interval, product.change_rate = next_adaptive_interval(
+            product.scrape_interval or first_interval, product.change_rate,
+            product.id in changed_ids, bounds[product.user_identifier],
+        )
+        product.next_run_at = now + timedelta(seconds=product.scrape_interval)
+    return adaptive
+
+
+def ensure_dispatchers(periodic_task_model=None, interval_model=None):
+    """
+    Create (or repair) the single beat entry per frequency that fans out due scrapes.
+    The model arguments let migrations pass their historical models.
+    """
+    if periodic_task_model is None or interval_model is None:
+        from django_celery_beat.models import IntervalSchedule, PeriodicTask
+
+        periodic_task_model, interval_model = PeriodicTask, IntervalSchedule
+
+    for frequency, tick in DISPATCH_TICKS.items():
+        schedule, _ = interval_model.objects.get_or_create(
+            every=int(tick.total_seconds()), period="seconds"
+        )
+        periodic_task_model.objects.update_or_create(
+            name=dispatcher_name(frequency),
+            defaults={
+                "interval": schedule,
+                "task": DISPATCH_TASK,
+                "args": json.dumps([frequency]),
+                "enabled": True,
+            },
+        )
+
+
+def ensure_recommendation_recompute(periodic_task_model=None, interval_model=None):
+    """Create (or repair) the beat entry that reprices products marked dirty by price changes."""
+    if periodic_task_model is None or interval_model is None:
+        from django_celery_beat.models import IntervalSchedule, PeriodicTask
+
+        periodic_task_model, interval_model = PeriodicTask, IntervalSchedule
+
+    schedule, _ = interval_model.objects.get_or_create(
+        every=int(RECOMPUTE_TICK.total_seconds()), period="seconds"
+    )
+    periodic_task_model.objects.update_or_create(
+        name="recompute_dirty_recommendations",
+        defaults={"interval": schedule, "task": RECOMPUTE_TASK, "args": "[]", "enabled": True},
+    )
+
+
+def ensure_fx_refresh(periodic_task_model=None, interval_model=None):
+    """Create (or repair) the beat entry that reloads FX rates and renormalizes stored prices."""
+    if periodic_task_model is None or interval_model is None:
+        from django_celery_beat.models import IntervalSchedule, PeriodicTask
+
+        periodic_task_model, interval_model = PeriodicTask, IntervalSchedule
+
+    schedule, _ = interval_model.objects.get_or_create(
+        every=int(FX_REFRESH_TICK.total_seconds()), period="seconds"
+    )
+    periodic_task_model.objects.update_or_create(
+        name="refresh_fx_rates",
+        defaults={"interval": schedule, "task": FX_REFRESH_TASK, "args": "[]", "enabled": True},
+    )
@@ -1,14 +1,36 @@
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 from scraper.models import *
 
 
+class UniqueConflictMixin:
+    """
+    Report a unique constraint lost to a concurrent write as a 400, the same way the
+    generated unique-together validators report the duplicates they can see.
+    """
+
+    def create(self, validated_data):
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError({"non_field_errors": ["A record with these values already exists."]})
+
+    def update(self, instance, validated_data):
+        try:
+            with transaction.atomic():
+                return super().update(instance, validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError({"non_field_errors": ["A record with these values already exists."]})
+
+
 class ScrapedDataSerializer(serializers.ModelSerializer):
     class Meta:
         model = ScrapedData
         fields = [
              'user_identifier', 'url', 'product_name',
-            'current_price', 'price_value', 'previous_price',
-            'discount', 'description', 'timestamp', 'id'
+            'current_price', 'price_value', 'currency', 'normalized_price', 'previous_price',
+            'discount', 'description', 'timestamp', 'last_checked', 'id'
         ]
 
 class ScrapedDataSerializerUpdate(serializers.ModelSerializer):
@@ -20,20 +42,30 @@ class ScrapedDataSerializerUpdate(serializers.ModelSerializer):
 
 
 from rest_framework import serializers
-from .models import Tenant, Product, Competitor, CompetitorProduct, CompetitorPriceHistory, PriceRecommendation, ScrapedData
+from .models import Tenant, Product, Competitor, CompetitorProduct, CompetitorPriceHistory, CompetitorPriceRollup, \
+    PriceRecommendation, ProductMarketStats, ScrapedData
 
 
 class TenantSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tenant
-        fields = ['id', 'user_identifier', 'email', 'created_at', 'updated_at']
+        fields = ['id', 'user_identifier', 'email', 'min_scrape_interval', 'max_scrape_interval', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductMarketStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProductMarketStats
+        fields = ['competitor_count', 'min_price', 'max_price', 'mean_price', 'updated_at']
+        read_only_fields = fields
+
+
+class ProductSerializer(UniqueConflictMixin, serializers.ModelSerializer):
+    market_stats = ProductMarketStatsSerializer(read_only=True)
+
     class Meta:
         model = Product
-        fields = ['id', 'tenant', 'name', 'description', 'cost_price', 'target_margin', 'created_at', 'updated_at']
+        fields = ['id', 'tenant', 'name', 'description', 'cost_price', 'target_margin', 'market_stats', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
@@ -50,8 +82,8 @@ class CompetitorProductSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = CompetitorProduct
-        fields = ['id', 'product', 'competitor', 'product_url', 'current_price', 'previous_price', 'price_value', 'last_checked']
-        read_only_fields = ['id', 'last_checked']
+        fields = ['id', 'product', 'competitor', 'product_url', 'current_price', 'previous_price', 'price_value', 'currency', 'normalized_price', 'last_checked']
+        read_only_fields = ['id', 'price_value', 'currency', 'normalized_price', 'last_checked']
 
 
 class CompetitorPriceHistorySerializer(serializers.ModelSerializer):
@@ -62,7 +94,19 @@ class CompetitorPriceHistorySerializer(serializers.ModelSerializer):
         fields = ['id', 'competitor_product', 'price', 'recorded_at']
         read_only_fields = ['id', 'recorded_at']
 
-class CompetitorProductSerializer(serializers.ModelSerializer):
+class PricePointSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CompetitorPriceHistory
+        fields = ['price', 'recorded_at']
+
+
+class CompetitorPriceRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CompetitorPriceRollup
+        fields = ['bucket', 'min_price', 'max_price', 'last_price', 'samples']
+
+
+class CompetitorProductSerializer(UniqueConflictMixin, serializers.ModelSerializer):
     class Meta:
         model = CompetitorProduct
         fields = '__all__'
@@ -79,5 +123,5 @@ class PriceRecommendationSerializer(serializers.ModelSerializer):
 class ScrapedDataSerializer(serializers.ModelSerializer):
     class Meta:
         model = ScrapedData
-        fields = ['id', 'user_identifier', 'url', 'product_name', 'current_price', 'price_value', 'previous_price', 'discount', 'is_active', 'description', 'timestamp', 'update_frequency']
-        read_only_fields = ['id', 'timestamp']
+        fields = ['id', 'user_identifier', 'url', 'product_name', 'current_price', 'price_value', 'currency', 'normalized_price', 'previous_price', 'discount', 'is_active', 'description', 'timestamp', 'last_checked', 'update_frequency', 'change_rate', 'scrape_interval']
+        read_only_fields = ['id', 'price_value', 'currency', 'normalized_price', 'timestamp', 'last_checked', 'change_rate', 'scrape_interval']
@@ -1,25 +1,74 @@
 
 import logging
-from datetime import datetime, timedelta
-import json
-import pytz
+import random
 from celery import shared_task
-from django_celery_beat.models import PeriodicTask, IntervalSchedule, CrontabSchedule
-from scraper.models import ScrapedData
-from scrapy_scraper.spiders.price_checker import setup_driver, extract_product_data
+from celery.exceptions import MaxRetriesExceededError, Retry
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django_celery_beat.models import PeriodicTask
+from scraper.caching import invalidate_scraped_data
+from scraper.fx import APPLIED_CACHE_KEY, get_rates
+from scraper.models import (
+    CompetitorProduct, ScrapedData, load_fetch_states, renormalize_prices, save_fetch_states, touch_competitor_products,
+    write_competitor_prices,
+)
+from scraper.recommendations import recommend_for_tenant, recompute_dirty_products
+from scraper.scheduling import (
+    ADAPTIVE_FIELDS, DISPATCH_TICKS, FREQUENCY_INTERVALS, adapt_schedules, claim_due_scrapes, compute_next_run,
+)
+from scraper.throttling import fetch_failed, get_throttle
+from scrapy_scraper.spiders.async_engine import scrape_urls
+from scrapy_scraper.spiders.driver_pool import shutdown_driver_pool
+from scrapy_scraper.spiders.fetcher import HTTP_TIER, domain_of, get_fetcher, get_tier_memory
 
 logger = logging.getLogger(__name__)
+
+
+@worker_process_shutdown.connect
+def close_driver_pool(**kwargs):
+    """Quit the warm Chrome sessions held by a Celery worker process as it exits."""
+    shutdown_driver_pool()
+
   # Limits to 10 tasks per minute per worker
-@shared_task
-def update_scraped_data(product_id):
-    """Task to scrape and update product price at set intervals"""
-    driver = setup_driver()
+@shared_task(bind=True)
+def update_scraped_data(self, product_id):
+    """
+    Task to scrape and update product price at set intervals. When the product's domain
+    is rate limited or its circuit is open, the task is retried later with backoff
+    instead of waiting in the worker.
+    """
     try:
         product = ScrapedData.objects.get(id=product_id)
-        new_data = extract_product_data(product.url, driver)
+        throttle, domain = get_throttle(), domain_of(product.url)
+        wait = throttle.acquire(domain)
+        if wait:
+            countdown = throttle.backoff(self.request.retries, wait)
+            logger.info(f"{domain} is throttled, retrying product {product.id} in {countdown:.0f}s")
+            raise self.retry(countdown=countdown, max_retries=settings.SCRAPER_THROTTLE_MAX_RETRIES)
+        states = load_fetch_states([product.url]) if settings.SCRAPER_CONDITIONAL_FETCH else {}
+        try:
+            new_data = get_fetcher().fetch(product.url, states.get(product.url))
+        except Exception:
+            throttle.record(domain, ok=False)
+            raise
+        throttle.record(domain, ok=not fetch_failed(new_data))
+        if new_data and new_data.get("fetch_state"):
+            save_fetch_states({product.url: new_data["fetch_state"]})
+        if new_data and new_data.get("not_modified"):
+            product.last_checked = timezone.now()
+            adapted = adapt_schedules([product], set(), product.last_checked)
+            product.save(update_fields=["last_checked"] + (ADAPTIVE_FIELDS if adapted else []))
+            logger.info(f"Product {product.id} unchanged, price still {product.current_price}")
+            return product.current_price
         if new_data:
+            price_before = product.price_value
             product.previous_price = product.current_price
             product.current_price = new_data.get("current_price", product.current_price)
+            product.last_checked = timezone.now()
+            product.update_price()
+            adapt_schedules([product], {product.id} if product.price_value != price_before else set(), product.last_checked)
             product.save()
             logger.info(f"Updated product {product.id} price to {product.current_price}")
             return product.current_price  # Return the updated price
@@ -27,86 +76,268 @@ def update_scraped_data(product_id):
         logger.warning(f"Product {product_id} not found. Removing scheduled task.")
         PeriodicTask.objects.filter(name=f"update_product_{product_id}").delete()
         return "Product not found"
+    except Retry:
+        raise
+    except MaxRetriesExceededError:
+        logger.warning(f"Product {product_id} still throttled, leaving it for its next run")
+        return "Throttled"
     except Exception as e:
         logger.error(f"Error updating product {product_id}: {e}")
         return str(e)
-    finally:
-        driver.quit()
 
 
-def schedule_product_update(product_id, frequency):
-    """Schedules or updates a periodic Celery Beat task for a specific product with error handling"""
-    try:
-        PERIODS = {
-            "minutes": IntervalSchedule.MINUTES,
-            "hourly": IntervalSchedule.HOURS,
-            "daily": IntervalSchedule.DAYS,
-        }
+def scrape_many(urls, states=None, tier=None):
+    """
+    Scrape `urls` with the engine picked by SCRAPER_BATCH_ENGINE: "async" runs them
+    concurrently on the Playwright engine, "sync" walks them through the shared fetcher.
+    `states` maps URL to the fetch_state of its last scrape, for conditional fetching.
+    With `tier="http"` only the HTTP tier is tried, and pages that need a browser come
+    back with a "needs_browser" key.
+    Returns one dict per URL, in order; failures carry an "error" key, unchanged pages
+    a "not_modified" one.
+    """
+    states = states or {}
+    if settings.SCRAPER_BATCH_ENGINE == "async" and tier != HTTP_TIER:
+        return scrape_urls(urls, states=states)
+    fetcher = get_fetcher()
+    scraped = []
+    for url in urls:
+        try:
+            scraped.append(fetcher.fetch(url, states.get(url), browser=tier != HTTP_TIER))
+        except Exception as e:
+            scraped.append({"url": url, "error": str(e)})
+    return scraped
+
+
+@shared_task
+def update_scraped_data_batch(product_ids=None, frequency=None, attempt=0, tier=None):
+    """
+    Scrape many products in one task: one query to load them, one scrape pass grouped
+    by domain (see scrape_many), and one bulk_update to save them. Pages found unchanged
+    by a conditional fetch only have last_checked bumped; adaptive products are
+    rescheduled either way (see adapt_schedules).
+    Products whose domain is out of tokens or has an open circuit are re-queued as a
+    new batch with backoff; `attempt` counts those re-queues.
+    With `tier="http"` the batch runs on the scrape-http queue without a browser, and
+    products that need one are handed on to a batch on the scrape-browser queue, without
+    an HTTP attempt when their domain is already known to need it (see DomainTierMemory).
+    Returns the new price or the error message for every requested product.
+    """
+    if product_ids is not None:
+        queryset = ScrapedData.objects.filter(id__in=product_ids)
+    elif frequency:
+        queryset = ScrapedData.objects.filter(is_active=True, update_frequency=frequency)
+    else:
+        return {"updated": 0, "results": {}}
 
-        task_name = f"update_product_{product_id}"
-
-        if frequency == "weekly":
-            # Get the current time in UTC
-            now = datetime.utcnow().replace(tzinfo=pytz.utc)
-            start_time = now + timedelta(weeks=1)  # Start exactly a week from now
-
-            schedule, _ = IntervalSchedule.objects.get_or_create(every=7, period=IntervalSchedule.DAYS)
-            existing_task = PeriodicTask.objects.filter(name=task_name).first()
-
-            if existing_task:
-                existing_task.interval = schedule
-                existing_task.start_time = start_time
-                existing_task.save()
-                logger.info(f"Updated existing weekly task: {task_name} to start on {start_time}")
-            else:
-                PeriodicTask.objects.create(
-                    interval=schedule,
-                    name=task_name,
-                    task="scraper.task.update_scraped_data",
-                    args=json.dumps([product_id]),
-                    start_time=start_time,  # Schedule to run one week from now
-                )
-                logger.info(f"Scheduled new weekly task: {task_name}, first run at {start_time}")
-
-        elif frequency == "monthly":
-            cron_schedule, _ = CrontabSchedule.objects.get_or_create(
-                minute="0", hour="0", day_of_month="1", month_of_year="*", day_of_week="*"
+    products = sorted(
+        queryset.only(
+            "id", "url", "user_identifier", "current_price", "previous_price", "price_value", "currency", "normalized_price",
+            "last_checked", "update_frequency", "change_rate", "scrape_interval", "next_run_at",
+        ),
+        key=lambda p: (domain_of(p.url), p.id),
+    )
+    results = {}
+    if product_ids is not None:
+        found = {p.id for p in products}
+        results.update({product_id: "Product not found" for product_id in product_ids if product_id not in found})
+
+    needs_browser = []
+    if tier == HTTP_TIER:
+        browser_domains = get_tier_memory().browser_domains(domain_of(p.url) for p in products)
+        needs_browser = [p.id for p in products if domain_of(p.url) in browser_domains]
+        results.update({product_id: "Handed to the browser tier" for product_id in needs_browser})
+        products = [p for p in products if domain_of(p.url) not in browser_domains]
+
+    throttle = get_throttle()
+    products, deferred, wait = throttle.admit(products, lambda p: domain_of(p.url))
+    if deferred:
+        deferred_ids = [p.id for p in deferred]
+        if attempt < settings.SCRAPER_THROTTLE_MAX_RETRIES:
+            countdown = throttle.backoff(attempt, wait)
+            update_scraped_data_batch.apply_async(
+                args=[deferred_ids], kwargs={"attempt": attempt + 1, "tier": tier}, countdown=countdown
             )
-            existing_task = PeriodicTask.objects.filter(name=task_name).first()
-            if existing_task:
-                existing_task.crontab = cron_schedule
-                existing_task.save()
-                logger.info(f"Updated existing monthly task: {task_name}")
-            else:
-                PeriodicTask.objects.create(
-                    crontab=cron_schedule,
-                    name=task_name,
-                    task="scraper.task.update_scraped_data",
-                    args=json.dumps([product_id]),
-                )
-                logger.info(f"Scheduled new monthly task: {task_name}")
+            results.update({product_id: f"Throttled, retrying in {countdown:.0f}s" for product_id in deferred_ids})
+        else:
+            results.update({product_id: "Throttled" for product_id in deferred_ids})
+        logger.info(f"Deferred {len(deferred)} products on throttled domains (attempt {attempt})")
+
+    urls = [p.url for p in products]
+    states = load_fetch_states(urls) if settings.SCRAPER_CONDITIONAL_FETCH else {}
+    now = timezone.now()
+    updated, unchanged, changed_ids, fetch_states = [], [], set(), {}
+    scraped = scrape_many(urls, states, tier)
+    throttle.record_results((domain_of(product.url), not fetch_failed(new_data)) for product, new_data in zip(products, scraped))
+    for product, new_data in zip(products, scraped):
+        if "error" in new_data:
+            logger.error(f"Error updating product {product.id}: {new_data['error']}")
+            results[product.id] = new_data["error"]
+            continue
+        if new_data.get("needs_browser"):
+            needs_browser.append(product.id)
+            results[product.id] = "Handed to the browser tier"
+            continue
+        if new_data.get("fetch_state"):
+            fetch_states[product.url] = new_data["fetch_state"]
+        product.last_checked = now
+        if new_data.get("not_modified"):
+            unchanged.append(product)
+            results[product.id] = product.current_price
+            continue
+        price_before = product.price_value
+        product.previous_price = product.current_price
+        product.current_price = new_data.get("current_price", product.current_price)
+        product.update_price()
+        if product.price_value != price_before:
+            changed_ids.add(product.id)
+        updated.append(product)
+        results[product.id] = product.current_price
+
+    adapted = {product.id for product in adapt_schedules(updated + unchanged, changed_ids, now)}
+    schedule_fields = ADAPTIVE_FIELDS if adapted else []
+    static_unchanged = [product.id for product in unchanged if product.id not in adapted]
+    if static_unchanged:
+        ScrapedData.objects.filter(id__in=static_unchanged).update(last_checked=now)
+    ScrapedData.objects.bulk_update(
+        [product for product in unchanged if product.id in adapted], ["last_checked"] + ADAPTIVE_FIELDS, batch_size=500
+    )
+    if updated:
+        ScrapedData.objects.bulk_update(
+            updated, ["previous_price", "current_price", "price_value", "currency", "normalized_price", "last_checked"] + schedule_fields,
+            batch_size=500,
+        )
+        invalidate_scraped_data()
+    ScrapedData.objects.filter(id__in=[p.id for p in updated + unchanged], failed_scrapes__gt=0).update(failed_scrapes=0)
+    save_fetch_states(fetch_states)
+    if needs_browser:
+        update_scraped_data_batch.apply_async(args=[needs_browser])
+    logger.info(f"Batch updated {len(updated)} of {len(products)} products, {len(unchanged)} unchanged")
+    return {
+        "updated": len(updated), "unchanged": len(unchanged), "deferred": len(deferred),
+        "needs_browser": len(needs_browser), "results": results,
+    }
 
+
+@shared_task
+def update_competitor_products_batch(competitor_product_ids):
+    """
+    Browser-tier scrape of competitor product pages, for the ones the crawl found without
+    a static price. Prices are written like the crawl writes them (see
+    write_competitor_prices); pages that fail or still show no price are left to come
+    due again by last_checked. Returns {competitor_product_id: price or error}.
+    """
+    rows = list(CompetitorProduct.objects.filter(id__in=competitor_product_ids).order_by("id").values_list("id", "product_url"))
+    urls = [url for _, url in rows]
+    states = load_fetch_states(urls) if settings.SCRAPER_CONDITIONAL_FETCH else {}
+    scraped = scrape_many(urls, states)
+    get_throttle().record_results((domain_of(url), not fetch_failed(new_data)) for url, new_data in zip(urls, scraped))
+
+    now = timezone.now()
+    prices, unchanged, fetch_states, results = {}, [], {}, {}
+    for (pk, url), new_data in zip(rows, scraped):
+        if new_data.get("fetch_state"):
+            fetch_states[url] = new_data["fetch_state"]
+        if new_data.get("not_modified"):
+            unchanged.append(pk)
+            results[pk] = "Unchanged"
+        elif "error" in new_data or new_data.get("current_price", "N/A") == "N/A":
+            results[pk] = new_data.get("error", "No price found")
         else:
-            interval_period = PERIODS.get(frequency)
-            if not interval_period:
-                logger.error(f"Invalid frequency: {frequency}")
-                return "Invalid frequency"
-
-            schedule, _ = IntervalSchedule.objects.get_or_create(every=1, period=interval_period)
-            existing_task = PeriodicTask.objects.filter(name=task_name).first()
-            if existing_task:
-                existing_task.interval = schedule
-                existing_task.save()
-                logger.info(f"Updated existing periodic task: {task_name}")
-            else:
-                PeriodicTask.objects.create(
-                    interval=schedule,
-                    name=task_name,
-                    task="scraper.task.update_scraped_data",
-                    args=json.dumps([product_id]),
-                )
-                logger.info(f"Scheduled new periodic task: {task_name}")
+            prices[pk] = (new_data["current_price"], now)
+            results[pk] = new_data["current_price"]
+    touch_competitor_products(unchanged, now)
+    write_competitor_prices(prices)
+    save_fetch_states(fetch_states)
+    logger.info(f"Browser tier priced {len(prices)} of {len(rows)} competitor products")
+    return results
 
+
+@shared_task
+def dispatch_due_scrapes(frequency):
+    """
+    Beat entry point, one per update_frequency: pick the products whose next_run_at has
+    passed, push their next_run_at forward and hand them to update_scraped_data_batch in
+    chunks spread over the dispatcher's tick so workers see a smooth load.
+    With the sync engine the chunks go to the scrape-http queue first, except products
+    on domains already known to need Chrome, which go straight to scrape-browser; the
+    async engine runs both tiers itself.
+    """
+    due_ids = claim_due_scrapes(frequency, settings.SCRAPER_DISPATCH_MAX_PER_TICK)
+    if not due_ids:
+        return 0
+
+    batches = {None: due_ids}
+    if settings.SCRAPER_BATCH_ENGINE == "sync":
+        domains = {pk: domain_of(url) for pk, url in ScrapedData.objects.filter(id__in=due_ids).values_list("id", "url")}
+        browser_domains = get_tier_memory().browser_domains(domains.values())
+        batches = {
+            None: [pk for pk in due_ids if domains.get(pk) in browser_domains],
+            HTTP_TIER: [pk for pk in due_ids if domains.get(pk) not in browser_domains],
+        }
+
+    chunk_size = settings.SCRAPER_DISPATCH_CHUNK_SIZE
+    jitter = DISPATCH_TICKS[frequency].total_seconds()
+    for tier, ids in batches.items():
+        for start in range(0, len(ids), chunk_size):
+            update_scraped_data_batch.apply_async(
+                args=[ids[start:start + chunk_size]],
+                kwargs={"tier": tier},
+                countdown=random.uniform(0, jitter),
+            )
+    logger.info(f"Dispatched {len(due_ids)} {frequency} products in chunks of {chunk_size}")
+    return len(due_ids)
+
+
+@shared_task
+def recommend_tenant_catalog(tenant_id):
+    """Recompute price recommendations for every product of a tenant in one pass"""
+    created = recommend_for_tenant(tenant_id)
+    logger.info(f"Recommended prices for {len(created)} products of tenant {tenant_id}")
+    return len(created)
+
+
+@shared_task
+def recompute_dirty_recommendations():
+    """Beat entry point: reprice products whose competitor prices changed, once their burst has settled"""
+    considered, created = recompute_dirty_products(
+        settings.RECOMMENDATION_DEBOUNCE_SECONDS, settings.RECOMMENDATION_RECOMPUTE_BATCH
+    )
+    if considered:
+        logger.info(f"Recomputed {considered} dirty products, {created} recommendations changed")
+    return created
+
+
+@shared_task
+def refresh_fx_rates():
+    """Beat entry point: reload FX rates and renormalize stored prices if they moved since last applied"""
+    rates = get_rates(refresh=True)
+    if not rates or cache.get(APPLIED_CACHE_KEY) == rates:
+        return 0
+    updated = renormalize_prices()
+    cache.set(APPLIED_CACHE_KEY, rates, timeout=None)
+    logger.info(f"Renormalized {updated} prices to {settings.PRICING_CURRENCY} with new FX rates")
+    return updated
+
+
+def schedule_product_update(product_id, frequency):
+    """Puts a product on a frequency bucket; its dispatcher picks it up once next_run_at passes"""
+    if frequency not in FREQUENCY_INTERVALS:
+        logger.error(f"Invalid frequency: {frequency}")
+        return "Invalid frequency"
+    try:
+        updated = ScrapedData.objects.filter(id=product_id).update(
+            update_frequency=frequency,
+            is_active=True,
+            next_run_at=compute_next_run(frequency),
+        )
+        if not updated:
+            logger.warning(f"Product {product_id} not found, nothing to schedule")
+            return "Product not found"
+        invalidate_scraped_data()
+        # Products scheduled before the bucketed dispatchers had their own beat entry.
+        PeriodicTask.objects.filter(name=f"update_product_{product_id}").delete()
+        logger.info(f"Scheduled product {product_id} on the {frequency} dispatcher")
     except Exception as e:
         logger.error(f"Error scheduling product {product_id} update task: {e}")
-        return str(e)
\ No newline at end of file
+        return str(e)
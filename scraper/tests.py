@@ -1,3 +1,1067 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from scrapy_scraper.spiders.parsers import BACKENDS, parse_html
+from scrapy_scraper.spiders.price_checker import extract_structured_price, parse_product_data, price_fingerprint
+
+
+class StructuredPriceTests(SimpleTestCase):
+    """Prices only present in meta tags, on every parser backend."""
+
+    PAGES = {
+        "itemprop": '<html><head><meta itemprop="price" content=" 1299.00 "></head><body><h1>Kettle</h1></body></html>',
+        "product:price:amount": '<html><head><meta property="product:price:amount" content="1299.00"></head><body><h1>Kettle</h1></body></html>',
+        "og:price:amount": '<html><head><meta property="og:price:amount" content="1299.00"></head><body><h1>Kettle</h1></body></html>',
+    }
+
+    def test_meta_only_prices(self):
+        for backend in BACKENDS:
+            for name, html in self.PAGES.items():
+                with self.subTest(backend=backend, meta=name):
+                    document = parse_html(html, backend)
+                    self.assertEqual(extract_structured_price(document), "1299.00")
+                    self.assertEqual(parse_product_data(document, "https://shop.example/kettle")["current_price"], "1299.00")
+                    self.assertIsNotNone(price_fingerprint(document, "https://shop.example/kettle"))
+
+    def test_meta_without_content(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                document = parse_html('<html><head><meta itemprop="price"></head></html>', backend)
+                self.assertIsNone(extract_structured_price(document))
+
+
+class PriceParserTests(SimpleTestCase):
+    """Which separator is the decimal mark, and how many minor units that makes."""
+
+    CASES = [
+        ("0.500", None, 50),
+        ("USD 0,500", "USD", 50),
+        ("KWD 0.500", "KWD", 500),
+        ("1,500", None, 150000),
+        ("₦ 4,500", "NGN", 450000),
+        ("1.234,56 €", "EUR", 123456),
+        ("$99.99", "USD", 9999),
+    ]
+
+    def test_amounts(self):
+        from scrapy_scraper.spiders.prices import parse_price
+
+        for text, currency, minor_units in self.CASES:
+            with self.subTest(text=text):
+                parsed = parse_price(text)
+                self.assertEqual((parsed.currency, parsed.minor_units), (currency, minor_units))
+
+
+class ProfileRegistryTests(SimpleTestCase):
+    """Learned selectors come and go; configured ones stay put."""
+
+    def setUp(self):
+        from scrapy_scraper.spiders.profiles import ProfileRegistry
+
+        self.registry = ProfileRegistry({"Shop.example": {"current_price": "span.amount"}})
+
+    def test_configured_selector_is_not_overwritten_or_forgotten(self):
+        self.registry.learn("shop.example", "current_price", "span.price")
+        self.registry.forget("shop.example", "current_price")
+        self.assertEqual(self.registry.get("shop.example").get("current_price"), "span.amount")
+
+    def test_learned_field_of_a_configured_domain_can_be_forgotten(self):
+        self.registry.learn("shop.example", "product_name", "h1")
+        self.assertEqual(self.registry.get("shop.example").get("product_name"), "h1")
+        self.registry.forget("shop.example", "product_name")
+        self.assertIsNone(self.registry.get("shop.example").get("product_name"))
+
+    def test_stale_selector_falls_back_and_is_relearned(self):
+        from scrapy_scraper.spiders.profiles import select_field
+
+        self.registry.learn("other.example", "product_name", "h1")
+        document = parse_html("<h2 class='product-title'>Kettle</h2>", "html.parser")
+        self.assertEqual(select_field(document, "product_name", "other.example", self.registry).text(), "Kettle")
+        self.assertEqual(self.registry.get("other.example").get("product_name"), "h2.product-title")
+
+
+class CrawlPipelineTests(TestCase):
+    """Rows the crawl claimed but could not price must not wait a whole interval, nor be retried every tick."""
+
+    def setUp(self):
+        from scraper.models import Competitor, CompetitorProduct, Product, ScrapedData, Tenant
+
+        self.later = timezone.now() + timedelta(days=30)
+        self.products = [
+            ScrapedData.objects.create(
+                user_identifier="tenant", url=f"https://shop.example/{i}", product_name=f"Item {i}",
+                current_price="SAR 10", is_active=True, update_frequency="monthly", next_run_at=self.later,
+            )
+            for i in range(3)
+        ]
+        tenant = Tenant.objects.create(user_identifier="acme", email="ops@acme.example")
+        self.competitor_product = CompetitorProduct.objects.create(
+            product=Product.objects.create(tenant=tenant, name="Kettle"),
+            competitor=Competitor.objects.create(tenant=tenant, name="Rival", url="https://rival.example"),
+            product_url="https://rival.example/kettle",
+        )
+
+    def flush(self, items):
+        from scrapy_scraper.pipelines import BulkWritePipeline
+
+        pipeline = BulkWritePipeline()
+        pipeline.buffer = items
+        with mock.patch("scrapy_scraper.pipelines.update_scraped_data_batch.apply_async") as scraped_data_batch, \
+                mock.patch("scrapy_scraper.pipelines.update_competitor_products_batch.apply_async") as competitor_batch, \
+                self.captureOnCommitCallbacks(execute=True):
+            written = pipeline.flush()
+        return written, scraped_data_batch, competitor_batch
+
+    def test_unpriced_pages_go_to_the_browser_tier(self):
+        from scraper.models import ScrapedData
+        from scrapy_scraper.items import PriceItem
+        from scrapy_scraper.spiders.due_prices import COMPETITOR_PRODUCTS, SCRAPED_DATA
+
+        priced, unpriced, _ = self.products
+        written, scraped_data_batch, competitor_batch = self.flush([
+            PriceItem(target=SCRAPED_DATA, pk=priced.pk, url=priced.url, product_name="Item", current_price="SAR 12",
+                      previous_price="N/A", description="", fetched_at=timezone.now(), not_modified=False, fetch_state=None),
+            PriceItem(target=SCRAPED_DATA, pk=unpriced.pk, url=unpriced.url, needs_browser=True),
+            PriceItem(target=COMPETITOR_PRODUCTS, pk=self.competitor_product.pk, url=self.competitor_product.product_url,
+                      needs_browser=True),
+        ])
+
+        self.assertEqual(written, 1)
+        scraped_data_batch.assert_called_once_with(args=[[unpriced.pk]])
+        competitor_batch.assert_called_once_with(args=[[self.competitor_product.pk]])
+        rows = ScrapedData.objects.in_bulk([priced.pk, unpriced.pk])
+        self.assertEqual(rows[priced.pk].current_price, "SAR 12")
+        self.assertEqual(rows[unpriced.pk].current_price, "SAR 10")
+        self.assertEqual(rows[unpriced.pk].next_run_at, self.later)
+
+    def test_failed_fetches_back_off(self):
+        from scraper.models import ScrapedData
+        from scrapy_scraper.items import PriceItem
+        from scrapy_scraper.spiders.due_prices import SCRAPED_DATA
+
+        failed = self.products[2]
+        delays = []
+        for _ in range(3):
+            before = timezone.now()
+            self.flush([PriceItem(target=SCRAPED_DATA, pk=failed.pk, url=failed.url, failed=True)])
+            row = ScrapedData.objects.get(pk=failed.pk)
+            delays.append(round((row.next_run_at - before).total_seconds() / 60))
+        self.assertEqual(delays, [5, 10, 20])
+        self.assertEqual(row.failed_scrapes, 3)
+
+        self.flush([PriceItem(target=SCRAPED_DATA, pk=failed.pk, url=failed.url, fetched_at=timezone.now(),
+                              not_modified=True, fetch_state=None)])
+        self.assertEqual(ScrapedData.objects.get(pk=failed.pk).failed_scrapes, 0)
+
+    def test_browser_tier_prices_competitor_products(self):
+        from scraper.models import CompetitorPriceHistory, CompetitorProduct
+        from scraper.task import update_competitor_products_batch
+
+        scraped = [{"url": self.competitor_product.product_url, "current_price": "SAR 45", "product_name": "Kettle"}]
+        with mock.patch("scraper.task.scrape_many", return_value=scraped) as scrape_many:
+            results = update_competitor_products_batch([self.competitor_product.pk])
+
+        scrape_many.assert_called_once_with([self.competitor_product.product_url], {})
+        self.assertEqual(results, {self.competitor_product.pk: "SAR 45"})
+        self.assertEqual(str(CompetitorProduct.objects.get().price_value), "45.00")
+        self.assertEqual(CompetitorPriceHistory.objects.count(), 1)
+
+    def test_backoff_never_passes_the_regular_run(self):
+        from scraper.models import ScrapedData
+        from scraper.scheduling import back_off_failures
+
+        now = timezone.now()
+        product = ScrapedData(update_frequency="hourly", failed_scrapes=10)
+        back_off_failures([product], now)
+        self.assertEqual(product.next_run_at, now + timedelta(hours=1))
+
+
+class ImportTests(TestCase):
+    """Upserts keyed on the natural unique keys, with bad rows reported and skipped."""
+
+    def setUp(self):
+        from scraper.models import Competitor, Tenant
+
+        self.tenant = Tenant.objects.create(user_identifier="acme", email="ops@acme.example")
+        self.competitor = Competitor.objects.create(tenant=self.tenant, name="Rival", url="https://rival.example")
+
+    def test_products_upsert_by_name(self):
+        from scraper.imports import import_rows
+        from scraper.models import Product
+
+        first = import_rows("products", self.tenant.id, [(1, {"name": "Kettle", "description": "Steel", "cost_price": "10"})])
+        second = import_rows("products", self.tenant.id, [(1, {"name": "Kettle", "cost_price": "12.50"})])
+
+        self.assertEqual((first["imported"], second["imported"]), (1, 1))
+        product = Product.objects.get(tenant=self.tenant)
+        self.assertEqual(str(product.cost_price), "12.50")
+        # A partial file leaves the columns it doesn't carry alone.
+        self.assertEqual(product.description, "Steel")
+
+    def test_bad_rows_are_reported_and_the_rest_imported(self):
+        from scraper.imports import import_rows
+        from scraper.models import Product
+
+        report = import_rows("products", self.tenant.id, [
+            (1, {"name": "Kettle", "cost_price": "10"}),
+            (2, {"description": "no name"}),
+            (3, {"name": "Toaster", "cost_price": "cheap"}),
+            (4, "Invalid JSON: Expecting value"),
+        ])
+
+        self.assertEqual(report["imported"], 1)
+        self.assertEqual([error["row"] for error in report["errors"]], [4, 2, 3])
+        self.assertIn("name", report["errors"][1]["errors"])
+        self.assertIn("cost_price", report["errors"][2]["errors"])
+        self.assertEqual(list(Product.objects.values_list("name", flat=True)), ["Kettle"])
+
+    def test_competitor_products_upsert_by_url_and_record_price_changes(self):
+        from scraper.imports import import_rows
+        from scraper.models import CompetitorPriceHistory, CompetitorProduct, Product
+
+        Product.objects.create(tenant=self.tenant, name="Kettle")
+        row = {"product": "Kettle", "competitor": "Rival", "product_url": "https://rival.example/kettle", "current_price": "SAR 99"}
+        import_rows("competitor-products", self.tenant.id, [(1, row)])
+        report = import_rows("competitor-products", self.tenant.id, [
+            (1, {**row, "current_price": "SAR 89"}),
+            (2, {**row, "product": "Toaster"}),
+        ])
+
+        self.assertEqual(report["imported"], 1)
+        self.assertEqual(report["errors"][0]["row"], 2)
+        self.assertIn("product", report["errors"][0]["errors"])
+        competitor_product = CompetitorProduct.objects.get()
+        self.assertEqual(str(competitor_product.price_value), "89.00")
+        self.assertEqual(CompetitorPriceHistory.objects.filter(competitor_product=competitor_product).count(), 2)
+
+
+class UniqueConflictTests(TestCase):
+    """Duplicates of the import keys are a 400, whether the validators or the database catch them."""
+
+    def setUp(self):
+        from scraper.models import Tenant
+
+        self.tenant = Tenant.objects.create(user_identifier="acme", email="ops@acme.example")
+
+    def test_duplicate_product_name(self):
+        from scraper.models import Product
+
+        Product.objects.create(tenant=self.tenant, name="Kettle")
+        response = self.client.post("/api/products/", {"tenant": self.tenant.id, "name": "Kettle"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_duplicate_created_after_validation(self):
+        from rest_framework.exceptions import ValidationError
+
+        from scraper.models import Product
+        from scraper.serializers import ProductSerializer
+
+        serializer = ProductSerializer(data={"tenant": self.tenant.id, "name": "Kettle"})
+        self.assertTrue(serializer.is_valid())
+        Product.objects.create(tenant=self.tenant, name="Kettle")
+        with self.assertRaises(ValidationError):
+            serializer.save()
+
+
+class DispatchTests(TestCase):
+    """Due products are claimed once, pushed forward, and fanned out in chunks."""
+
+    def setUp(self):
+        from scraper.models import ScrapedData
+
+        self.now = timezone.now()
+        self.due = [
+            ScrapedData.objects.create(
+                user_identifier="tenant", url=f"https://shop.example/{i}", product_name=f"Item {i}",
+                is_active=True, update_frequency="hourly", next_run_at=self.now - timedelta(minutes=10 - i),
+            )
+            for i in range(3)
+        ]
+        ScrapedData.objects.create(
+            user_identifier="tenant", url="https://shop.example/later", product_name="Later",
+            is_active=True, update_frequency="hourly", next_run_at=self.now + timedelta(minutes=5),
+        )
+        ScrapedData.objects.create(
+            user_identifier="tenant", url="https://shop.example/off", product_name="Off",
+            is_active=False, update_frequency="hourly", next_run_at=self.now - timedelta(hours=1),
+        )
+
+    def test_claim_takes_due_products_oldest_first_and_only_once(self):
+        from scraper.models import ScrapedData
+        from scraper.scheduling import claim_due_scrapes
+
+        first = claim_due_scrapes("hourly", 2, now=self.now)
+        second = claim_due_scrapes("hourly", 10, now=self.now)
+
+        self.assertEqual(first, [self.due[0].pk, self.due[1].pk])
+        self.assertEqual(second, [self.due[2].pk])
+        self.assertEqual(claim_due_scrapes("hourly", 10, now=self.now), [])
+        for product in ScrapedData.objects.filter(pk__in=first + second):
+            self.assertEqual(product.next_run_at, self.now + timedelta(hours=1))
+
+    def test_dispatch_fans_out_in_chunks(self):
+        from scraper.task import dispatch_due_scrapes, update_scraped_data_batch
+
+        with self.settings(SCRAPER_DISPATCH_CHUNK_SIZE=2), mock.patch.object(update_scraped_data_batch, "apply_async") as apply_async:
+            self.assertEqual(dispatch_due_scrapes("hourly"), 3)
+
+        chunks = [call.kwargs["args"][0] for call in apply_async.call_args_list]
+        self.assertEqual(chunks, [[self.due[0].pk, self.due[1].pk], [self.due[2].pk]])
+
+
+class SplitTierTests(TestCase):
+    """With the sync engine, domains the browser workers found need Chrome skip the HTTP queue."""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        from scraper.models import ScrapedData
+        from scrapy_scraper.spiders.fetcher import BROWSER_TIER, get_tier_memory
+
+        cache.clear()
+        get_tier_memory().record("spa.example", BROWSER_TIER)
+        past = timezone.now() - timedelta(minutes=1)
+        self.static, self.spa = [
+            ScrapedData.objects.create(
+                user_identifier="tenant", url=url, product_name="Item", current_price="SAR 10",
+                is_active=True, update_frequency="hourly", next_run_at=past,
+            )
+            for url in ("https://shop.example/1", "https://spa.example/1")
+        ]
+
+    def test_dispatch_sends_known_browser_domains_to_the_browser_queue(self):
+        from scraper.routing import route_task
+        from scraper.task import dispatch_due_scrapes, update_scraped_data_batch
+
+        with self.settings(SCRAPER_BATCH_ENGINE="sync"), mock.patch.object(update_scraped_data_batch, "apply_async") as apply_async:
+            dispatch_due_scrapes("hourly")
+
+        sent = {call.kwargs["kwargs"]["tier"]: call.kwargs["args"][0] for call in apply_async.call_args_list}
+        self.assertEqual(sent, {None: [self.spa.pk], "http": [self.static.pk]})
+        queues = {tier: route_task("scraper.task.update_scraped_data_batch", [], {"tier": tier}, {})["queue"] for tier in sent}
+        self.assertEqual(queues, {None: "scrape-browser", "http": "scrape-http"})
+
+    def test_http_batch_hands_known_browser_domains_on_without_fetching(self):
+        from scraper.task import update_scraped_data_batch
+
+        scraped = [{"url": self.static.url, "current_price": "SAR 11", "product_name": "Item"}]
+        with mock.patch("scraper.task.scrape_many", return_value=scraped) as scrape_many, \
+                mock.patch.object(update_scraped_data_batch, "apply_async") as apply_async:
+            result = update_scraped_data_batch([self.static.pk, self.spa.pk], tier="http")
+
+        self.assertEqual(scrape_many.call_args.args[0], [self.static.url])
+        apply_async.assert_called_once_with(args=[[self.spa.pk]])
+        self.assertEqual(result["needs_browser"], 1)
+
+    def test_learned_tier_is_shared_through_the_cache(self):
+        from django.core.cache import cache
+
+        from scrapy_scraper.spiders.fetcher import BROWSER_TIER, DomainTierMemory
+
+        http_worker, browser_worker = DomainTierMemory(cache=cache), DomainTierMemory(cache=cache)
+        browser_worker.record("shop.example", BROWSER_TIER)
+        self.assertEqual(http_worker.get("shop.example"), BROWSER_TIER)
+        self.assertEqual(http_worker.browser_domains(["shop.example", "other.example"]), {"shop.example"})
+
+
+class PriceHistoryTests(TestCase):
+    """The history keeps only price changes; the rollups see every observation."""
+
+    def setUp(self):
+        from datetime import datetime, timezone as dt_timezone
+
+        from scraper.models import Competitor, CompetitorProduct, Product, Tenant
+
+        tenant = Tenant.objects.create(user_identifier="acme", email="ops@acme.example")
+        self.competitor_product = CompetitorProduct.objects.create(
+            product=Product.objects.create(tenant=tenant, name="Kettle"),
+            competitor=Competitor.objects.create(tenant=tenant, name="Rival", url="https://rival.example"),
+            product_url="https://rival.example/kettle",
+        )
+        self.at = lambda hour, minute: datetime(2026, 10, 1, hour, minute, tzinfo=dt_timezone.utc)
+
+    def rollup(self, resolution, hour=0):
+        from scraper.models import CompetitorPriceRollup
+
+        bucket = self.at(hour if resolution == "hour" else 0, 0)
+        return CompetitorPriceRollup.objects.get(competitor_product=self.competitor_product, resolution=resolution, bucket=bucket)
+
+    def test_unchanged_prices_are_sampled_but_not_stored(self):
+        from decimal import Decimal
+
+        from scraper.history import record_price_points
+
+        pk = self.competitor_product.pk
+        created = record_price_points([
+            (pk, Decimal("10"), self.at(9, 5)), (pk, Decimal("10"), self.at(9, 20)), (pk, Decimal("12"), self.at(9, 40)),
+        ])
+        self.assertEqual([row.price for row in created], [Decimal("10"), Decimal("12")])
+        hour = self.rollup("hour", 9)
+        self.assertEqual((hour.min_price, hour.max_price, hour.last_price, hour.samples), (10, 12, 12, 3))
+
+    def test_bucket_starts_with_the_carried_price(self):
+        from decimal import Decimal
+
+        from scraper.history import record_price_points
+
+        pk = self.competitor_product.pk
+        record_price_points([(pk, Decimal("10"), self.at(9, 50))])
+        record_price_points([(pk, Decimal("10"), self.at(10, 5))])
+        record_price_points([(pk, Decimal("12"), self.at(11, 10))])
+
+        unchanged = self.rollup("hour", 10)
+        self.assertEqual((unchanged.min_price, unchanged.max_price, unchanged.samples), (10, 10, 1))
+        moved = self.rollup("hour", 11)
+        self.assertEqual((moved.min_price, moved.max_price, moved.last_price), (10, 12, 12))
+        day = self.rollup("day")
+        self.assertEqual((day.min_price, day.max_price, day.samples), (10, 12, 3))
+
+    def test_bucket_inserted_concurrently_is_merged(self):
+        from decimal import Decimal
+
+        from scraper import history
+        from scraper.models import CompetitorPriceRollup
+
+        pk = self.competitor_product.pk
+        CompetitorPriceRollup.objects.create(
+            competitor_product_id=pk, resolution="hour", bucket=self.at(9, 0),
+            min_price=Decimal("8"), max_price=Decimal("8"), last_price=Decimal("8"),
+            last_recorded_at=self.at(9, 1), samples=1,
+        )
+        # The first read misses the bucket another worker inserted after it looked.
+        locked, reads = history._locked_rollups, []
+
+        def read(keys):
+            reads.append(keys)
+            return [] if len(reads) == 1 else locked(keys)
+
+        with mock.patch.object(history, "_locked_rollups", side_effect=read):
+            history.record_price_points([(pk, Decimal("10"), self.at(9, 5))])
+        self.assertEqual(len(reads), 2)
+
+        hour = self.rollup("hour", 9)
+        self.assertEqual((hour.min_price, hour.max_price, hour.last_price, hour.samples), (8, 10, 10, 2))
+        self.assertEqual(self.rollup("day").samples, 1)
+
+    def test_buckets_are_utc(self):
+        from datetime import timezone as dt_timezone
+
+        from scraper.history import bucket_start
+
+        riyadh = dt_timezone(timedelta(hours=3))
+        moment = self.at(22, 30).astimezone(riyadh)  # 01:30 on the 2nd, local time
+        self.assertEqual(bucket_start(moment, "day"), self.at(0, 0))
+        self.assertEqual(bucket_start(moment, "hour"), self.at(22, 0))
+
+
+class TierMemoryTests(SimpleTestCase):
+    """Async engine runs share the process' domain tier memory instead of relearning it each batch."""
+
+    def test_engines_share_the_process_tier_memory(self):
+        from scrapy_scraper.spiders.async_engine import engine_from_settings
+        from scrapy_scraper.spiders.fetcher import BROWSER_TIER, get_tier_memory
+
+        engine_from_settings().tier_memory.record("shop.example", BROWSER_TIER)
+        self.assertIs(engine_from_settings().tier_memory, get_tier_memory())
+        self.assertEqual(get_tier_memory().get("shop.example"), BROWSER_TIER)
+
+
+class RecommendationRoundingTests(TestCase):
+    """The catalog path prices exactly like the single-product path, half-cent ties included."""
+
+    CASES = [
+        # cost, margin, competitor min, competitor max
+        ("10.05", "50.00", None, None),  # 15.075 -> 15.08
+        ("10.15", "50.00", None, None),  # 15.225 -> 15.22
+        ("10.00", "0.50", "9.99", "10.06"),  # midpoint 10.025 -> 10.02
+        ("10.00", "10.00", "12.01", "12.02"),  # midpoint 12.015 -> 12.02
+        ("30.00", "10.00", "12.00", "20.00"),  # above market
+        ("12.00", "25.00", "10.00", "15.00"),  # target exactly at the competitor max
+    ]
+
+    def test_matches_the_decimal_path(self):
+        from decimal import Decimal
+
+        from scraper.recommendations import _reason
+        from scraper.utils import recommend_optimal_price, recommend_optimal_prices
+
+        decimals = [[None if v is None else Decimal(v) for v in case] for case in self.CASES]
+        prices, min_targets, midpoints, cases = recommend_optimal_prices(*zip(*decimals))
+        for (cost, margin, low, high), cents, min_target, midpoint, case in zip(decimals, prices, min_targets, midpoints, cases):
+            with self.subTest(cost=cost, margin=margin, low=low, high=high):
+                expected, reason = recommend_optimal_price(cost, margin, [low, high] if high else [], "SAR")
+                self.assertEqual(Decimal(int(cents)).scaleb(-2), expected)
+                self.assertEqual(
+                    _reason(case, Decimal(int(min_target)).scaleb(-6), Decimal(int(midpoint)).scaleb(-6), "SAR"), reason
+                )
+
+    def test_unchanged_half_cent_price_is_skipped(self):
+        from decimal import Decimal
+
+        from scraper.models import PriceRecommendation, Product, Tenant
+        from scraper.recommendations import recommend_for_products
+
+        tenant = Tenant.objects.create(user_identifier="acme", email="ops@acme.example")
+        product = Product.objects.create(tenant=tenant, name="Kettle", cost_price=Decimal("10.05"), target_margin=Decimal("50.00"))
+        response = self.client.post(f"/api/products/{product.id}/recommend/")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["reason"], "No competitors, used margin only")
+
+        created = recommend_for_products(Product.objects.filter(id=product.id), skip_unchanged=True)
+        self.assertEqual(created, [])
+        self.assertEqual(PriceRecommendation.objects.get().recommended_price, Decimal("15.08"))
+
+
+class ProductRecommendationViewTests(TestCase):
+    """The single-product endpoint records the market aggregates and each competitor's price."""
+
+    def test_competitor_data_keeps_prices_and_sources(self):
+        from decimal import Decimal
+
+        from scraper.models import Competitor, CompetitorProduct, Product, Tenant
+
+        tenant = Tenant.objects.create(user_identifier="acme", email="ops@acme.example")
+        product = Product.objects.create(tenant=tenant, name="Kettle", cost_price=Decimal("100.00"), target_margin=Decimal("20.00"))
+        for name, price in (("Rival A", "SAR 119.99"), ("Rival B", "SAR 139.99")):
+            CompetitorProduct.objects.create(
+                product=product, competitor=Competitor.objects.create(tenant=tenant, name=name, url=f"https://{name[-1]}.example"),
+                product_url=f"https://{name[-1]}.example/kettle", current_price=price,
+            )
+
+        response = self.client.post(f"/api/products/{product.id}/recommend/")
+        self.assertEqual(response.status_code, 201)
+        used = response.data["competitor_data_used"]
+        self.assertEqual((used["count"], used["min"], used["max"]), (2, 119.99, 139.99))
+        self.assertEqual(sorted(zip(used["sources"], used["prices"])), [("Rival A", 119.99), ("Rival B", 139.99)])
+
+
+class DirtyRecomputeTests(TestCase):
+    """Dirty flags are cleared together with the recommendations they lead to."""
+
+    def setUp(self):
+        from decimal import Decimal
+
+        from scraper.models import Product, Tenant
+
+        tenant = Tenant.objects.create(user_identifier="acme", email="ops@acme.example")
+        self.product = Product.objects.create(
+            tenant=tenant, name="Kettle", cost_price=Decimal("10.00"), target_margin=Decimal("50.00"),
+            recommendation_dirty_at=timezone.now() - timedelta(minutes=5),
+        )
+
+    def test_failed_recompute_keeps_the_flag(self):
+        from scraper import recommendations
+
+        with mock.patch.object(recommendations, "point_to_latest_recommendations", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                recommendations.recompute_dirty_products(debounce_seconds=60, limit=10)
+        self.product.refresh_from_db()
+        self.assertIsNotNone(self.product.recommendation_dirty_at)
+        self.assertFalse(self.product.pricerecommendation_set.exists())
+
+    def test_recompute_clears_the_flag(self):
+        from scraper.recommendations import recompute_dirty_products
+
+        self.assertEqual(recompute_dirty_products(debounce_seconds=60, limit=10), (1, 1))
+        self.product.refresh_from_db()
+        self.assertIsNone(self.product.recommendation_dirty_at)
+
+
+class CursorPaginationTests(TestCase):
+    """Walking the cursor pages sees every row once, even when rows are added mid-walk."""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        from scraper.models import Product, Tenant
+
+        cache.clear()
+        self.tenant = Tenant.objects.create(user_identifier="acme", email="ops@acme.example")
+        self.ids = [Product.objects.create(tenant=self.tenant, name=f"Item {i}").id for i in range(5)]
+
+    def test_pages_are_stable_under_inserts(self):
+        from scraper.models import Product
+
+        seen, url = [], "/api/products/?page_size=2"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [row["id"] for row in response.data["results"]]
+            if len(seen) == 2:
+                with self.captureOnCommitCallbacks(execute=True):
+                    Product.objects.create(tenant=self.tenant, name="Added mid-walk")
+            url = response.data["next"]
+
+        self.assertEqual(seen, sorted(self.ids, reverse=True))
+        self.assertNotIn("count", response.data)
+
+
+class ConditionalGetTests(TestCase):
+    """Cached read endpoints answer revalidation with 304 until a write touches their scope."""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        from scraper.models import Product, Tenant
+
+        cache.clear()
+        self.tenant = Tenant.objects.create(user_identifier="acme", email="ops@acme.example")
+        Product.objects.create(tenant=self.tenant, name="Kettle")
+
+    def test_etag_and_last_modified_revalidate(self):
+        first = self.client.get("/api/products/")
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first["ETag"].startswith('W/"'))
+
+        self.assertEqual(self.client.get("/api/products/", HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+        self.assertEqual(self.client.get("/api/products/", HTTP_IF_MODIFIED_SINCE=first["Last-Modified"]).status_code, 304)
+        self.assertEqual(self.client.get("/api/products/", HTTP_IF_NONE_MATCH='W/"stale"').status_code, 200)
+
+    def test_writes_invalidate(self):
+        from scraper.models import Product
+
+        first = self.client.get("/api/products/")
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(tenant=self.tenant, name="Toaster")
+
+        second = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second["ETag"], first["ETag"])
+        self.assertEqual([row["name"] for row in second.data["results"]], ["Toaster", "Kettle"])
+
+
+class ExportTests(TestCase):
+    """Exports walk every matching row in keyset chunks, filtered by tenant."""
+
+    def setUp(self):
+        from decimal import Decimal
+
+        from scraper.models import PriceRecommendation, Product, Tenant
+
+        self.tenant = Tenant.objects.create(user_identifier="acme", email="ops@acme.example")
+        other = Tenant.objects.create(user_identifier="other", email="ops@other.example")
+        for i, tenant in enumerate([self.tenant, self.tenant, self.tenant, other]):
+            PriceRecommendation.objects.create(
+                product=Product.objects.create(tenant=tenant, name=f"Item {i}"), recommended_price=Decimal("9.99"),
+                reason="No competitors, used margin only", competitor_data_used={"count": 0},
+            )
+
+    def test_csv_in_chunks_for_one_tenant(self):
+        import csv
+        import io
+
+        from scraper.exports import stream_export
+
+        body = b"".join(stream_export("recommendations", "csv", tenant_id=self.tenant.id, chunk_size=2)).decode()
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual([row["product_name"] for row in rows], ["Item 0", "Item 1", "Item 2"])
+        self.assertEqual(rows[0]["competitor_data_used"], '{"count": 0}')
+
+    def test_ndjson(self):
+        import json
+
+        from scraper.exports import stream_export
+
+        lines = b"".join(stream_export("recommendations", "ndjson", chunk_size=3)).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]["recommended_price"], "9.99")
+        self.assertEqual(rows[0]["competitor_data_used"], {"count": 0})
+
+
+class DriverPoolTests(SimpleTestCase):
+    """Chrome sessions are reused, recycled after max_pages, and replaced when they break."""
+
+    def setUp(self):
+        from scrapy_scraper.spiders.driver_pool import DriverPool
+
+        self.factory = mock.Mock(side_effect=lambda: mock.Mock(name="driver"))
+        self.pool = DriverPool(size=1, max_pages=3, lease_timeout=1, factory=self.factory)
+
+    def lease(self):
+        with self.pool.lease() as driver:
+            return driver
+
+    def test_session_is_reused_until_max_pages(self):
+        drivers = [self.lease() for _ in range(4)]
+        self.assertEqual(self.factory.call_count, 2)
+        self.assertIs(drivers[0], drivers[2])
+        self.assertIsNot(drivers[2], drivers[3])
+        drivers[0].quit.assert_called_once()
+
+    def test_broken_session_is_discarded(self):
+        from selenium.common.exceptions import WebDriverException
+
+        with self.assertRaises(WebDriverException):
+            with self.pool.lease() as driver:
+                raise WebDriverException("tab crashed")
+        driver.quit.assert_called_once()
+        self.assertIsNot(self.lease(), driver)
+
+    def test_unhealthy_idle_session_is_replaced(self):
+        from selenium.common.exceptions import WebDriverException
+
+        dead = self.lease()
+        dead.execute_script.side_effect = WebDriverException("session deleted")
+        self.assertIsNot(self.lease(), dead)
+        dead.quit.assert_called_once()
+
+    def test_lease_waits_for_a_free_slot(self):
+        with self.pool.lease():
+            with self.assertRaises(TimeoutError):
+                with mock.patch.object(self.pool, "lease_timeout", 0.01):
+                    with self.pool.lease():
+                        pass
+
+    def test_shutdown_quits_every_session(self):
+        driver = self.lease()
+        self.pool.shutdown()
+        driver.quit.assert_called_once()
+        with self.assertRaises(RuntimeError):
+            self.lease()
+
+
+class TieredFetcherTests(SimpleTestCase):
+    """Plain HTTP first; Chrome only for pages whose static HTML has no price, and remembered per domain."""
+
+    PRICED = "<html><body><h1>Kettle</h1><span class='price'>SAR 120.00</span></body></html>"
+    UNPRICED = "<html><body><h1>Kettle</h1><div id='app'></div></body></html>"
+
+    def fetcher(self, html):
+        from scrapy_scraper.spiders.fetcher import DomainTierMemory, TieredFetcher
+
+        session = mock.Mock()
+        session.get.return_value = mock.Mock(status_code=200, headers={"Content-Type": "text/html"}, text=html)
+        return TieredFetcher(session=session, driver_pool=mock.MagicMock(), tier_memory=DomainTierMemory())
+
+    def test_static_price_skips_the_browser(self):
+        fetcher = self.fetcher(self.PRICED)
+        data = fetcher.fetch("https://static.example/kettle")
+        self.assertEqual((data["fetch_tier"], data["current_price"]), ("http", "SAR 120.00"))
+        fetcher.driver_pool.lease.assert_not_called()
+
+    def test_unpriced_page_escalates_and_the_domain_is_remembered(self):
+        fetcher = self.fetcher(self.UNPRICED)
+        rendered = {"url": "https://spa.example/kettle", "current_price": "120.00"}
+        with mock.patch("scrapy_scraper.spiders.fetcher.extract_product_data", return_value=rendered):
+            first = fetcher.fetch("https://spa.example/kettle")
+            second = fetcher.fetch("https://spa.example/toaster")
+        self.assertEqual((first["fetch_tier"], second["fetch_tier"]), ("browser", "browser"))
+        self.assertEqual(fetcher.session.get.call_count, 1)
+        self.assertEqual(fetcher.driver_pool.lease.call_count, 2)
+
+    def test_http_only_worker_hands_the_page_on(self):
+        fetcher = self.fetcher(self.UNPRICED)
+        self.assertEqual(
+            fetcher.fetch("https://spa-only.example/kettle", browser=False),
+            {"url": "https://spa-only.example/kettle", "needs_browser": True},
+        )
+        fetcher.driver_pool.lease.assert_not_called()
+
+
+class BatchScrapeTests(TestCase):
+    """One task scrapes a batch of rows through one fetcher and saves them together."""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        from scraper.models import ScrapedData
+
+        cache.clear()
+        self.rows = [
+            ScrapedData.objects.create(
+                user_identifier="tenant", url=f"https://shop.example/{i}", product_name="Item", current_price="SAR 10",
+            )
+            for i in range(3)
+        ]
+
+    def test_batch_updates_every_row_and_reports_each_result(self):
+        from scraper.models import ScrapedData
+        from scraper.task import update_scraped_data_batch
+
+        fetcher = mock.Mock()
+        fetcher.fetch.side_effect = [
+            {"url": self.rows[0].url, "current_price": "SAR 12"},
+            {"url": self.rows[1].url, "current_price": "SAR 10"},
+            RuntimeError("connection reset"),
+        ]
+        with self.settings(SCRAPER_BATCH_ENGINE="sync"), mock.patch("scraper.task.get_fetcher", return_value=fetcher) as get_fetcher:
+            result = update_scraped_data_batch([row.pk for row in self.rows] + [999])
+
+        get_fetcher.assert_called_once()
+        self.assertEqual(result["updated"], 2)
+        self.assertEqual(result["results"], {
+            self.rows[0].pk: "SAR 12", self.rows[1].pk: "SAR 10", self.rows[2].pk: "connection reset", 999: "Product not found",
+        })
+        first = ScrapedData.objects.get(pk=self.rows[0].pk)
+        self.assertEqual((first.previous_price, first.current_price), ("SAR 10", "SAR 12"))
+        self.assertIsNotNone(first.last_checked)
+        self.assertIsNone(ScrapedData.objects.get(pk=self.rows[2].pk).last_checked)
+
+
+class FxRateTests(SimpleTestCase):
+    """Prices convert through one rate table, read from the source once and then served from the caches."""
+
+    RATES = {"base": "USD", "rates": {"SAR": 3.75, "EUR": 0.9, "XYZ": "n/a"}}
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        from scraper import fx
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        local = mock.patch.dict(fx._local, rates=None, expires_at=0.0)
+        local.start()
+        self.addCleanup(local.stop)
+        self.enterContext(self.settings(FX_RATES_URL="https://fx.example/latest", PRICING_CURRENCY="SAR"))
+        self.source = self.enterContext(mock.patch("scraper.fx.requests.get"))
+        self.source.return_value.json.return_value = self.RATES
+
+    def test_normalize(self):
+        from decimal import Decimal
+
+        from scraper.fx import normalize
+
+        self.assertEqual(normalize(Decimal("10.00"), "USD"), Decimal("37.50"))
+        self.assertEqual(normalize(Decimal("10.00"), "EUR"), Decimal("41.67"))
+        self.assertEqual(normalize(Decimal("10.00"), ""), Decimal("10.00"))
+        self.assertIsNone(normalize(Decimal("10.00"), "XYZ"))
+        self.assertIsNone(normalize(Decimal("10.00"), "GBP"))
+
+    def test_rates_are_read_once_then_cached(self):
+        from scraper import fx
+
+        fx.get_rates()
+        fx.get_rates()
+        fx._local.update(rates=None, expires_at=0.0)  # Another process: only the shared cache is warm
+        fx.get_rates()
+        self.source.assert_called_once()
+
+    def test_unreadable_source_keeps_the_last_rates(self):
+        import requests
+
+        from scraper import fx
+
+        rates = fx.get_rates()
+        self.source.side_effect = requests.ConnectionError("timed out")
+        self.assertEqual(fx.get_rates(refresh=True), rates)
+
+
+class ConditionalFetchTests(TestCase):
+    """Validators and price-region hashes kept in FetchState let unchanged pages skip parsing and writes."""
+
+    URL = "https://cond.example/kettle"
+
+    def page(self, price):
+        return f"<html><body><h1>Kettle</h1><span class='price'>{price}</span></body></html>"
+
+    def fetcher(self, *responses):
+        from scrapy_scraper.spiders.fetcher import DomainTierMemory, TieredFetcher
+
+        session = mock.Mock()
+        session.get.side_effect = [
+            mock.Mock(status_code=status, headers={"Content-Type": "text/html", **headers}, text=text)
+            for status, headers, text in responses
+        ]
+        return TieredFetcher(session=session, driver_pool=mock.MagicMock(), tier_memory=DomainTierMemory())
+
+    def test_validators_round_trip_and_304(self):
+        from scraper.models import load_fetch_states, save_fetch_states
+
+        fetcher = self.fetcher(
+            (200, {"ETag": '"v1"', "Last-Modified": "Thu, 01 Oct 2026 09:00:00 GMT"}, self.page("SAR 120.00")),
+            (304, {}, ""),
+        )
+        first = fetcher.fetch(self.URL)
+        save_fetch_states({self.URL: first["fetch_state"]})
+        state = load_fetch_states([self.URL])[self.URL]
+        self.assertEqual(state, first["fetch_state"])
+
+        second = fetcher.fetch(self.URL, state)
+        self.assertEqual(second, {"url": self.URL, "not_modified": True, "fetch_state": state, "fetch_tier": "http"})
+        self.assertEqual(fetcher.session.get.call_args.kwargs["headers"], {
+            "If-None-Match": '"v1"', "If-Modified-Since": "Thu, 01 Oct 2026 09:00:00 GMT",
+        })
+
+    def test_unchanged_price_region_is_not_parsed_again(self):
+        fetcher = self.fetcher((200, {}, self.page("SAR 120.00")), (200, {}, self.page("SAR 120.00")), (200, {}, self.page("SAR 99.00")))
+        state = fetcher.fetch(self.URL)["fetch_state"]
+        with mock.patch("scrapy_scraper.spiders.fetcher.parse_product_data") as parse:
+            self.assertTrue(fetcher.fetch(self.URL, state)["not_modified"])
+        parse.assert_not_called()
+        self.assertEqual(fetcher.fetch(self.URL, state)["current_price"], "SAR 99.00")
+
+    def test_batch_only_touches_unchanged_rows(self):
+        from scraper.models import FetchState, ScrapedData
+        from scraper.task import update_scraped_data_batch
+
+        row = ScrapedData.objects.create(user_identifier="tenant", url=self.URL, product_name="Kettle", current_price="SAR 120.00")
+        state = {"etag": '"v2"', "last_modified": "", "content_hash": "abc"}
+        scraped = [{"url": self.URL, "not_modified": True, "fetch_state": state}]
+        with mock.patch("scraper.task.scrape_many", return_value=scraped):
+            result = update_scraped_data_batch([row.pk])
+
+        self.assertEqual((result["updated"], result["unchanged"]), (0, 1))
+        row.refresh_from_db()
+        self.assertEqual((row.current_price, row.previous_price), ("SAR 120.00", None))
+        self.assertIsNotNone(row.last_checked)
+        self.assertEqual(FetchState.objects.get(url=self.URL).etag, '"v2"')
+
+
+class AdaptiveScheduleTests(TestCase):
+    """Adaptive intervals stretch while prices hold, shrink when they move, and stay within the tenant's bounds."""
+
+    BOUNDS = (600, 86400)
+
+    def test_interval_follows_the_change_rate(self):
+        from scraper.scheduling import next_adaptive_interval
+
+        with self.settings(SCRAPER_ADAPTIVE_TARGET_CHANGE=0.3, SCRAPER_ADAPTIVE_SMOOTHING=0.3):
+            longer, quiet_rate = next_adaptive_interval(3600, None, False, self.BOUNDS)
+            shorter, busy_rate = next_adaptive_interval(3600, None, True, self.BOUNDS)
+        self.assertAlmostEqual(quiet_rate, 0.21)
+        self.assertAlmostEqual(busy_rate, 0.51)
+        self.assertTrue(3600 < longer <= 7200, longer)
+        self.assertTrue(1800 <= shorter < 3600, shorter)
+
+    def test_interval_stays_within_bounds(self):
+        from scraper.scheduling import next_adaptive_interval
+
+        for changed, bound in ((False, self.BOUNDS[1]), (True, self.BOUNDS[0])):
+            with self.subTest(changed=changed):
+                interval, rate = 3600, None
+                for _ in range(30):
+                    interval, rate = next_adaptive_interval(interval, rate, changed, self.BOUNDS)
+                self.assertEqual(interval, bound)
+
+    def test_adapt_schedules_uses_tenant_bounds(self):
+        from scraper.models import ScrapedData, Tenant
+        from scraper.scheduling import adapt_schedules
+
+        Tenant.objects.create(user_identifier="acme", email="ops@acme.example", min_scrape_interval=3000, max_scrape_interval=4000)
+        adaptive, hourly = [
+            ScrapedData.objects.create(user_identifier="acme", url=f"https://shop.example/{frequency}", product_name="Item",
+                                       current_price="SAR 10", update_frequency=frequency)
+            for frequency in ("adaptive", "hourly")
+        ]
+        now = timezone.now()
+        self.assertEqual(adapt_schedules([adaptive, hourly], set(), now), [adaptive])
+        self.assertEqual(adaptive.scrape_interval, 4000)
+        self.assertEqual(adaptive.next_run_at, now + timedelta(seconds=4000))
+        self.assertIsNone(hourly.scrape_interval)
+
+
+class DomainThrottleTests(SimpleTestCase):
+    """Token buckets pace each domain; repeated failures open its circuit until a probe succeeds."""
+
+    def setUp(self):
+        from scraper.throttling import DomainThrottle
+
+        self.clock = {"monotonic": 100.0, "time": 1_000_000.0}
+        for name in self.clock:
+            patcher = mock.patch(f"scraper.throttling.time.{name}", side_effect=lambda name=name: self.clock[name])
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.throttle = DomainThrottle(rate=1.0, burst=5, failure_threshold=3, failure_window=300, open_seconds=600)
+
+    def advance(self, seconds):
+        for name in self.clock:
+            self.clock[name] += seconds
+
+    def test_bucket_grants_the_burst_then_refills(self):
+        self.assertEqual(self.throttle.take("shop.example", 7), (5, 2.0))
+        self.advance(3)
+        self.assertEqual(self.throttle.take("shop.example", 7), (3, 4.0))
+        self.assertEqual(self.throttle.take("other.example", 1), (1, 0.0))
+
+    def test_admit_defers_per_domain(self):
+        urls = [f"https://busy.example/{i}" for i in range(7)] + ["https://quiet.example/1"]
+        admitted, deferred, wait = self.throttle.admit(urls, lambda url: url.split("/")[2])
+        self.assertEqual(len(admitted), 6)
+        self.assertEqual(deferred, urls[5:7])
+        self.assertEqual(wait, 2.0)
+
+    def test_breaker_opens_and_a_probe_decides(self):
+        for _ in range(3):
+            self.throttle.record("shop.example", False)
+        self.assertEqual(self.throttle.acquire("shop.example"), 600)
+        self.assertEqual(self.throttle.admit(["a"], lambda _: "shop.example"), ([], ["a"], 600))
+
+        self.advance(600)
+        self.assertEqual(self.throttle.acquire("shop.example"), 0)
+        self.throttle.record("shop.example", False)  # One failed probe re-opens it
+        self.assertEqual(self.throttle.open_for("shop.example"), 600)
+
+        self.advance(600)
+        self.throttle.record("shop.example", True)
+        self.throttle.record("shop.example", False)
+        self.assertEqual(self.throttle.open_for("shop.example"), 0)
+
+    def test_any_success_in_a_batch_keeps_the_domain_healthy(self):
+        self.throttle.record_results([("shop.example", False)] * 3 + [("shop.example", True)])
+        self.assertEqual(self.throttle.open_for("shop.example"), 0)
+
+    def test_shared_state_lives_in_redis(self):
+        from scraper.throttling import DomainThrottle
+
+        with mock.patch("scraper.throttling.redis.Redis.from_url") as from_url:
+            client = from_url.return_value
+            shared = DomainThrottle(redis_url="redis://redis:6379/1", failure_threshold=3, open_seconds=600)
+        client.register_script.return_value.return_value = [2, "3.5"]
+        self.assertEqual(shared.take("shop.example", 5), (2, 3.5))
+        client.register_script.return_value.assert_called_once_with(keys=["throttle:bucket:shop.example"], args=[1.0, 5, 5])
+
+        client.incrby.return_value = 3
+        shared.record("shop.example", False, count=3)
+        client.expire.assert_called_once_with("throttle:failures:shop.example", 300)
+        pipe = client.pipeline.return_value.__enter__.return_value
+        pipe.set.assert_any_call("throttle:open:shop.example", 1, ex=600)
+
+        client.pttl.return_value = 42_000
+        self.assertEqual(shared.open_for("shop.example"), 42)
+
+
+class TaskRoutingTests(SimpleTestCase):
+    """Each task lands on the queue of the workers sized for it, and every such queue has a worker profile."""
+
+    def route(self, name, kwargs=None):
+        from backend.celery import app
+
+        return app.amqp.router.route({}, name, args=[], kwargs=kwargs or {})["queue"].name
+
+    def test_batch_scrapes_split_by_tier(self):
+        self.assertEqual(self.route("scraper.task.update_scraped_data_batch", {"tier": "http"}), "scrape-http")
+        self.assertEqual(self.route("scraper.task.update_scraped_data_batch", {"product_ids": [1]}), "scrape-browser")
+
+    def test_named_and_unknown_tasks(self):
+        from scraper.routing import TASK_QUEUES
+
+        for name, queue in TASK_QUEUES.items():
+            with self.subTest(name=name):
+                self.assertEqual(self.route(name), queue)
+        self.assertEqual(self.route("scraper.task.something_new"), "maintenance")
+
+    def test_every_queue_has_a_worker(self):
+        from django.conf import settings
+
+        from scraper.routing import SCRAPE_HTTP_QUEUE, TASK_QUEUES
+
+        queues = set(TASK_QUEUES.values()) | {SCRAPE_HTTP_QUEUE, settings.CELERY_TASK_DEFAULT_QUEUE}
+        self.assertLessEqual(queues, set(settings.WORKER_QUEUES))
+
+    def test_worker_command_uses_the_queue_profile(self):
+        import io
+
+        from django.core.management import call_command
+
+        out = io.StringIO()
+        with self.settings(WORKER_QUEUES={"scrape-http": {"pool": "gevent", "concurrency": 100, "autoscale": "", "prefetch": 4}}):
+            call_command("run_worker", "scrape-http", "--dry-run", stdout=out)
+        self.assertEqual(
+            out.getvalue().split(),
+            "celery -A backend worker -Q scrape-http -n scrape-http@%h -P gevent --prefetch-multiplier 4 --loglevel info -c 100".split(),
+        )
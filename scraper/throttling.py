@@ -0,0 +1,211 @@
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+BUCKET_KEY = "throttle:bucket:{}"
+FAILURES_KEY = "throttle:failures:{}"
+OPEN_KEY = "throttle:open:{}"
+
+# Refill the domain's bucket for the time since it was last drawn from (Redis' clock, so
+# every worker agrees), grant up to ARGV[3] tokens and return {granted, seconds until
+# the rest would be available}. The wait comes back as a string: Lua numbers are
+# truncated to integers on the way out.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local granted = math.min(requested, math.floor(tokens))
+tokens = tokens - granted
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+local wait = 0
+if granted < requested then
+    wait = (requested - granted - tokens) / rate
+end
+return {granted, tostring(wait)}
+"""
+
+
+class DomainThrottle:
+    """
+    Per-domain politeness shared by every worker: a token bucket refilling at `rate`
+    requests a second up to `burst`, and a circuit breaker that opens for
+    `open_seconds` once `failure_threshold` fetches of a domain fail within
+    `failure_window` seconds. A success closes it again; after it has been open, one
+    more failure is enough to re-open it.
+
+    State lives in Redis when `redis_url` is set and in this process otherwise.
+    Callers never sleep on it: a throttled fetch is deferred (see `backoff`).
+    """
+
+    def __init__(self, redis_url=None, rate=1.0, burst=5, failure_threshold=5, failure_window=300, open_seconds=600):
+        self.rate = rate
+        self.burst = burst
+        self.failure_threshold = failure_threshold
+        self.failure_window = failure_window
+        self.open_seconds = open_seconds
+        self.client = redis.Redis.from_url(redis_url) if redis_url else None
+        self._take_script = self.client.register_script(TOKEN_BUCKET_SCRIPT) if self.client else None
+        self._lock = threading.Lock()
+        self._buckets = {}  # domain: (tokens, monotonic time), without Redis
+        self._failures = {}  # domain: (count, expires_at)
+        self._open_until = {}  # domain: time.time() the breaker closes
+
+    def take(self, domain, tokens=1):
+        """Draw up to `tokens` from the domain's bucket. Returns (granted, seconds until the rest would be available)."""
+        if self.client is not None:
+            granted, wait = self._take_script(keys=[BUCKET_KEY.format(domain)], args=[self.rate, self.burst, tokens])
+            return int(granted), float(wait)
+        with self._lock:
+            now = time.monotonic()
+            available, last = self._buckets.get(domain, (self.burst, now))
+            available = min(self.burst, available + (now - last) * self.rate)
+            granted = min(tokens, int(available))
+            available -= granted
+            self._buckets[domain] = (available, now)
+        wait = (tokens - granted - available) / self.rate if granted < tokens else 0.0
+        return granted, wait
+
+    def open_for(self, domain):
+        """Seconds until the domain's circuit breaker closes; 0 when it is closed."""
+        if self.client is not None:
+            remaining = self.client.pttl(OPEN_KEY.format(domain))
+            return max(remaining, 0) / 1000
+        return max(self._open_until.get(domain, 0) - time.time(), 0)
+
+    def acquire(self, domain):
+        """Seconds to wait before fetching one page of `domain`; 0 means go ahead, a token was taken."""
+        open_for = self.open_for(domain)
+        if open_for:
+            return open_for
+        granted, wait = self.take(domain)
+        return 0 if granted else wait
+
+    def admit(self, items, domain_of):
+        """
+        Split `items` into the ones that may be fetched now, one token each from their
+        domain's bucket, and the ones to defer. Returns (admitted, deferred, wait) where
+        `wait` is the longest any deferred domain needs.
+        """
+        by_domain = defaultdict(list)
+        for item in items:
+            by_domain[domain_of(item)].append(item)
+        admitted, deferred, longest = [], [], 0
+        for domain, group in by_domain.items():
+            open_for = self.open_for(domain)
+            granted, wait = (0, open_for) if open_for else self.take(domain, len(group))
+            admitted += group[:granted]
+            deferred += group[granted:]
+            if granted < len(group):
+                longest = max(longest, wait)
+        return admitted, deferred, longest
+
+    def record(self, domain, ok, count=1):
+        """Count `count` fetches of `domain` that succeeded or failed; failures past the threshold open the breaker."""
+        if ok:
+            self._reset(domain)
+            return
+        failures = self._add_failures(domain, count)
+        if failures >= self.failure_threshold:
+            self._open(domain)
+            logger.warning(f"Circuit open for {domain} after {failures} failed fetches, pausing it {self.open_seconds}s")
+
+    def record_results(self, outcomes):
+        """`record` a batch of (domain, ok) pairs; a domain with any success counts as healthy."""
+        failures, healthy = defaultdict(int), set()
+        for domain, ok in outcomes:
+            if ok:
+                healthy.add(domain)
+            else:
+                failures[domain] += 1
+        for domain in healthy:
+            self.record(domain, True)
+        for domain, count in failures.items():
+            if domain not in healthy:
+                self.record(domain, False, count)
+
+    def backoff(self, attempt, wait=0):
+        """Countdown for the `attempt`th deferral: exponential with jitter, and never sooner than `wait`."""
+        delay = min(settings.SCRAPER_THROTTLE_BACKOFF_SECONDS * 2 ** attempt, settings.SCRAPER_THROTTLE_MAX_BACKOFF)
+        return max(wait, delay * random.uniform(0.5, 1.0))
+
+    def _add_failures(self, domain, count):
+        if self.client is not None:
+            key = FAILURES_KEY.format(domain)
+            failures = self.client.incrby(key, count)
+            if failures == count:
+                self.client.expire(key, self.failure_window)
+            return failures
+        with self._lock:
+            failures, expires_at = self._failures.get(domain, (0, 0))
+            if expires_at < time.time():
+                failures, expires_at = 0, time.time() + self.failure_window
+            self._failures[domain] = (failures + count, expires_at)
+            return failures + count
+
+    def _open(self, domain):
+        # Leave the count one short of the threshold, so the first fetch after the
+        # breaker closes decides: a failure re-opens it, a success resets it.
+        half_open = self.failure_threshold - 1
+        if self.client is not None:
+            with self.client.pipeline() as pipe:
+                pipe.set(OPEN_KEY.format(domain), 1, ex=self.open_seconds)
+                pipe.set(FAILURES_KEY.format(domain), half_open, ex=self.open_seconds + self.failure_window)
+                pipe.execute()
+            return
+        with self._lock:
+            self._open_until[domain] = time.time() + self.open_seconds
+            self._failures[domain] = (half_open, time.time() + self.open_seconds + self.failure_window)
+
+    def _reset(self, domain):
+        if self.client is not None:
+            self.client.delete(FAILURES_KEY.format(domain))
+            return
+        with self._lock:
+            self._failures.pop(domain, None)
+
+
+def fetch_failed(result):
+    """
+    Whether a fetch result counts against its domain's breaker: an error, or a page that
+    came back without a price (WebDriverWait timeouts and block pages end up there).
+    """
+    if "error" in result:
+        return True
+    if result.get("not_modified") or result.get("needs_browser"):
+        return False
+    return result.get("current_price") == "N/A"
+
+
+_throttle = None
+_throttle_lock = threading.Lock()
+
+
+def get_throttle():
+    """The process-wide DomainThrottle, built from the SCRAPER_THROTTLE_* and SCRAPER_BREAKER_* settings."""
+    global _throttle
+    if _throttle is None:
+        with _throttle_lock:
+            if _throttle is None:
+                _throttle = DomainThrottle(
+                    redis_url=settings.SCRAPER_THROTTLE_REDIS_URL,
+                    rate=settings.SCRAPER_THROTTLE_RATE,
+                    burst=settings.SCRAPER_THROTTLE_BURST,
+                    failure_threshold=settings.SCRAPER_BREAKER_FAILURES,
+                    failure_window=settings.SCRAPER_BREAKER_WINDOW,
+                    open_seconds=settings.SCRAPER_BREAKER_OPEN_SECONDS,
+                )
+    return _throttle
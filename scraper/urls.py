@@ -7,6 +7,7 @@ urlpatterns = [
       # Companies endpoints
     path('companies/', views.CompanyListCreate.as_view(), name='company-list-create'),
     path('companies/<int:id>/', views.CompanyDetail.as_view(), name='company-detail'),
+    path('companies/<int:id>/recommend/', views.CompanyRecommendation.as_view(), name='company-recommendation'),
 
     # Products endpoints
     path('products/', views.ProductListCreate.as_view(), name='product-list-create'),
@@ -21,6 +22,7 @@ urlpatterns = [
     path('competitor-products/', CompetitorProductListView.as_view(), name='competitorproduct-list'),
     path('competitor-products/scrape/', ScrapeAndCreateCompetitorProduct.as_view(), name='competitorproduct-scrape'),
     path('competitor-products/<int:pk>/', CompetitorProductDetailView.as_view(), name='competitorproduct-detail'),
+    path('competitor-products/<int:pk>/history/', CompetitorProductHistoryView.as_view(), name='competitorproduct-history'),
 
     # Scraped data endpoints
     path('scrape/', views.ScrapeData.as_view(), name='scrape-data'),
@@ -29,7 +31,14 @@ urlpatterns = [
 
     # Recommendations endpoints
     path('recommendations/', views.RecommendationList.as_view(), name='recommendation-list'),
+    path('recommendations/current/', views.CurrentRecommendations.as_view(), name='recommendation-current'),
     path('recommendations/<int:product_id>/', views.RecommendationDetail.as_view(), name='recommendation-detail'),
 
+    # Export endpoints
+    path('exports/<str:dataset>/', views.ExportData.as_view(), name='export-data'),
+
+    # Import endpoints
+    path('imports/<str:kind>/', views.ImportData.as_view(), name='import-data'),
+
 ]
 
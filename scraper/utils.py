@@ -1,6 +1,8 @@
 from decimal import Decimal
 from statistics import mean
 
+import numpy as np
+
 def calculate_min_target_price(cost_price, margin_percent):
     """
     Ensures tenant achieves their desired profit.
@@ -17,11 +19,12 @@ def calculate_competitor_midpoint(prices):
     return (min(prices) + max(prices)) / 2
 
 
-def recommend_optimal_price(cost_price, margin_percent, competitor_prices):
+def recommend_optimal_price(cost_price, margin_percent, competitor_prices, currency):
     """
     Core pricing logic:
     - Uses margin to calculate minimum acceptable price.
     - Uses competitor data to find a balanced pricing point.
+    All prices are in `currency`, which the reason quotes.
     """
     if not competitor_prices:
         # No competitors → use only margin-based price
@@ -33,7 +36,7 @@ def recommend_optimal_price(cost_price, margin_percent, competitor_prices):
 
     if min_target_price <= highest_cp:
         suggested_price = min(max(min_target_price, competitor_mid), highest_cp)
-        reason = f"Within market range: Target price {min_target_price:.2f} SAR, competitor midpoint {competitor_mid:.2f} SAR"
+        reason = f"Within market range: Target price {min_target_price:.2f} {currency}, competitor midpoint {competitor_mid:.2f} {currency}"
     else:
         suggested_price = min_target_price
         reason = "Above market, positioned as premium due to high cost or high margin requirement"
@@ -41,6 +44,44 @@ def recommend_optimal_price(cost_price, margin_percent, competitor_prices):
     return round(suggested_price, 2), reason
 
 
+NO_COMPETITORS, WITHIN_MARKET, ABOVE_MARKET = 0, 1, 2
+
+
+def _hundredths(values):
+    """Two-place Decimals (the model fields' precision) as exact int64 hundredths; None maps to 0."""
+    return np.array([0 if v is None else int(Decimal(v) * 100) for v in values], dtype=np.int64)
+
+
+def _round_micros_to_cents(micros):
+    """Round non-negative millionths to hundredths, half to even like `round(Decimal, 2)`."""
+    cents, rest = np.divmod(micros, 10_000)
+    return cents + ((rest > 5_000) | ((rest == 5_000) & (cents % 2 == 1)))
+
+
+def recommend_optimal_prices(cost_prices, margin_percents, competitor_mins, competitor_maxs):
+    """
+    Vectorized `recommend_optimal_price` for a whole catalog.
+
+    Takes one sequence of Decimals per input, with None min/max for a product without
+    competitors. Cost times margin is exact in millionths, so the work runs on int64
+    millionths and rounds exactly as the Decimal version does. Returns (recommended prices
+    in cents, min target prices and competitor midpoints in millionths, case codes:
+    NO_COMPETITORS / WITHIN_MARKET / ABOVE_MARKET).
+    """
+    has_competitors = np.array([high is not None for high in competitor_maxs], dtype=bool)
+    min_targets = _hundredths(cost_prices) * (10_000 + _hundredths(margin_percents))
+    competitor_mins = _hundredths(competitor_mins) * 10_000
+    competitor_maxs = _hundredths(competitor_maxs) * 10_000
+    midpoints = (competitor_mins + competitor_maxs) // 2  # Sum of whole hundredths: always even in millionths
+
+    within_market = has_competitors & (min_targets <= competitor_maxs)
+    in_range = np.minimum(np.maximum(min_targets, midpoints), competitor_maxs)
+
+    prices = _round_micros_to_cents(np.where(within_market, in_range, min_targets))
+    cases = np.where(~has_competitors, NO_COMPETITORS, np.where(within_market, WITHIN_MARKET, ABOVE_MARKET))
+    return prices, min_targets, midpoints, cases
+
+
 # utils.py
 def calculate_recommended_price(cost_price, competitor_prices, target_margin):
     if not competitor_prices:
@@ -1,27 +1,36 @@
-from scrapy_scraper.spiders.price_checker import setup_driver, extract_product_data
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from scrapy_scraper.spiders.async_engine import scrape_urls
+from scrapy_scraper.spiders.fetcher import get_fetcher
+from django.utils.dateparse import parse_datetime
+from .caching import cached_get
+from .exports import CONTENT_TYPES, DATASETS, FORMATS, parquet_available, stream_export
+from .filters import ScrapedDataFilter
+from .imports import COLUMNS as IMPORT_COLUMNS, FORMATS as IMPORT_FORMATS, import_rows, read_rows
+from .history import price_series
+from .pagination import CursorPaginatedListMixin
 from .serializers import PriceRecommendationSerializer, ScrapedDataSerializer, CompetitorSerializer, ProductSerializer, \
-    TenantSerializer, CompetitorProductSerializer
+    TenantSerializer, CompetitorProductSerializer, PricePointSerializer, CompetitorPriceRollupSerializer
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import serializers
-from .models import Tenant, Product, Competitor, ScrapedData, PriceRecommendation, CompetitorProduct
+from .models import Tenant, Product, Competitor, ScrapedData, PriceRecommendation, CompetitorProduct, ProductMarketStats
 from rest_framework import permissions
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from .task import recommend_tenant_catalog
 from .utils import recommend_optimal_price
 
 
 # Company Views
-class CompanyListCreate(APIView):
+class CompanyListCreate(CursorPaginatedListMixin, APIView):
     #permission_classes = [permissions.IsAuthenticated]
 
     @swagger_auto_schema(operation_description="List all companies or create a new company")
     def get(self, request):
-        companies = Tenant.objects.all()
-        serializer = TenantSerializer(companies, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(request, Tenant.objects.all(), TenantSerializer)
 
     @swagger_auto_schema(
         operation_description="Create a new company",
@@ -30,6 +39,8 @@ class CompanyListCreate(APIView):
             properties={
                 "user_identifier": openapi.Schema(type=openapi.TYPE_STRING, description="User_identifier"),
                 "email": openapi.Schema(type=openapi.TYPE_STRING, description="Company email address"),
+                "min_scrape_interval": openapi.Schema(type=openapi.TYPE_INTEGER, description="Shortest interval for adaptive products, in seconds"),
+                "max_scrape_interval": openapi.Schema(type=openapi.TYPE_INTEGER, description="Longest interval for adaptive products, in seconds"),
             },
             required=["user_identifier",  "email"],
         ),
@@ -70,6 +81,8 @@ class CompanyDetail(APIView):
             properties={
                 "user_identifier": openapi.Schema(type=openapi.TYPE_STRING, description="User_identifier"),
                 "email": openapi.Schema(type=openapi.TYPE_STRING, description="Company email address"),
+                "min_scrape_interval": openapi.Schema(type=openapi.TYPE_INTEGER, description="Shortest interval for adaptive products, in seconds"),
+                "max_scrape_interval": openapi.Schema(type=openapi.TYPE_INTEGER, description="Longest interval for adaptive products, in seconds"),
             },
             required=["user_identifier",  "email"],
         ),)
@@ -95,14 +108,13 @@ class CompanyDetail(APIView):
 
 
 # Product Views
-class ProductListCreate(APIView):
+class ProductListCreate(CursorPaginatedListMixin, APIView):
     #permission_classes = [permissions.IsAuthenticated]
 
     @swagger_auto_schema(operation_description="List all products or create a new product", )
+    @cached_get("products")
     def get(self, request):
-        products = Product.objects.all()
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(request, Product.objects.select_related("market_stats"), ProductSerializer)
 
     @swagger_auto_schema(
     operation_summary="Create a new product",
@@ -131,9 +143,10 @@ class ProductDetail(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     @swagger_auto_schema(operation_description="Retrieve a product by ID")
+    @cached_get("product:{id}")
     def get(self, request, id):
         try:
-            product = Product.objects.get(id=id)
+            product = Product.objects.select_related("market_stats").get(id=id)
         except Product.DoesNotExist:
             return Response(status=status.HTTP_404_NOT_FOUND)
         serializer = ProductSerializer(product)
@@ -170,42 +183,67 @@ class ProductRecommendation(APIView):
     )
     def post(self, request, id):
         try:
-            product = Product.objects.get(id=id)
+            product = Product.objects.select_related("market_stats").get(id=id)
         except Product.DoesNotExist:
             return Response({"detail": "Product not found."}, status=status.HTTP_404_NOT_FOUND)
 
         cost_price = product.cost_price
         margin = product.target_margin
 
-        # Get competitor prices for this product
-        competitor_qs = CompetitorProduct.objects.filter(product=product, price_value__isnull=False)
-        competitor_prices = list(competitor_qs.values_list("price_value", flat=True))
+        # The pricing rules only need the competitor range, which is kept in ProductMarketStats
+        try:
+            stats = product.market_stats
+        except ProductMarketStats.DoesNotExist:
+            stats = None
+        competitor_prices = [stats.min_price, stats.max_price] if stats and stats.competitor_count else []
+
+        # Per-competitor prices (in PRICING_CURRENCY, like the stats) and names for the audit trail, in one query
+        competitors = list(
+            CompetitorProduct.objects.filter(product=product, normalized_price__isnull=False)
+            .values_list("normalized_price", "competitor__name")
+        )
 
         # Apply recommendation logic
-        recommended_price, reason = recommend_optimal_price(cost_price, margin, competitor_prices)
+        recommended_price, reason = recommend_optimal_price(cost_price, margin, competitor_prices, settings.PRICING_CURRENCY)
 
         # Save the recommendation
         recommendation = PriceRecommendation.objects.create(
             product=product,
             recommended_price=recommended_price,
-            #reason=reason,
+            reason=reason,
             competitor_data_used={
-                "prices": [float(p) for p in competitor_prices],  # Convert Decimal to float
-                "sources": [cp.competitor.name for cp in competitor_qs],
+                "currency": settings.PRICING_CURRENCY,
+                "count": stats.competitor_count if stats else 0,
+                "min": float(stats.min_price) if competitor_prices else None,  # Convert Decimal to float
+                "max": float(stats.max_price) if competitor_prices else None,
+                "mean": float(stats.mean_price) if competitor_prices else None,
+                "prices": [float(price) for price, _ in competitors],
+                "sources": [name for _, name in competitors],
             },
         )
 
         return Response(PriceRecommendationSerializer(recommendation).data, status=status.HTTP_201_CREATED)
 
+class CompanyRecommendation(APIView):
+    #permission_classes = [permissions.IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Queue a recommendation run for every product of a company",
+        responses={202: openapi.Response("Recommendation run queued.")}
+    )
+    def post(self, request, id):
+        if not Tenant.objects.filter(id=id).exists():
+            return Response({"detail": "Company not found."}, status=status.HTTP_404_NOT_FOUND)
+        result = recommend_tenant_catalog.delay(id)
+        return Response({"task_id": result.id}, status=status.HTTP_202_ACCEPTED)
+
 # Competitor Views
-class CompetitorListCreate(APIView):
+class CompetitorListCreate(CursorPaginatedListMixin, APIView):
     #permission_classes = [permissions.IsAuthenticated]
 
     @swagger_auto_schema(operation_description="List or add a competitor")
     def get(self, request):
-        competitors = Competitor.objects.all()
-        serializer = CompetitorSerializer(competitors, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(request, Competitor.objects.all(), CompetitorSerializer)
 
     @swagger_auto_schema(
     operation_summary="Add a new competitor",
@@ -261,14 +299,25 @@ class CompetitorDetail(APIView):
 
 
 
-class CompetitorProductListView(APIView):
-    queryset = CompetitorProduct.objects.all()
-    serializer_class = CompetitorProductSerializer
+class CompetitorProductListView(CursorPaginatedListMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
 
-    @swagger_auto_schema(operation_description="List all competitor products")
+    @swagger_auto_schema(
+        operation_description="List all competitor products, optionally for one product or competitor",
+        manual_parameters=[
+            openapi.Parameter("product", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter("competitor", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        ],
+    )
     def get(self, request, *args, **kwargs):
-        return super().get(request, *args, **kwargs)
+        queryset = CompetitorProduct.objects.all()
+        for field in ("product", "competitor"):
+            value = request.query_params.get(field)
+            if value:
+                if not value.isdigit():
+                    return Response({"error": f"{field} must be an id."}, status=status.HTTP_400_BAD_REQUEST)
+                queryset = queryset.filter(**{f"{field}_id": value})
+        return self.paginated_response(request, queryset, CompetitorProductSerializer)
 
 
 class ScrapeAndCreateCompetitorProduct(APIView):
@@ -297,9 +346,8 @@ class ScrapeAndCreateCompetitorProduct(APIView):
         if not (product_id and competitor_id and url):
             return Response({"error": "Missing required fields."}, status=status.HTTP_400_BAD_REQUEST)
 
-        driver = setup_driver()
         try:
-            scraped = extract_product_data(url, driver)
+            scraped = get_fetcher().fetch(url)
             if not scraped.get("product_name") or not scraped.get("current_price"):
                 return Response(
                     {"error": "Incomplete data.", "scraped_data": scraped},
@@ -307,8 +355,6 @@ class ScrapeAndCreateCompetitorProduct(APIView):
                 )
         except Exception as e:
             return Response({"error": "Scraping failed", "details": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        finally:
-            driver.quit()
 
         data = {
             "product": product_id,
@@ -380,30 +426,81 @@ class CompetitorProductDetailView(APIView):
         obj.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+class CompetitorProductHistoryView(APIView):
+    #permission_classes = [permissions.IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Price history of a competitor product, raw or downsampled to hourly/daily min/max/last",
+        manual_parameters=[
+            openapi.Parameter("start", openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+            openapi.Parameter("end", openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+            openapi.Parameter("resolution", openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=["raw", "hour", "day"], default="raw"),
+        ],
+    )
+    def get(self, request, pk):
+        if not CompetitorProduct.objects.filter(pk=pk).exists():
+            return Response({"error": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        resolution = request.query_params.get("resolution", "raw")
+        if resolution not in ("raw", "hour", "day"):
+            return Response({"error": "resolution must be raw, hour or day."}, status=status.HTTP_400_BAD_REQUEST)
+        bounds = {}
+        for name in ("start", "end"):
+            value = request.query_params.get(name)
+            if value:
+                bounds[name] = parse_datetime(value)
+                if bounds[name] is None:
+                    return Response({"error": f"Invalid {name} datetime."}, status=status.HTTP_400_BAD_REQUEST)
+
+        series = price_series(pk, resolution=resolution, **bounds)
+        serializer_class = PricePointSerializer if resolution == "raw" else CompetitorPriceRollupSerializer
+        return Response({"resolution": resolution, "points": serializer_class(series, many=True).data})
+
 # ScrapedData Views
 class ScrapeData(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
-    @swagger_auto_schema(operation_description="Scrape competitor data immediately")
+    @swagger_auto_schema(
+        operation_description="Scrape competitor data immediately. URLs are scraped concurrently.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=["urls"],
+            properties={
+                "urls": openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_URI)),
+            },
+        ),
+    )
     def post(self, request):
-        # Scraping logic here (not implemented in the example)
-        return Response({"status": "scrape started"}, status=status.HTTP_200_OK)
-
-
-class ScrapedDataList(APIView):
+        urls = request.data.get("urls")
+        if not isinstance(urls, list) or not urls:
+            return Response({"error": "urls must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(urls) > settings.SCRAPER_API_MAX_URLS:
+            return Response(
+                {"error": f"At most {settings.SCRAPER_API_MAX_URLS} urls per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response({"results": scrape_urls(urls)}, status=status.HTTP_200_OK)
+
+
+class ScrapedDataList(CursorPaginatedListMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
 
-    @swagger_auto_schema(operation_description="View all scraped data")
+    @swagger_auto_schema(
+        operation_description="View all scraped data, filtered by user_identifier, min_price/max_price and start_date/end_date"
+    )
+    @cached_get("scraped-data")
     def get(self, request):
-        scraped_data = ScrapedData.objects.all()
-        serializer = ScrapedDataSerializer(scraped_data, many=True)
-        return Response(serializer.data)
+        filterset = ScrapedDataFilter(request.query_params, queryset=ScrapedData.objects.all())
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+        return self.paginated_response(request, filterset.qs, ScrapedDataSerializer)
 
 
 class ScrapedDataDetail(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     @swagger_auto_schema(operation_description="View scraped data for a specific product")
+    @cached_get("scraped-data")
     def get(self, request, product_id):
         scraped_data = ScrapedData.objects.filter(id=product_id)
         if not scraped_data.exists():
@@ -413,25 +510,136 @@ class ScrapedDataDetail(APIView):
 
 
 # Recommendations Views
-class RecommendationList(APIView):
+class RecommendationList(CursorPaginatedListMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     @swagger_auto_schema(operation_description="View all recommendations")
+    @cached_get("recommendations")
     def get(self, request):
-        recommendations = PriceRecommendation.objects.all()
-        serializer = PriceRecommendationSerializer(recommendations, many=True)
-        return Response(serializer.data)
+        recommendations = PriceRecommendation.objects.select_related("product__market_stats")
+        return self.paginated_response(request, recommendations, PriceRecommendationSerializer)
 
 
 class RecommendationDetail(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
-    @swagger_auto_schema(operation_description="View recommendation for a product")
+    @swagger_auto_schema(operation_description="View the current recommendation for a product")
+    @cached_get("recommendations:{product_id}")
     def get(self, request, product_id):
-        try:
-            recommendation = PriceRecommendation.objects.get(product__id=product_id)
-        except PriceRecommendation.DoesNotExist:
+        # Follows Product.current_recommendation: a primary key join, no scan of the history
+        recommendation = (
+            PriceRecommendation.objects.select_related("product__market_stats")
+            .filter(current_for__id=product_id)
+            .first()
+        )
+        if recommendation is None:
             return Response(status=status.HTTP_404_NOT_FOUND)
         serializer = PriceRecommendationSerializer(recommendation)
-        return Response
+        return Response(serializer.data)
+
+
+class CurrentRecommendations(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    max_products = 500
+
+    @swagger_auto_schema(
+        operation_description="Current recommendations for many products at once",
+        manual_parameters=[
+            openapi.Parameter("product_ids", openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True,
+                              description="Comma-separated product ids (at most 500)"),
+        ],
+    )
+    @cached_get("recommendations")
+    def get(self, request):
+        raw_ids = [value.strip() for value in request.query_params.get("product_ids", "").split(",") if value.strip()]
+        if not raw_ids or not all(value.isdigit() for value in raw_ids):
+            return Response({"error": "product_ids must be a comma-separated list of ids."}, status=status.HTTP_400_BAD_REQUEST)
+        product_ids = list(dict.fromkeys(int(value) for value in raw_ids))
+        if len(product_ids) > self.max_products:
+            return Response({"error": f"At most {self.max_products} product ids per request."}, status=status.HTTP_400_BAD_REQUEST)
+
+        recommendations = (
+            PriceRecommendation.objects.select_related("product__market_stats")
+            .filter(current_for__id__in=product_ids)
+        )
+        found = {recommendation.product_id: recommendation for recommendation in recommendations}
+        return Response({
+            "results": PriceRecommendationSerializer(
+                [found[product_id] for product_id in product_ids if product_id in found], many=True
+            ).data,
+            "missing": [product_id for product_id in product_ids if product_id not in found],
+        })
+
 
+# Export Views
+class ExportData(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Stream a whole dataset as CSV, NDJSON or Parquet, optionally for one company and date range",
+        manual_parameters=[
+            openapi.Parameter("file_format", openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=list(FORMATS), default="csv"),
+            openapi.Parameter("tenant", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter("start", openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+            openapi.Parameter("end", openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+        ],
+    )
+    def get(self, request, dataset):
+        if dataset not in DATASETS:
+            return Response({"error": f"Unknown dataset; choose one of {', '.join(DATASETS)}."}, status=status.HTTP_404_NOT_FOUND)
+        export_format = request.query_params.get("file_format", "csv")
+        if export_format not in FORMATS:
+            return Response({"error": f"file_format must be one of {', '.join(FORMATS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        if export_format == "parquet" and not parquet_available():
+            return Response({"error": "Parquet export needs pyarrow installed."}, status=status.HTTP_400_BAD_REQUEST)
+
+        tenant = request.query_params.get("tenant")
+        if tenant and not tenant.isdigit():
+            return Response({"error": "tenant must be an id."}, status=status.HTTP_400_BAD_REQUEST)
+        bounds = {}
+        for name in ("start", "end"):
+            value = request.query_params.get(name)
+            if value:
+                bounds[name] = parse_datetime(value)
+                if bounds[name] is None:
+                    return Response({"error": f"Invalid {name} datetime."}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(
+            stream_export(dataset, export_format, tenant_id=tenant and int(tenant),
+                          chunk_size=settings.SCRAPER_EXPORT_CHUNK_SIZE, **bounds),
+            content_type=CONTENT_TYPES[export_format],
+        )
+        response["Content-Disposition"] = f'attachment; filename="{dataset}.{export_format}"'
+        return response
+
+
+# Import Views
+class ImportData(APIView):
+    #permission_classes = [permissions.IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Bulk upsert products, competitors or competitor products for a company from a CSV or NDJSON "
+                              "upload. Products are keyed by name, competitors by url, competitor products by product and "
+                              "product_url. Returns how many rows were imported and an error report for the rejected ones.",
+        manual_parameters=[
+            openapi.Parameter("file", openapi.IN_FORM, type=openapi.TYPE_FILE, required=True),
+            openapi.Parameter("tenant", openapi.IN_FORM, type=openapi.TYPE_INTEGER, required=True),
+            openapi.Parameter("file_format", openapi.IN_FORM, type=openapi.TYPE_STRING, enum=list(IMPORT_FORMATS),
+                              description="Defaults to the file extension"),
+        ],
+    )
+    def post(self, request, kind):
+        if kind not in IMPORT_COLUMNS:
+            return Response({"error": f"Unknown import; choose one of {', '.join(IMPORT_COLUMNS)}."}, status=status.HTTP_404_NOT_FOUND)
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"error": "Upload the rows as a 'file' field."}, status=status.HTTP_400_BAD_REQUEST)
+        tenant = str(request.data.get("tenant", ""))
+        if not tenant.isdigit() or not Tenant.objects.filter(id=tenant).exists():
+            return Response({"error": "tenant must be an existing company id."}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get("file_format") or upload.name.rsplit(".", 1)[-1].lower()
+        if file_format not in IMPORT_FORMATS:
+            return Response({"error": f"file_format must be one of {', '.join(IMPORT_FORMATS)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        report = import_rows(kind, int(tenant), read_rows(upload, file_format), batch_size=settings.SCRAPER_IMPORT_BATCH_SIZE)
+        return Response(report, status=status.HTTP_200_OK)
@@ -1,12 +1,17 @@
-# Define here the models for your scraped items
-#
-# See documentation in:
-# https://docs.scrapy.org/en/latest/topics/items.html
-
 import scrapy
 
 
-class ScrapyScraperItem(scrapy.Item):
-    # define the fields for your item here like:
-    # name = scrapy.Field()
-    pass
+class PriceItem(scrapy.Item):
+    """One crawled product page, addressed to the row it updates."""
+    target = scrapy.Field()  # "scraped-data" or "competitor-products"
+    pk = scrapy.Field()
+    url = scrapy.Field()
+    product_name = scrapy.Field()
+    current_price = scrapy.Field()
+    previous_price = scrapy.Field()
+    description = scrapy.Field()
+    fetched_at = scrapy.Field()
+    not_modified = scrapy.Field()  # Page unchanged since the last crawl; only last_checked is written
+    fetch_state = scrapy.Field()  # Validators and price region hash for the next conditional request
+    needs_browser = scrapy.Field()  # No price in the static HTML; handed to the Celery browser tier
+    failed = scrapy.Field()  # The fetch failed; a claimed row is made due again
@@ -4,10 +4,16 @@
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
 from scrapy import signals
+from scrapy.exceptions import IgnoreRequest
+from twisted.internet import reactor
+from twisted.internet.task import deferLater
 
 # useful for handling different item types with a single interface
 from itemadapter import is_item, ItemAdapter
 
+from scraper.throttling import get_throttle
+from scrapy_scraper.spiders.profiles import domain_of
+
 
 class ScrapyScraperSpiderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
@@ -101,3 +107,43 @@ class ScrapyScraperDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class DomainThrottleMiddleware:
+    """
+    Make the crawl draw from the same per-domain token buckets and circuit breakers as
+    the Celery workers (scraper.throttling). A request short of a token waits for it
+    without blocking the reactor; a request to a domain whose circuit is open is
+    dropped, and its row comes due again later. Blocked, rate limited (403, 429) and
+    failing (5xx) responses and download errors count against the domain.
+    """
+    FAILURE_STATUSES = {403, 429}
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.throttle = get_throttle()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.stats)
+
+    async def process_request(self, request, spider):
+        domain = domain_of(request.url)
+        if self.throttle.open_for(domain):
+            self.stats.inc_value("throttle/circuit_open")
+            raise IgnoreRequest(f"Circuit open for {domain}")
+        while True:
+            granted, wait = self.throttle.take(domain)
+            if granted:
+                return None
+            self.stats.inc_value("throttle/waited")
+            await deferLater(reactor, wait)
+
+    def process_response(self, request, response, spider):
+        failed = response.status in self.FAILURE_STATUSES or response.status >= 500
+        self.throttle.record(domain_of(request.url), ok=not failed)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        if not isinstance(exception, IgnoreRequest):
+            self.throttle.record(domain_of(request.url), ok=False)
@@ -1,13 +1,164 @@
-# Define your item pipelines here
-#
-# Don't forget to add your pipeline to the ITEM_PIPELINES setting
-# See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
+import logging
+from collections import defaultdict
 
+from django.db import transaction
+from django.utils import timezone
+from twisted.internet import task
 
-# useful for handling different item types with a single interface
-from itemadapter import ItemAdapter
+from scraper.caching import invalidate_scraped_data
+from scraper.models import (
+    PRICE_FIELDS, ScrapedData, save_fetch_states, touch_competitor_products, write_competitor_prices,
+)
+from scraper.scheduling import ADAPTIVE_FIELDS, adapt_schedules, back_off_failures
+from scraper.task import update_competitor_products_batch, update_scraped_data_batch
+from scrapy_scraper.spiders.due_prices import COMPETITOR_PRODUCTS, SCRAPED_DATA
 
+logger = logging.getLogger(__name__)
+
+
+class BulkWritePipeline:
+    """
+    Buffer crawled PriceItems and write them with one bulk_update per model every
+    PRICE_PIPELINE_BATCH_SIZE items or PRICE_PIPELINE_FLUSH_SECONDS, whichever comes
+    first, and once more when the spider closes.
+
+    A flush does what `save()` would have done per row: the price is re-parsed, and
+    competitor price changes mark their products dirty, refresh the market stats and
+    land in the price history, all batched. Items for unchanged pages only bump
+    last_checked, with one UPDATE per model, and every item's fetch_state is upserted.
+    Adaptive ScrapedData rows are rescheduled from what the crawl saw, changed or not.
+
+    Pages without a static price go to the browser tier on the scrape-browser queue:
+    update_scraped_data_batch for ScrapedData and update_competitor_products_batch for
+    competitor products. ScrapedData rows were claimed (next_run_at pushed a full
+    interval) when the crawl loaded them, so rows whose fetch failed are retried sooner,
+    backing off per consecutive failure (see back_off_failures). Competitor products are
+    due by last_checked, which a failed fetch leaves alone, so they come up again on
+    their own.
+    """
+
+    def __init__(self, batch_size=500, flush_seconds=5.0, stats=None):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.stats = stats
+        self.buffer = []
+        self._timer = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            batch_size=crawler.settings.getint("PRICE_PIPELINE_BATCH_SIZE", 500),
+            flush_seconds=crawler.settings.getfloat("PRICE_PIPELINE_FLUSH_SECONDS", 5.0),
+            stats=crawler.stats,
+        )
+
+    def open_spider(self, spider):
+        self._timer = task.LoopingCall(self._flush_on_timer)
+        self._timer.start(self.flush_seconds, now=False)
+
+    def close_spider(self, spider):
+        if self._timer is not None and self._timer.running:
+            self._timer.stop()
+        self.flush()
 
-class ScrapyScraperPipeline:
     def process_item(self, item, spider):
+        self.buffer.append(item)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
         return item
+
+    def _flush_on_timer(self):
+        # An exception would stop the LoopingCall for the rest of the crawl.
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Periodic flush of crawled prices failed")
+
+    def flush(self):
+        items, self.buffer = self.buffer, []
+        if not items:
+            return 0
+        by_target = defaultdict(dict)
+        for item in items:
+            by_target[item["target"]][item["pk"]] = item  # A later page of the same row wins
+        needs_browser, failed = self._split_unpriced(by_target[SCRAPED_DATA])
+        competitors_need_browser, _ = self._split_unpriced(by_target[COMPETITOR_PRODUCTS])
+        items = [item for target_items in by_target.values() for item in target_items.values()]
+        with transaction.atomic():
+            if failed:
+                failed_rows = ScrapedData.objects.only("id", "update_frequency", "scrape_interval", "failed_scrapes")
+                ScrapedData.objects.bulk_update(
+                    back_off_failures(failed_rows.filter(id__in=failed)), ["failed_scrapes", "next_run_at"]
+                )
+            if needs_browser:
+                transaction.on_commit(lambda: update_scraped_data_batch.apply_async(args=[needs_browser]))
+            if competitors_need_browser:
+                transaction.on_commit(lambda: update_competitor_products_batch.apply_async(args=[competitors_need_browser]))
+            scraped_data, scraped_data_unchanged = self._split_unchanged(by_target[SCRAPED_DATA])
+            competitor_products, competitor_products_unchanged = self._split_unchanged(by_target[COMPETITOR_PRODUCTS])
+            ScrapedData.objects.filter(
+                id__in=list(scraped_data) + scraped_data_unchanged, failed_scrapes__gt=0
+            ).update(failed_scrapes=0)
+            written = self._write_scraped_data(scraped_data, scraped_data_unchanged)
+            written += write_competitor_prices(
+                {pk: (item["current_price"], item["fetched_at"]) for pk, item in competitor_products.items()}
+            )
+            touch_competitor_products(competitor_products_unchanged, timezone.now())
+            save_fetch_states({item["url"]: item.get("fetch_state") for item in items if item.get("fetch_state")})
+        unchanged = len(scraped_data_unchanged) + len(competitor_products_unchanged)
+        handed = len(needs_browser) + len(competitors_need_browser)
+        if self.stats is not None:
+            self.stats.inc_value("prices/written", written)
+            self.stats.inc_value("prices/handed_to_browser", handed)
+        logger.info(
+            f"Wrote {written} crawled prices and {unchanged} unchanged checks, handed {handed} to the "
+            f"browser tier and rescheduled {len(failed)} failed rows"
+        )
+        return written
+
+    @staticmethod
+    def _split_unpriced(items):
+        """Take the needs-browser and failed items out of {pk: item}; returns their pks as two lists."""
+        needs_browser = [pk for pk, item in items.items() if item.get("needs_browser")]
+        failed = [pk for pk, item in items.items() if item.get("failed")]
+        for pk in needs_browser + failed:
+            del items[pk]
+        return needs_browser, failed
+
+    @staticmethod
+    def _split_unchanged(items):
+        """({pk: item} for pages with a new price to write, [pk] for pages found unchanged)."""
+        changed = {pk: item for pk, item in items.items() if not item.get("not_modified")}
+        return changed, [pk for pk in items if pk not in changed]
+
+    def _write_scraped_data(self, items, unchanged_ids):
+        if not items and not unchanged_ids:
+            return 0
+        now = timezone.now()
+        products = ScrapedData.objects.only(
+            "id", "user_identifier", "update_frequency", "last_checked", *PRICE_FIELDS, *ADAPTIVE_FIELDS
+        ).in_bulk(list(items) + unchanged_ids)
+        updated, unchanged, changed_ids = [], [], set()
+        for pk, product in products.items():
+            if pk not in items:
+                product.last_checked = now
+                unchanged.append(product)
+                continue
+            price_before = product.price_value
+            product.previous_price = product.current_price
+            product.current_price = items[pk]["current_price"]
+            product.last_checked = items[pk]["fetched_at"]
+            product.update_price()
+            if product.price_value != price_before:
+                changed_ids.add(pk)
+            updated.append(product)
+
+        adapted = {product.id for product in adapt_schedules(products.values(), changed_ids, now)}
+        ScrapedData.objects.filter(id__in=[p.id for p in unchanged if p.id not in adapted]).update(last_checked=now)
+        ScrapedData.objects.bulk_update([p for p in unchanged if p.id in adapted], ["last_checked"] + ADAPTIVE_FIELDS, batch_size=500)
+        if updated:
+            ScrapedData.objects.bulk_update(
+                updated, PRICE_FIELDS + ["last_checked"] + (ADAPTIVE_FIELDS if adapted else []), batch_size=500
+            )
+            invalidate_scraped_data()
+        return len(updated)
@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+
+from playwright.async_api import Error as PlaywrightError
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import async_playwright
+
+from scrapy_scraper.spiders.fetcher import (
+    BROWSER_TIER, DEFAULT_HEADERS, HTTP_TIER, DomainTierMemory, conditional_headers, domain_of, get_tier_memory,
+    not_modified, parse_unless_unchanged,
+)
+from scrapy_scraper.spiders.parsers import parse_html
+from scrapy_scraper.spiders.price_checker import PRICE_QUERY, clean_price, parse_product_data
+
+logger = logging.getLogger(__name__)
+
+# Resources a price scrape never needs; aborting them keeps pages light.
+BLOCKED_RESOURCES = {"image", "media", "font"}
+
+
+class AsyncScrapeEngine:
+    """
+    Scrapes many URLs concurrently in one event loop on Playwright's async API.
+
+    - `max_concurrency` caps pages in flight across all domains.
+    - `per_domain` caps pages in flight per domain, and consecutive requests to a
+      domain start at least `politeness_delay` seconds apart.
+    - Static HTML is tried first through Playwright's request context; Chrome is
+      launched only for domains that need it, and each page waits at most
+      `price_wait` seconds for a price element instead of fixed sleeps.
+    """
+
+    def __init__(self, max_concurrency=100, per_domain=4, politeness_delay=0.5, timeout=20,
+                 price_wait=5, browser_channel=None, tier_memory=None):
+        self.max_concurrency = max_concurrency
+        self.per_domain = per_domain
+        self.politeness_delay = politeness_delay
+        self.timeout_ms = timeout * 1000
+        self.price_wait_ms = price_wait * 1000
+        self.browser_channel = browser_channel or None
+        self.tier_memory = tier_memory or DomainTierMemory()
+        self._playwright = None
+        self._request = None
+        self._browser_context = None
+        self._browser = None
+
+    async def __aenter__(self):
+        self._playwright = await async_playwright().start()
+        self._request = await self._playwright.request.new_context(
+            extra_http_headers=DEFAULT_HEADERS, timeout=self.timeout_ms
+        )
+        self._global = asyncio.Semaphore(self.max_concurrency)
+        self._domain_slots = defaultdict(lambda: asyncio.Semaphore(self.per_domain))
+        self._domain_locks = defaultdict(asyncio.Lock)
+        self._domain_last_start = {}
+        self._browser_lock = asyncio.Lock()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self._browser is not None:
+            await self._browser.close()
+        await self._request.dispose()
+        await self._playwright.stop()
+
+    async def _browser_page(self):
+        async with self._browser_lock:
+            if self._browser is None:
+                self._browser = await self._playwright.chromium.launch(headless=True, channel=self.browser_channel)
+                self._browser_context = await self._browser.new_context(user_agent=DEFAULT_HEADERS["User-Agent"])
+                await self._browser_context.route("**/*", _block_heavy_resources)
+        return await self._browser_context.new_page()
+
+    async def _wait_politely(self, domain):
+        async with self._domain_locks[domain]:
+            wait = self._domain_last_start.get(domain, 0) + self.politeness_delay - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._domain_last_start[domain] = time.monotonic()
+
+    async def _fetch_static(self, url, state=None):
+        try:
+            response = await self._request.get(url, headers=conditional_headers(state))
+        except PlaywrightError as e:
+            logger.info(f"HTTP tier failed for {url}: {e}")
+            return None
+        if response.status == 304:
+            return not_modified(url, state)
+        if not response.ok:
+            logger.info(f"HTTP tier got status {response.status} for {url}")
+            return None
+        html = await response.text()
+        return await asyncio.to_thread(parse_unless_unchanged, html, url, _header_map(response), state)
+
+    async def _fetch_browser(self, url):
+        page = await self._browser_page()
+        try:
+            await page.goto(url, wait_until="domcontentloaded", timeout=self.timeout_ms)
+            try:
+                await page.wait_for_selector(PRICE_QUERY, timeout=self.price_wait_ms)
+            except PlaywrightTimeoutError:
+                logger.warning(f"No price element on {url} after {self.price_wait_ms}ms")
+            price_js = await page.eval_on_selector_all(
+                PRICE_QUERY, "els => els.length ? els[0].innerText.trim() : null"
+            )
+            html = await page.content()
+        finally:
+            await page.close()
+        return await asyncio.to_thread(_parse_html, html, url, clean_price(price_js))
+
+    async def scrape(self, url, state=None):
+        """
+        Scrape one URL, conditionally when `state` is the `fetch_state` of its last scrape;
+        failures come back as {"url", "error"} instead of raising.
+        """
+        domain = domain_of(url)
+        async with self._domain_slots[domain]:
+            await self._wait_politely(domain)
+            async with self._global:
+                return await self._scrape_tiered(url, domain, state)
+
+    async def _scrape_tiered(self, url, domain, state=None):
+        try:
+            if self.tier_memory.get(domain) != BROWSER_TIER:
+                data = await self._fetch_static(url, state)
+                if data and (data.get("not_modified") or data["current_price"] != "N/A"):
+                    self.tier_memory.record(domain, HTTP_TIER)
+                    data["fetch_tier"] = HTTP_TIER
+                    return data
+            data = await self._fetch_browser(url)
+            if data["current_price"] != "N/A":
+                self.tier_memory.record(domain, BROWSER_TIER)
+            data["fetch_tier"] = BROWSER_TIER
+            return data
+        except Exception as e:
+            logger.error(f"Async scrape failed for {url}: {e}")
+            return {"url": url, "error": str(e)}
+
+    async def scrape_many(self, urls, states=None):
+        """Scrape every URL concurrently; results come back in the same order as `urls`. `states` maps URL to fetch_state."""
+        states = states or {}
+        return await asyncio.gather(*(self.scrape(url, states.get(url)) for url in urls))
+
+
+async def _block_heavy_resources(route):
+    if route.request.resource_type in BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+def _header_map(response):
+    """Playwright lower-cases header names; give them back in the form parse_unless_unchanged reads."""
+    return {"ETag": response.headers.get("etag", ""), "Last-Modified": response.headers.get("last-modified", "")}
+
+
+def _parse_html(html, url, price_hint=None):
+    return parse_product_data(parse_html(html), url, price_hint=price_hint)
+
+
+def engine_from_settings():
+    from django.conf import settings
+
+    return AsyncScrapeEngine(
+        max_concurrency=getattr(settings, "SCRAPER_ASYNC_CONCURRENCY", 100),
+        per_domain=getattr(settings, "SCRAPER_ASYNC_PER_DOMAIN", 4),
+        politeness_delay=getattr(settings, "SCRAPER_POLITENESS_DELAY", 0.5),
+        timeout=getattr(settings, "SCRAPER_ASYNC_TIMEOUT", 20),
+        browser_channel=getattr(settings, "SCRAPER_PLAYWRIGHT_CHANNEL", None),
+        tier_memory=get_tier_memory(),
+    )
+
+
+def scrape_urls(urls, engine=None, states=None):
+    """Blocking entry point for Celery tasks and views: scrape `urls` on a fresh event loop."""
+    engine = engine or engine_from_settings()
+
+    async def run():
+        async with engine:
+            return await engine.scrape_many(urls, states)
+
+    return asyncio.run(run())
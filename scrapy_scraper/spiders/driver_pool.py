@@ -0,0 +1,158 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+from selenium.common.exceptions import WebDriverException
+
+from scrapy_scraper.spiders.price_checker import setup_driver
+
+logger = logging.getLogger(__name__)
+
+
+class PooledDriver:
+    """A warm Chrome session plus the bookkeeping the pool needs to recycle it."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+
+    def is_healthy(self):
+        """Cheap round-trip to the browser; a dead session raises instead of answering."""
+        try:
+            self.driver.execute_script("return 1")
+            return True
+        except WebDriverException:
+            return False
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.warning(f"Error while quitting driver: {e}")
+
+
+class DriverPool:
+    """
+    Keeps up to `size` headless Chrome sessions warm and hands them out one at a time.
+
+    - Sessions are started lazily, so an idle worker never launches Chrome.
+    - A session is recycled after `max_pages` page loads to bound Chrome's memory growth.
+    - Sessions are health-checked before being leased; dead ones are replaced.
+    - A session that raises a WebDriverException while leased is discarded, not returned.
+    """
+
+    def __init__(self, size=2, max_pages=50, lease_timeout=120, factory=setup_driver):
+        self.size = size
+        self.max_pages = max_pages
+        self.lease_timeout = lease_timeout
+        self.factory = factory
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._all = set()
+        self._closed = False
+
+    def _start(self):
+        pooled = PooledDriver(self.factory())
+        with self._lock:
+            self._all.add(pooled)
+        logger.info(f"Started pooled driver ({len(self._all)}/{self.size})")
+        return pooled
+
+    def _discard(self, pooled):
+        with self._lock:
+            self._all.discard(pooled)
+        pooled.quit()
+
+    def _acquire(self):
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                return self._start()
+            if pooled.is_healthy():
+                return pooled
+            logger.warning("Pooled driver failed health check, replacing it")
+            self._discard(pooled)
+
+    def _release(self, pooled, broken=False):
+        pooled.pages += 1
+        if broken or self._closed:
+            self._discard(pooled)
+        elif pooled.pages >= self.max_pages:
+            logger.info(f"Recycling pooled driver after {pooled.pages} pages")
+            self._discard(pooled)
+        else:
+            self._idle.put(pooled)
+
+    @contextmanager
+    def lease(self):
+        """Borrow a driver for one page load; it goes back to the pool when the block exits."""
+        if self._closed:
+            raise RuntimeError("Driver pool has been shut down")
+        if not self._slots.acquire(timeout=self.lease_timeout):
+            raise TimeoutError(f"No driver available after {self.lease_timeout}s")
+        pooled = None
+        broken = False
+        try:
+            pooled = self._acquire()
+            yield pooled.driver
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            if pooled is not None:
+                self._release(pooled, broken=broken)
+            self._slots.release()
+
+    def shutdown(self):
+        """Quit every session the pool has started."""
+        self._closed = True
+        with self._lock:
+            drivers = list(self._all)
+            self._all.clear()
+        for pooled in drivers:
+            pooled.quit()
+        logger.info(f"Driver pool shut down ({len(drivers)} drivers closed)")
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_driver_pool():
+    """
+    Return the driver pool for the current process, creating it on first use.
+
+    The pool is keyed on the PID so a prefork Celery child never reuses Chrome
+    sessions inherited from its parent.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                from django.conf import settings
+
+                _pool = DriverPool(
+                    size=getattr(settings, "SCRAPER_DRIVER_POOL_SIZE", 2),
+                    max_pages=getattr(settings, "SCRAPER_DRIVER_MAX_PAGES", 50),
+                    lease_timeout=getattr(settings, "SCRAPER_DRIVER_LEASE_TIMEOUT", 120),
+                )
+                _pool_pid = pid
+    return _pool
+
+
+def shutdown_driver_pool():
+    global _pool, _pool_pid
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.shutdown()
+    _pool = None
+    _pool_pid = None
+
+
+atexit.register(shutdown_driver_pool)
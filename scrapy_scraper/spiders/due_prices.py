@@ -0,0 +1,144 @@
+from datetime import timedelta
+
+import scrapy
+from django.conf import settings
+from django.utils import timezone
+from scrapy.exceptions import IgnoreRequest
+
+from scraper.models import CompetitorProduct, ScrapedData, load_fetch_states
+from scraper.scheduling import FREQUENCY_INTERVALS, claim_due_scrapes
+from scrapy_scraper.items import PriceItem
+from scrapy_scraper.spiders.fetcher import conditional_headers, parse_unless_unchanged
+
+SCRAPED_DATA, COMPETITOR_PRODUCTS = "scraped-data", "competitor-products"
+SOURCES = (SCRAPED_DATA, COMPETITOR_PRODUCTS)
+
+
+class DuePricesSpider(scrapy.Spider):
+    """
+    Crawl every due product page over Scrapy's downloader and hand the extracted prices
+    to BulkWritePipeline.
+
+    Due means a ScrapedData row whose next_run_at has passed (claimed the same way the
+    Celery dispatchers claim them) or a CompetitorProduct not checked for
+    SCRAPER_COMPETITOR_REFRESH_SECONDS. Pages are parsed with the same selectors and
+    extraction profiles as the other tiers. Pages whose static HTML holds no price are
+    handed to the browser tier of the Celery workers, and claimed rows whose fetch
+    failed are made due again (see BulkWritePipeline).
+
+    With SCRAPER_CONDITIONAL_FETCH, requests carry the validators of the last crawl, and
+    a 304 or an unchanged price region yields a not_modified item without extraction.
+
+        scrapy crawl due_prices -a source=competitor-products -a limit=10000
+    """
+    name = "due_prices"
+    handle_httpstatus_list = [304]
+
+    def __init__(self, source="all", limit=None, **kwargs):
+        super().__init__(**kwargs)
+        if source != "all" and source not in SOURCES:
+            raise ValueError(f"source must be 'all' or one of {', '.join(SOURCES)}")
+        self.sources = SOURCES if source == "all" else (source,)
+        self.limit = int(limit) if limit else None
+
+    def start_requests(self):
+        # Rows are loaded (and claimed) a chunk at a time as the scheduler asks for more,
+        # and a chunk never claims more rows than the limit has left.
+        self.remaining = self.limit
+        for target, rows in (
+            (SCRAPED_DATA, self._due_scraped_data()),
+            (COMPETITOR_PRODUCTS, self._due_competitor_products()),
+        ):
+            if target not in self.sources:
+                continue
+            for pk, url, state in self._with_fetch_states(rows):
+                if self.remaining is not None:
+                    self.remaining -= 1
+                yield scrapy.Request(
+                    url, callback=self.parse, errback=self.failed, dont_filter=True,
+                    headers=conditional_headers(state),
+                    cb_kwargs={"target": target, "pk": pk, "state": state},
+                )
+
+    def _with_fetch_states(self, rows):
+        """Attach the last fetch_state of each URL, loaded a claim chunk at a time."""
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= settings.SCRAPER_CRAWL_CLAIM_SIZE:
+                yield from self._attach_states(chunk)
+                chunk = []
+        yield from self._attach_states(chunk)
+
+    def _attach_states(self, rows):
+        if not rows:
+            return
+        states = load_fetch_states([url for _, url in rows]) if settings.SCRAPER_CONDITIONAL_FETCH else {}
+        for pk, url in rows:
+            yield pk, url, states.get(url)
+
+    def _chunk_size(self):
+        if self.remaining is None:
+            return settings.SCRAPER_CRAWL_CLAIM_SIZE
+        return min(settings.SCRAPER_CRAWL_CLAIM_SIZE, self.remaining)
+
+    def _due_scraped_data(self):
+        for frequency in FREQUENCY_INTERVALS:
+            while due_ids := claim_due_scrapes(frequency, self._chunk_size()):
+                yield from ScrapedData.objects.filter(id__in=due_ids).values_list("id", "url")
+
+    def _due_competitor_products(self):
+        cutoff = timezone.now() - timedelta(seconds=settings.SCRAPER_COMPETITOR_REFRESH_SECONDS)
+        due = CompetitorProduct.objects.filter(last_checked__lte=cutoff).order_by("id")
+        last_id = 0
+        while self._chunk_size():
+            rows = list(due.filter(id__gt=last_id).values_list("id", "product_url")[:self._chunk_size()])
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1][0]
+
+    def parse(self, response, target, pk, state=None):
+        if response.status == 304:
+            yield self._unchanged(target, pk, response.request.url, state)
+            return
+        if not hasattr(response, "text"):
+            self.crawler.stats.inc_value("prices/not_html")
+            yield PriceItem(target=target, pk=pk, url=response.request.url, needs_browser=True)
+            return
+        headers = {
+            "ETag": response.headers.get("ETag", b"").decode("latin-1"),
+            "Last-Modified": response.headers.get("Last-Modified", b"").decode("latin-1"),
+        }
+        data = parse_unless_unchanged(response.text, response.request.url, headers, state)
+        if data.get("not_modified"):
+            yield self._unchanged(target, pk, response.request.url, data["fetch_state"])
+            return
+        if data["current_price"] == "N/A":
+            self.crawler.stats.inc_value("prices/missing")
+            self.logger.info(f"No price in static HTML for {response.request.url}, handing it to the browser tier")
+            yield PriceItem(target=target, pk=pk, url=response.request.url, needs_browser=True)
+            return
+        yield PriceItem(
+            target=target,
+            pk=pk,
+            url=response.request.url,
+            product_name=data["product_name"],
+            current_price=data["current_price"],
+            previous_price=data["previous_price"],
+            description=data["description"],
+            fetched_at=timezone.now(),
+            not_modified=False,
+            fetch_state=data["fetch_state"],
+        )
+
+    def _unchanged(self, target, pk, url, state):
+        self.crawler.stats.inc_value("prices/unchanged")
+        return PriceItem(target=target, pk=pk, url=url, fetched_at=timezone.now(), not_modified=True, fetch_state=state)
+
+    def failed(self, failure):
+        request = failure.request
+        if not failure.check(IgnoreRequest):  # IgnoreRequest: DomainThrottleMiddleware found the circuit open
+            self.crawler.stats.inc_value("prices/failed")
+            self.logger.warning(f"Fetching {request.url} failed: {failure.value!r}")
+        yield PriceItem(target=request.cb_kwargs["target"], pk=request.cb_kwargs["pk"], url=request.url, failed=True)
@@ -0,0 +1,222 @@
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from scrapy_scraper.spiders.parsers import parse_html
+from scrapy_scraper.spiders.price_checker import extract_product_data, parse_product_data, price_fingerprint
+from scrapy_scraper.spiders.profiles import domain_of
+
+logger = logging.getLogger(__name__)
+
+HTTP_TIER = "http"
+BROWSER_TIER = "browser"
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+def conditional_headers(state):
+    """
+    Request headers that let the server answer 304 when the page is unchanged.
+    `state` is the `fetch_state` a previous fetch of the URL returned, or None.
+    """
+    headers = {}
+    if state and state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state and state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+    return headers
+
+
+def not_modified(url, state):
+    """The result of a fetch that found the page unchanged; callers skip parsing and writes."""
+    return {"url": url, "not_modified": True, "fetch_state": state}
+
+
+def parse_unless_unchanged(html, url, response_headers, state=None):
+    """
+    Parse a 200 response. When the price region hashes the same as in `state`, the rest
+    of the extraction is skipped and a `not_modified` result comes back instead. Either
+    way the result carries the new `fetch_state` (ETag, Last-Modified, price region hash).
+    """
+    document = parse_html(html)
+    fingerprint = price_fingerprint(document, url)
+    fetch_state = {
+        "etag": response_headers.get("ETag", ""),
+        "last_modified": response_headers.get("Last-Modified", ""),
+        "content_hash": fingerprint or "",
+    }
+    if fingerprint and state and state.get("content_hash") == fingerprint:
+        return not_modified(url, fetch_state)
+    data = parse_product_data(document, url)
+    data["fetch_state"] = fetch_state
+    return data
+
+
+class DomainTierMemory:
+    """
+    Remembers, per domain, whether the plain HTTP tier was enough to find a price.
+
+    Domains that needed the browser skip the HTTP attempt until `reprobe_after`
+    seconds have passed, after which HTTP is tried again in case the shop changed.
+    With a Django `cache`, what one process learns is seen by every process sharing
+    that cache, so scrape-http workers skip the domains scrape-browser workers found
+    need Chrome; entries then expire after `reprobe_after` instead.
+    """
+
+    KEY = "scrape-tier:{}"
+
+    def __init__(self, reprobe_after=6 * 3600, cache=None):
+        self.reprobe_after = reprobe_after
+        self.cache = cache
+        self._tiers = {}
+        self._lock = threading.Lock()
+
+    def get(self, domain):
+        if self.cache is not None:
+            return self.cache.get(self.KEY.format(domain))
+        entry = self._tiers.get(domain)
+        if entry is None:
+            return None
+        tier, recorded_at = entry
+        if tier == BROWSER_TIER and time.monotonic() - recorded_at > self.reprobe_after:
+            return None
+        return tier
+
+    def browser_domains(self, domains):
+        """The subset of `domains` currently known to need the browser tier, in one cache round trip."""
+        domains = set(domains)
+        if self.cache is None:
+            return {domain for domain in domains if self.get(domain) == BROWSER_TIER}
+        found = self.cache.get_many([self.KEY.format(domain) for domain in domains])
+        return {domain for domain in domains if found.get(self.KEY.format(domain)) == BROWSER_TIER}
+
+    def record(self, domain, tier):
+        if self.cache is not None:
+            self.cache.set(self.KEY.format(domain), tier, timeout=self.reprobe_after)
+            return
+        with self._lock:
+            self._tiers[domain] = (tier, time.monotonic())
+
+
+def build_http_session(pool_size=20):
+    """A keep-alive requests session whose connection pool is sized for concurrent scrapes."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=1)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+
+class TieredFetcher:
+    """
+    Fetches product data over plain HTTP first and escalates to a pooled browser only
+    when the static HTML has no price.
+    """
+
+    def __init__(self, session=None, driver_pool=None, tier_memory=None, timeout=10):
+        self.session = session or build_http_session()
+        self.driver_pool = driver_pool
+        self.tier_memory = tier_memory or DomainTierMemory()
+        self.timeout = timeout
+
+    def fetch_static(self, url, state=None):
+        """GET the page over HTTP, conditionally when `state` holds validators; returns None when the tier can't be used."""
+        try:
+            response = self.session.get(url, timeout=self.timeout, headers=conditional_headers(state))
+        except requests.RequestException as e:
+            logger.info(f"HTTP tier failed for {url}: {e}")
+            return None
+        if response.status_code == 304:
+            return not_modified(url, state)
+        if response.status_code != 200 or "html" not in response.headers.get("Content-Type", "html"):
+            logger.info(f"HTTP tier got status {response.status_code} for {url}")
+            return None
+        return parse_unless_unchanged(response.text, url, response.headers, state)
+
+    def fetch_browser(self, url):
+        if self.driver_pool is None:
+            raise RuntimeError(f"No price in static HTML for {url} and no browser tier configured")
+        with self.driver_pool.lease() as driver:
+            return extract_product_data(url, driver)
+
+    def fetch(self, url, state=None, browser=True):
+        """
+        Return the same dict as `extract_product_data`, plus the `fetch_tier` that produced it
+        and, from the HTTP tier, the `fetch_state` to pass back next time. An unchanged page
+        comes back as {"url", "not_modified": True, "fetch_state"} without being parsed.
+        With `browser=False`, a page that needs the browser tier comes back as
+        {"url", "needs_browser": True} instead, for a worker that can run Chrome.
+        """
+        domain = domain_of(url)
+        if self.tier_memory.get(domain) != BROWSER_TIER:
+            data = self.fetch_static(url, state)
+            if data and (data.get("not_modified") or data["current_price"] != "N/A"):
+                self.tier_memory.record(domain, HTTP_TIER)
+                data["fetch_tier"] = HTTP_TIER
+                return data
+            logger.info(f"No price in static HTML for {url}, escalating to browser")
+
+        if not browser:
+            return {"url": url, "needs_browser": True}
+
+        data = self.fetch_browser(url)
+        if data["current_price"] != "N/A":
+            self.tier_memory.record(domain, BROWSER_TIER)
+        data["fetch_tier"] = BROWSER_TIER
+        return data
+
+
+_tier_memory = None
+_tier_memory_lock = threading.Lock()
+
+
+def get_tier_memory():
+    """
+    The DomainTierMemory of this process, shared by the sync fetcher and every async
+    engine run, and kept in the Django cache so the scrape-http and scrape-browser
+    workers learn from each other.
+    """
+    global _tier_memory
+    if _tier_memory is None:
+        with _tier_memory_lock:
+            if _tier_memory is None:
+                from django.conf import settings
+                from django.core.cache import cache
+
+                _tier_memory = DomainTierMemory(getattr(settings, "SCRAPER_TIER_REPROBE_SECONDS", 6 * 3600), cache=cache)
+    return _tier_memory
+
+
+_fetcher = None
+_fetcher_pid = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher():
+    """Return the tiered fetcher for the current process, sharing its HTTP pool and driver pool."""
+    global _fetcher, _fetcher_pid
+    pid = os.getpid()
+    if _fetcher is None or _fetcher_pid != pid:
+        with _fetcher_lock:
+            if _fetcher is None or _fetcher_pid != pid:
+                from django.conf import settings
+
+                from scrapy_scraper.spiders.driver_pool import get_driver_pool
+
+                _fetcher = TieredFetcher(
+                    session=build_http_session(getattr(settings, "SCRAPER_HTTP_POOL_SIZE", 20)),
+                    driver_pool=get_driver_pool(),
+                    tier_memory=get_tier_memory(),
+                    timeout=getattr(settings, "SCRAPER_HTTP_TIMEOUT", 10),
+                )
+                _fetcher_pid = pid
+    return _fetcher
@@ -0,0 +1,101 @@
+from functools import lru_cache
+
+import soupsieve as sv
+from bs4 import BeautifulSoup
+
+DEFAULT_BACKEND = "html.parser"
+BACKENDS = ("html.parser", "lxml", "selectolax")
+
+
+@lru_cache(maxsize=None)
+def compile_selector(css):
+    """Parse a CSS selector once; BeautifulSoup would otherwise re-parse it on every select_one."""
+    return sv.compile(css)
+
+
+class SoupNode:
+    __slots__ = ("element",)
+
+    def __init__(self, element):
+        self.element = element
+
+    @property
+    def tag(self):
+        return self.element.name
+
+    def text(self):
+        return self.element.get_text(strip=True)
+
+    def get(self, attribute):
+        return self.element.get(attribute)
+
+
+class SoupDocument:
+    """BeautifulSoup tree ("html.parser" or "lxml") queried through precompiled soupsieve selectors."""
+
+    def __init__(self, html, features):
+        self.tree = BeautifulSoup(html, features)
+
+    def select_one(self, css):
+        element = compile_selector(css).select_one(self.tree)
+        return SoupNode(element) if element is not None else None
+
+    def select(self, css):
+        return [SoupNode(element) for element in compile_selector(css).select(self.tree)]
+
+
+class LexborNode:
+    __slots__ = ("node",)
+
+    def __init__(self, node):
+        self.node = node
+
+    @property
+    def tag(self):
+        return self.node.tag
+
+    def text(self):
+        return self.node.text(strip=True)
+
+    def get(self, attribute):
+        return self.node.attributes.get(attribute)
+
+
+class LexborDocument:
+    """selectolax (Lexbor) tree; CSS is matched in C, with the same selectors as the soup backends."""
+
+    def __init__(self, html):
+        from selectolax.lexbor import LexborHTMLParser
+
+        self.tree = LexborHTMLParser(html)
+
+    def select_one(self, css):
+        node = self.tree.css_first(css)
+        return LexborNode(node) if node is not None else None
+
+    def select(self, css):
+        return [LexborNode(node) for node in self.tree.css(css)]
+
+
+def default_backend():
+    try:
+        from django.conf import settings
+
+        if settings.configured:
+            return getattr(settings, "SCRAPER_PARSER_BACKEND", DEFAULT_BACKEND)
+    except ImportError:
+        pass
+    return DEFAULT_BACKEND
+
+
+def parse_html(html, backend=None):
+    """
+    Parse a page with the chosen backend. Every backend returns a document with the
+    same `select_one`/`select` API, and nodes with `tag`, `text()` and `get(attribute)`.
+    """
+    backend = backend or default_backend()
+    if backend == "selectolax":
+        return LexborDocument(html)
+    if backend in ("html.parser", "lxml"):
+        return SoupDocument(html, backend)
+    raise ValueError(f"Unknown parser backend {backend!r}; choose one of {', '.join(BACKENDS)}")
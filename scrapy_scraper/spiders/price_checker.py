@@ -1,20 +1,36 @@
 
 import logging
 import csv
-import re
+import hashlib
+import json
 import time
 from datetime import datetime
+from functools import lru_cache
+from shutil import which
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
 from webdriver_manager.chrome import ChromeDriverManager
 
+from scrapy_scraper.spiders.parsers import parse_html
+from scrapy_scraper.spiders.prices import parse_price
+from scrapy_scraper.spiders.profiles import domain_of, get_profile_registry, select_field
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+# Elements that may hold the live price once the page's JavaScript has run.
+PRICE_QUERY = 'span.a-price-whole, span.a-offscreen, span.price, p.price, div.product-price, [itemprop="price"], [class*="price"], .-b -ltr -tal -fs24, .price-box, .-b -ltr -tal, .price, .prc'
+PRICE_XPATH = "//span[contains(text(),'₦') or contains(@class, 'price') or contains(@class, 'prc')]"
+
+
+@lru_cache(maxsize=1)
+def chromedriver_path():
+    """Resolve chromedriver once per process; the Docker image ships one on PATH."""
+    return which("chromedriver") or ChromeDriverManager().install()
+
 
 def setup_driver():
     options = Options()
@@ -24,30 +40,38 @@ def setup_driver():
     options.add_argument("--disable-dev-shm-usage")
     options.add_argument("--disable-gpu")
     options.add_argument("--start-maximized")
-    options.add_argument("--remote-debugging-port=9222")  # Important for Docker
+    options.add_argument("--remote-debugging-port=0")  # Important for Docker; 0 lets pooled sessions coexist
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option("useAutomationExtension", False)
 
-    return webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+    return webdriver.Chrome(service=Service(chromedriver_path()), options=options)
 
 
 def clean_price(price):
-    if not price:
-        return "N/A"
-    price = price.strip().replace("\u20A6", "₦").replace("N", "₦").replace("₦₦", "₦")
-    matches = re.findall(r'₦?\s?[\d,.]+', price)
-    return min(matches, key=lambda p: len(p)).strip() if matches else "N/A"
+    """The price part of a scraped string, as written on the page ("₦ 4,500"), or "N/A"."""
+    parsed = parse_price(price.strip()) if price else None
+    return parsed.text if parsed else "N/A"
 
-def fetch_page_content(url, driver):
+def fetch_page_content(url, driver, backend=None):
     logging.info(f"Fetching page: {url}")
     driver.get(url)
+    profile = get_profile_registry().get(domain_of(url))
+    if profile and profile.selectors.get("current_price"):
+        # Known domain: wait for its own price element only and let the profile read it.
+        try:
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, profile.selectors["current_price"]))
+            )
+        except Exception:
+            logging.warning(f"Profile price selector not found for {url}")
+        return parse_html(driver.page_source, backend), None
     try:
         WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
     except Exception:
         logging.warning(f"Page load timeout for {url}")
     try:
-        price_js = driver.execute_script("""
-            let priceElements = document.querySelectorAll('span.a-price-whole, span.a-offscreen, span.price, p.price, div.product-price, [itemprop="price"], [class*="price"], .-b -ltr -tal -fs24, .price-box, .-b -ltr -tal, .price, .prc');
+        price_js = driver.execute_script(f"""
+            let priceElements = document.querySelectorAll('{PRICE_QUERY}');
             let priceList = Array.from(priceElements).map(el => el.innerText.trim());
             return priceList.length > 0 ? priceList[0] : null;
         """)
@@ -57,46 +81,92 @@ def fetch_page_content(url, driver):
         price_js = None
     try:
         price_xpath = WebDriverWait(driver, 5).until(
-            EC.presence_of_element_located((By.XPATH, "//span[contains(text(),'₦') or contains(@class, 'price') or contains(@class, 'prc')]"))
+            EC.presence_of_element_located((By.XPATH, PRICE_XPATH))
         ).text
         logging.info(f"Extracted Price (XPath): {price_xpath}")
     except Exception:
         price_xpath = None
-    soup = BeautifulSoup(driver.page_source, "html.parser")
-    return soup, clean_price(price_js or price_xpath)
-
-def extract_product_data(url, driver):
-    soup, price_js = fetch_page_content(url, driver)
+    return parse_html(driver.page_source, backend), clean_price(price_js or price_xpath)
+
+def extract_structured_price(document):
+    """Read the offer price from JSON-LD or price meta tags, which many shops render server-side."""
+    for script in document.select('script[type="application/ld+json"]'):
+        try:
+            data = json.loads(script.text() or "")
+        except ValueError:
+            continue
+        price = _find_offer_price(data)
+        if price:
+            return price
+    for selector in ['meta[itemprop="price"]', 'meta[property="product:price:amount"]', 'meta[property="og:price:amount"]']:
+        meta = document.select_one(selector)
+        content = meta.get("content") if meta is not None else None
+        if content:
+            return content.strip()
+    return None
+
+
+def _find_offer_price(data):
+    """Walk a JSON-LD document (dict, list or @graph) looking for Product.offers.price."""
+    if isinstance(data, list):
+        return next((price for item in data if (price := _find_offer_price(item))), None)
+    if not isinstance(data, dict):
+        return None
+    if "@graph" in data:
+        return _find_offer_price(data["@graph"])
+    offers = data.get("offers")
+    if isinstance(offers, list):
+        offers = offers[0] if offers else None
+    if isinstance(offers, dict):
+        price = offers.get("price") or offers.get("lowPrice")
+        if price is not None:
+            currency = offers.get("priceCurrency", "")
+            return f"{currency} {price}".strip()
+    return None
+
+
+def _element_text(element):
+    if element is None:
+        return None
+    return element.get("content") if element.tag == "meta" else element.text()
+
+
+def price_fingerprint(document, url, registry=None):
+    """
+    Hash of the text of the page's price region (current and slashed price, or the
+    structured offer price), found with the same selectors as `parse_product_data`.
+    Equal fingerprints mean the price the page shows has not changed. None when the
+    page shows no price at all.
+    """
+    domain = domain_of(url)
+    current = _element_text(select_field(document, "current_price", domain, registry)) or extract_structured_price(document)
+    if not current:
+        return None
+    previous = _element_text(select_field(document, "previous_price", domain, registry)) or ""
+    return hashlib.sha1(f"{current.strip()}\x1f{previous.strip()}".encode()).hexdigest()
+
+
+def parse_product_data(document, url, price_hint=None, registry=None):
+    """
+    Run the product selectors over a page parsed by `parse_html`. `price_hint` is a price found by the caller.
+    Each field uses the domain's extraction profile first and the generic selector list as a fallback.
+    """
+    domain = domain_of(url)
+
+    product_name = _element_text(select_field(document, "product_name", domain, registry)) or "N/A"
+
+    price = price_hint if price_hint else "N/A"
+    if price == "N/A":
+        price_element = select_field(document, "current_price", domain, registry)
+        if price_element is not None:
+            price = clean_price(price_element.text())
+    if price == "N/A":
+        price = clean_price(extract_structured_price(document))
 
-    product_name = next(
-        (soup.select_one(selector).get_text(strip=True) for selector in [
-            "span#productTitle", "h1", "h2.product-title", "h1.product_name", ".product-name", ".-fs20 -pts -pbxs"
-        ] if soup.select_one(selector)), "N/A"
-    )
+    slashed_element = select_field(document, "previous_price", domain, registry)
+    slashed_price = clean_price(slashed_element.text()) if slashed_element is not None else "N/A"
 
-    price = price_js if price_js else "N/A"
-    if price == "N/A":
-        for selector in [
-            "span.a-price-whole", "span.a-offscreen", "span.price", "p.price",
-            "div.product-price", ".-b -ltr -tal -fs24", ".prc"
-        ]:
-            price_element = soup.select_one(selector)
-            if price_element:
-                raw_price = price_element.get_text(strip=True)
-                price = clean_price(raw_price)
-                break
-
-    slashed_price = next(
-        (clean_price(soup.select_one(selector).get_text(strip=True)) for selector in [
-            "span.a-text-strike", "div.slashed-price", ".old-price", ".-tal -gy5 -l -fs16"
-        ] if soup.select_one(selector)), "N/A"
-    )
-
-    description = next(
-        (desc_element.get("content") if "meta" in selector else desc_element.get_text(strip=True) for selector in [
-            "div#feature-bullets ul", "div.product-description", "p.description", "meta[name='description']"
-        ] if (desc_element := soup.select_one(selector))), "N/A"
-    )
+    description = _element_text(select_field(document, "description", domain, registry)) or "N/A"
 
     extracted_data = {
         "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
@@ -111,6 +181,11 @@ def extract_product_data(url, driver):
     return extracted_data
 
 
+def extract_product_data(url, driver, backend=None):
+    document, price_js = fetch_page_content(url, driver, backend)
+    return parse_product_data(document, url, price_hint=price_js)
+
+
 def save_data_to_csv(data, filename="extracted_data.csv"):
     file_exists = False
     try:
@@ -0,0 +1,136 @@
+import re
+from collections import namedtuple
+from decimal import Decimal
+
+# Currency markers as they appear on product pages, mapped to ISO 4217 codes.
+# Symbols shared by several currencies resolve to the one our markets mean by them.
+CURRENCY_MARKERS = {
+    "₦": "NGN", "NGN": "NGN",
+    "﷼": "SAR", "ر.س": "SAR", "ر.س.": "SAR", "ريال": "SAR", "SR": "SAR", "SAR": "SAR",
+    "د.إ": "AED", "AED": "AED",
+    "E£": "EGP", "ج.م": "EGP", "EGP": "EGP",
+    "KSh": "KES", "KES": "KES",
+    "₵": "GHS", "GH₵": "GHS", "GHS": "GHS",
+    "US$": "USD", "$": "USD", "USD": "USD",
+    "C$": "CAD", "CAD": "CAD",
+    "A$": "AUD", "AUD": "AUD",
+    "€": "EUR", "EUR": "EUR",
+    "£": "GBP", "GBP": "GBP",
+    "₹": "INR", "INR": "INR",
+    "¥": "JPY", "JPY": "JPY", "CNY": "CNY",
+    "د.ك": "KWD", "KWD": "KWD", "BHD": "BHD", "OMR": "OMR", "QAR": "QAR", "JOD": "JOD",
+    "CHF": "CHF", "ZAR": "ZAR",
+}
+# A bare "N" directly before the amount is how Nigerian shops often write the naira.
+LEADING_ONLY_MARKERS = {"N": "NGN"}
+
+# Digits after the decimal point per currency; everything else uses two.
+MINOR_UNIT_EXPONENTS = {"JPY": 0, "KWD": 3, "BHD": 3, "OMR": 3, "JOD": 3}
+
+GROUP_SEPARATORS = "\'\u00a0\u202f ٬"  # Apostrophe, (narrow) no-break space, space, Arabic thousands
+DECIMAL_MARKS = ".,٫"  # Point, comma, Arabic decimal separator
+
+
+def _alternation(markers):
+    """
+    Regex alternation over `markers`, longest first so "US$" wins over "$". Alphabetic
+    markers must start a word, so "SR" in "USR" or the "N" in "IN 500" don't count.
+    """
+    ordered = sorted(markers, key=len, reverse=True)
+    words = "|".join(re.escape(marker) for marker in ordered if marker.isalpha())
+    symbols = "|".join(re.escape(marker) for marker in ordered if not marker.isalpha())
+    # The leading class lets the engine skip most positions without trying every marker.
+    first = "".join(sorted({re.escape(marker[0]) for marker in markers}))
+    return rf"(?=[{first}])(?:(?<![A-Za-z])(?:{words})|{symbols})"
+
+
+# Dots and commas may separate any digit runs; spaces and apostrophes only group thousands,
+# so "4 500" is one amount but "2 items 30" is not. Without a currency marker in front, a
+# number never starts mid-word or mid-number.
+_NUMBER = rf"\d+(?:[{DECIMAL_MARKS}]\d+|[{GROUP_SEPARATORS}]\d{{3}}(?!\d))*"
+PRICE_PATTERN = re.compile(
+    rf"(?:(?P<before>{_alternation({**CURRENCY_MARKERS, **LEADING_ONLY_MARKERS})})\s*|(?<![A-Za-z\d{DECIMAL_MARKS}]))"
+    rf"(?P<number>{_NUMBER})"
+    rf"(?:\s*(?P<after>{_alternation(CURRENCY_MARKERS)})(?![A-Za-z])(?!\s*\d))?"
+    rf"(?P<percent>\s*%)?"
+)
+_STRIP_SEPARATORS = {ord(separator): None for separator in DECIMAL_MARKS + GROUP_SEPARATORS}
+_SCALES = (1, 10, 100, 1000)
+
+
+class ParsedPrice(namedtuple("ParsedPrice", "minor_units currency text")):
+    """
+    An amount in integer minor units (kobo, halalas, cents) with its ISO currency code,
+    or None when the text named no currency and no default was given. `text` is the
+    part of the input the price was read from.
+    """
+    __slots__ = ()
+
+    @property
+    def exponent(self):
+        return MINOR_UNIT_EXPONENTS.get(self.currency, 2)
+
+    def to_decimal(self):
+        return Decimal(self.minor_units).scaleb(-self.exponent)
+
+
+def _minor_units(number, exponent):
+    """Read one matched number, deciding which separator (if any) is the decimal mark."""
+    if number.isdigit():
+        return int(number) * _SCALES[exponent]
+    last = len(number) - 1
+    while number[last].isdigit():
+        last -= 1
+    mark, decimals = number[last], len(number) - last - 1
+    digits = int(number.translate(_STRIP_SEPARATORS))
+    is_decimal = (
+        mark in DECIMAL_MARKS
+        and number.count(mark) == 1
+        # "1.234,56" / "1,234.5": a different mark before it means this one is decimal.
+        # A lone mark followed by exactly three digits groups thousands ("1,500"),
+        # except in currencies that really have three decimals or after a zero
+        # ("0.500"), which no thousands group starts with.
+        and (decimals != 3 or exponent == 3 or not number[:last].isdigit() or not number[:last].strip("0"))
+    )
+    if not is_decimal:
+        return digits * _SCALES[exponent]
+    if decimals <= exponent:
+        return digits * 10 ** (exponent - decimals)
+    # More decimals than the currency has: round half up to its minor unit.
+    dropped = 10 ** (decimals - exponent)
+    units, rest = divmod(digits, dropped)
+    return units + (2 * rest >= dropped)
+
+
+def parse_price(text, default_currency=None):
+    """
+    Parse the price out of a scraped string such as "₦ 4,500", "1.234,56 €",
+    "SAR 1,299.00" or "ر.س ١٬٢٩٩". Returns a ParsedPrice, or None if there is no amount.
+
+    When the text holds several numbers, the first one marked with a currency wins, then
+    the first one at all; percentages ("-20%") are never taken for prices.
+    """
+    if not text:
+        return None
+    fallback = None
+    search = PRICE_PATTERN.search
+    match = search(text)
+    while match is not None:
+        before, number, after, percent = match.groups()
+        marker = before or after
+        if not percent and (marker is not None or fallback is None):
+            currency = CURRENCY_MARKERS.get(marker) or LEADING_ONLY_MARKERS.get(marker) or default_currency
+            parsed = ParsedPrice(
+                _minor_units(number, MINOR_UNIT_EXPONENTS.get(currency, 2)), currency, match.group().strip()
+            )
+            if marker is not None:
+                return parsed
+            fallback = parsed
+        match = search(text, match.end())
+    return fallback
+
+
+def price_decimal(text, default_currency=None):
+    """The parsed amount as a Decimal in major units, or None; what the models store in `price_value`."""
+    parsed = parse_price(text, default_currency)
+    return None if parsed is None else parsed.to_decimal()
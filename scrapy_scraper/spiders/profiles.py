@@ -0,0 +1,123 @@
+import logging
+import threading
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Generic selectors, tried in order, for pages whose domain has no profile yet.
+FALLBACK_SELECTORS = {
+    "product_name": [
+        "span#productTitle", "h1", "h2.product-title", "h1.product_name", ".product-name", ".-fs20 -pts -pbxs"
+    ],
+    "current_price": [
+        "span.a-price-whole", "span.a-offscreen", "span.price", "p.price",
+        "div.product-price", ".-b -ltr -tal -fs24", ".prc"
+    ],
+    "previous_price": [
+        "span.a-text-strike", "div.slashed-price", ".old-price", ".-tal -gy5 -l -fs16"
+    ],
+    "description": [
+        "div#feature-bullets ul", "div.product-description", "p.description", "meta[name='description']"
+    ],
+}
+
+
+def domain_of(url):
+    return (urlparse(url).hostname or "").lower()
+
+
+class ExtractionProfile:
+    """
+    The selectors known to work on one domain, one per field. Fields in `learned` were
+    picked up from the fallback list; the rest came from configuration.
+    """
+
+    def __init__(self, selectors=None):
+        self.selectors = dict(selectors or {})
+        self.learned = set()
+
+    def get(self, field):
+        return self.selectors.get(field)
+
+    def is_configured(self, field):
+        return field in self.selectors and field not in self.learned
+
+
+class ProfileRegistry:
+    """
+    Per-domain extraction profiles.
+
+    Profiles come from configuration (SCRAPER_EXTRACTION_PROFILES) or are learned: when
+    the fallback list finds a field on a domain, the winning selector is remembered and
+    tried alone next time. Configured selectors are never overwritten by learning, but a
+    configured domain still learns the fields its configuration leaves out.
+    """
+
+    def __init__(self, configured=None):
+        self._lock = threading.Lock()
+        self._profiles = {
+            domain.lower(): ExtractionProfile(selectors)
+            for domain, selectors in (configured or {}).items()
+        }
+
+    def get(self, domain):
+        return self._profiles.get(domain)
+
+    def learn(self, domain, field, css):
+        with self._lock:
+            profile = self._profiles.setdefault(domain, ExtractionProfile())
+            if profile.is_configured(field):
+                return
+            if profile.selectors.get(field) != css:
+                logger.info(f"Learned {field} selector {css!r} for {domain}")
+                profile.selectors[field] = css
+                profile.learned.add(field)
+
+    def forget(self, domain, field):
+        """Drop a learned selector that stopped matching so the fallback list is tried again."""
+        with self._lock:
+            profile = self._profiles.get(domain)
+            if profile and field in profile.learned:
+                profile.selectors.pop(field, None)
+                profile.learned.discard(field)
+
+
+_registry = None
+
+
+def get_profile_registry():
+    """The process-wide registry, seeded from Django settings when they are available."""
+    global _registry
+    if _registry is None:
+        configured = {}
+        try:
+            from django.conf import settings
+
+            if settings.configured:
+                configured = getattr(settings, "SCRAPER_EXTRACTION_PROFILES", {})
+        except ImportError:
+            pass
+        _registry = ProfileRegistry(configured)
+    return _registry
+
+
+def select_field(document, field, domain, registry=None):
+    """
+    Return the first node for `field`, trying the domain's profile before the
+    fallback list, and teach the registry whichever fallback selector won.
+    """
+    registry = registry or get_profile_registry()
+    profile = registry.get(domain)
+    css = profile.get(field) if profile else None
+    if css is not None:
+        element = document.select_one(css)
+        if element is not None:
+            return element
+        registry.forget(domain, field)
+
+    for css in FALLBACK_SELECTORS[field]:
+        element = document.select_one(css)
+        if element is not None:
+            registry.learn(domain, field, css)
+            return element
+    return None